@@ -0,0 +1,12 @@
+-- Notify listeners (SQLSchemaLoader.wait_for_change) whenever DDL runs,
+-- so the schema index can be refreshed without polling
+CREATE OR REPLACE FUNCTION notify_schema_change() RETURNS event_trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('schema_changed', tg_tag);
+END;
+$$;
+
+DROP EVENT TRIGGER IF EXISTS schema_change_notify;
+CREATE EVENT TRIGGER schema_change_notify ON ddl_command_end
+    EXECUTE FUNCTION notify_schema_change();
@@ -0,0 +1,328 @@
+from databases.factory import create_vector_database
+from embeddings.embedding_models import EmbeddingModel
+from retrievers.retriever import RAGRetriever
+from retrievers.schema_retriever import SchemaRetriever
+from utils.chunking import create_chunker
+from utils.config import load_config
+from utils.data_loader import DocumentProcessor
+from utils.metrics import StageMetrics, timer
+from utils.sql_schema_loader import SQLSchemaLoader
+from sql_schema_rag import analyze_json_structure
+from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Metric -> (direction, tolerance name); "higher" metrics regress when they drop
+METRIC_DIRECTIONS = {
+    "encode_docs_per_second": ("higher", "throughput"),
+    "ingest_docs_per_second": ("higher", "throughput"),
+    "queries_per_second": ("higher", "throughput"),
+    "query_latency_p50_ms": ("lower", "latency"),
+    "query_latency_p95_ms": ("lower", "latency"),
+    "query_latency_p99_ms": ("lower", "latency"),
+    "peak_rss_mb": ("lower", "memory"),
+    "hf_recall_at_k": ("higher", "recall"),
+    "schema_recall_at_k": ("higher", "recall"),
+}
+
+# Relative tolerances, except recall which is an absolute drop
+DEFAULT_TOLERANCES = {"throughput": 0.2, "latency": 0.25, "memory": 0.2, "recall": 0.02}
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Read one JSON object per non-empty line."""
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def postgres_ddl_to_sqlite(sql: str) -> str:
+    """
+    Translate the bookstore init script to SQLite DDL.
+
+    Enum types become TEXT and SERIAL keys INTEGER; everything else in the
+    script (REFERENCES, CHECK, DEFAULT) is understood by SQLite as is.
+    """
+    enum_types = re.findall(r"CREATE TYPE (\w+) AS ENUM", sql)
+    sql = re.sub(r"CREATE TYPE \w+ AS ENUM \([^)]*\);", "", sql)
+    sql = re.sub(r"\bSERIAL\b", "INTEGER", sql)
+    for enum_type in enum_types:
+        sql = re.sub(rf"\b{enum_type}\b", "TEXT", sql)
+    return sql
+
+def create_bookstore_database(init_script: str, path: str) -> str:
+    """Create the bookstore schema in a SQLite file and return its SQLAlchemy URL."""
+    with open(init_script, 'r') as f:
+        ddl = postgres_ddl_to_sqlite(f.read())
+    with sqlite3.connect(path) as conn:
+        conn.executescript(ddl)
+    return f"sqlite:///{path}"
+
+def refresh_hf_fixture(path: str) -> None:
+    """Replace the fixture's dataset records with their current rows from the metadata snapshot."""
+    # Only the fixture refresh reads the HF metadata snapshot
+    from utils.data_loader import HuggingFaceMetaLoader
+    
+    names = [record["name"] for record in read_jsonl(path)]
+    records = HuggingFaceMetaLoader().load_many(names)
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    print(f"Wrote {len(records)} of {len(names)} datasets to {path}")
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size in MB of this process plus that of its largest finished child.
+
+    Children are encode workers, so this bounds the memory of a run from above.
+    """
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def recall(retrieved: List[str], relevant: List[str]) -> float:
+    """Fraction of ``relevant`` found in ``retrieved``."""
+    return len(set(retrieved) & set(relevant)) / len(relevant) if relevant else 1.0
+
+def create_benchmark_retriever(config: Dict[str, Any], embedding_model: EmbeddingModel,
+                               backend: str, collection_name: str) -> RAGRetriever:
+    """
+    Create a retriever over a fresh, in-memory collection of ``backend``.
+
+    Query and result caches are disabled so repeated queries measure the full
+    encode and search path.
+    """
+    backend_config = dict(config['databases'][backend], persist_directory=None,
+                          vector_size=embedding_model.dimension)
+    vector_db = create_vector_database({'databases': {'backend': backend, backend: backend_config}}, collection_name)
+    retrieval_config = config.get('retrieval', {})
+    return RAGRetriever(
+        vector_db,
+        embedding_model,
+        query_cache_size=0,
+        result_cache_size=0,
+        hybrid=retrieval_config.get('hybrid', False),
+        rrf_k=retrieval_config.get('rrf_k', 60),
+        hybrid_candidates=retrieval_config.get('hybrid_candidates', 50)
+    )
+
+def run_benchmark(config: Dict[str, Any], benchmark_config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ingest the fixtures, then measure encoding, ingestion, concurrent querying and recall.
+
+    The HF fixture is chunked like ``hf_rag`` ingestion and queried with
+    ``retrieve_grouped``; the bookstore schema is indexed with column
+    documents and queried through ``SchemaRetriever`` from JSON shapes.
+    Recall@k is the mean fraction of a query's labeled datasets or tables
+    among its results.
+
+    Args:
+        config: Full application config
+        benchmark_config: The ``benchmark`` section
+
+    Returns:
+        Dict with "environment", "fixture" sizes and flat "metrics"
+    """
+    backend = benchmark_config.get('backend', 'numpy')
+    top_k = benchmark_config.get('top_k', 5)
+    concurrency = benchmark_config.get('concurrency', 8)
+    query_rounds = benchmark_config.get('query_rounds', 5)
+    encode_batch_size = benchmark_config.get('encode_batch_size', 32)
+    metrics = StageMetrics()
+
+    embedding_config = config['embedding']
+    with timer("Loading embedding model"):
+        embedding_model = EmbeddingModel(
+            model_name=embedding_config['model_name'],
+            # No cache: every run has to encode the fixtures
+            cache_dir=None,
+            num_workers=embedding_config.get('num_workers', 0),
+            devices=embedding_config.get('devices'),
+            max_seq_length=embedding_config.get('max_seq_length'),
+            backend=embedding_config.get('backend', 'torch'),
+            onnx_dir=embedding_config.get('onnx_dir'),
+            onnx_quantized=embedding_config.get('onnx_quantized', False),
+            normalize=embedding_config.get('normalize', False)
+        )
+
+    chunker = create_chunker(config.get('ingest', {}).get('chunking', {}), embedding_model)
+    hf_documents = [
+        document
+        for metadata in read_jsonl(benchmark_config['hf_fixture'])
+        for document in DocumentProcessor.iter_documents_from_metadata(metadata, chunker)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        schema_loader = SQLSchemaLoader(
+            create_bookstore_database(benchmark_config['schema_fixture'], os.path.join(tmp_dir, "bookstore.db")),
+            snapshot_dir=None
+        )
+        schema_documents = schema_loader.load_all_schemas(include_columns=True)
+
+        queries = read_jsonl(benchmark_config['queries'])
+        hf_queries = [query for query in queries if query['suite'] == 'hf']
+        schema_queries = [query for query in queries if query['suite'] == 'schema']
+
+        with timer("Encoding fixtures"):
+            texts = [document["text"] for document in hf_documents + schema_documents]
+            # Warm-up so model initialisation is not counted
+            embedding_model.encode(texts[:encode_batch_size], batch_size=encode_batch_size)
+            for _ in range(benchmark_config.get('encode_rounds', 3)):
+                with metrics.measure("encode", items=len(texts)):
+                    embedding_model.encode(texts, batch_size=encode_batch_size)
+
+        with timer("Ingesting fixtures"):
+            hf_retriever = create_benchmark_retriever(config, embedding_model, backend, "benchmark_hf")
+            schema_retriever = create_benchmark_retriever(config, embedding_model, backend, "benchmark_schema")
+            for retriever, documents in ((hf_retriever, hf_documents), (schema_retriever, schema_documents)):
+                with metrics.measure("ingest", items=len(documents)):
+                    retriever.add_documents(
+                        [document["text"] for document in documents],
+                        metadata=[document["metadata"] for document in documents],
+                        keys=[document["key"] for document in documents]
+                    )
+        table_retriever = SchemaRetriever(schema_retriever, schema_loader)
+
+        def run_query(query: Dict[str, Any]) -> List[str]:
+            with metrics.measure("query"):
+                if query['suite'] == 'hf':
+                    return [group["parent"] for group in hf_retriever.retrieve_grouped(query['query'], top_k=top_k)]
+                fields = analyze_json_structure(query['json'])
+                return [table["table_name"] for table in table_retriever.retrieve_tables(fields, top_k=top_k)]
+
+        with timer(f"Querying with {concurrency} concurrent clients"):
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(run_query, queries * query_rounds))
+        schema_loader.engine.dispose()
+
+    embedding_model.close()
+
+    # Every round returns the same results; zip scores the first
+    recalls = [(query['suite'], recall(retrieved, query['relevant'])) for query, retrieved in zip(queries, results)]
+    hf_recalls = [value for suite, value in recalls if suite == 'hf']
+    schema_recalls = [value for suite, value in recalls if suite == 'schema']
+
+    summary = metrics.summary()
+    return {
+        "environment": {
+            "embedding_model": embedding_model.model_name,
+            "embedding_backend": embedding_model.backend,
+            "vector_backend": backend,
+            "hybrid": hf_retriever.hybrid,
+            "top_k": top_k,
+            "concurrency": concurrency,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "fixture": {
+            "hf_documents": len(hf_documents),
+            "schema_documents": len(schema_documents),
+            "hf_queries": len(hf_queries),
+            "schema_queries": len(schema_queries),
+        },
+        "metrics": {
+            "encode_docs_per_second": summary["encode"]["items_per_second"],
+            "ingest_docs_per_second": summary["ingest"]["items_per_second"],
+            "queries_per_second": summary["query"]["items_per_second"],
+            "query_latency_p50_ms": summary["query"]["latency_p50_ms"],
+            "query_latency_p95_ms": summary["query"]["latency_p95_ms"],
+            "query_latency_p99_ms": summary["query"]["latency_p99_ms"],
+            "peak_rss_mb": peak_rss_mb(),
+            "hf_recall_at_k": sum(hf_recalls) / len(hf_recalls) if hf_recalls else 0.0,
+            "schema_recall_at_k": sum(schema_recalls) / len(schema_recalls) if schema_recalls else 0.0,
+        }
+    }
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any],
+                        tolerances: Dict[str, float] = None) -> List[str]:
+    """
+    List the metrics of ``results`` that regressed against ``baseline``.
+
+    Throughput, latency and memory may drift by a relative tolerance before
+    counting as a regression; recall by an absolute one.
+
+    Returns:
+        One message per regressed metric (empty if none regressed)
+    """
+    tolerances = dict(DEFAULT_TOLERANCES, **(tolerances or {}))
+    regressions = []
+    for metric, (direction, tolerance_name) in METRIC_DIRECTIONS.items():
+        if metric not in baseline["metrics"] or metric not in results["metrics"]:
+            continue
+        expected = baseline["metrics"][metric]
+        actual = results["metrics"][metric]
+        tolerance = tolerances[tolerance_name]
+        if tolerance_name == "recall":
+            limit = expected - tolerance
+        else:
+            limit = expected * (1 - tolerance) if direction == "higher" else expected * (1 + tolerance)
+        if (actual < limit) if direction == "higher" else (actual > limit):
+            regressions.append(f"{metric}: {actual:.3f} vs baseline {expected:.3f} (limit {limit:.3f})")
+    return regressions
+
+def main(output_path: str = None, baseline_path: str = None, update_baseline: bool = False,
+         backend: str = None, concurrency: int = None) -> int:
+    with timer("Loading configuration"):
+        config = load_config()
+    benchmark_config = dict(config.get('benchmark', {}))
+    if backend:
+        benchmark_config['backend'] = backend
+    if concurrency:
+        benchmark_config['concurrency'] = concurrency
+    output_path = output_path or benchmark_config.get('output', 'benchmark_results.json')
+    baseline_path = baseline_path or benchmark_config.get('baseline', 'benchmarks/baseline.json')
+
+    results = run_benchmark(config, benchmark_config)
+    results["created_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results["metrics"], indent=2))
+    print(f"Results written to {output_path}")
+
+    if update_baseline:
+        os.makedirs(os.path.dirname(baseline_path) or ".", exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline updated: {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        # A missing baseline must not pass the regression check silently
+        print(f"Error: no baseline at {baseline_path}; record one with --update-baseline", file=sys.stderr)
+        return 2
+
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    if baseline.get("environment") != results["environment"]:
+        print(f"Warning: baseline environment differs: {baseline.get('environment')}")
+    regressions = compare_to_baseline(results, baseline, benchmark_config.get('tolerances'))
+    if regressions:
+        print("Regressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval benchmark on the local fixtures")
+    parser.add_argument("--output", help="Results JSON file (default: benchmark.output)")
+    parser.add_argument("--baseline", help="Baseline JSON file (default: benchmark.baseline)")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--backend", choices=["numpy", "chroma"], help="Vector database (default: benchmark.backend)")
+    parser.add_argument("--concurrency", type=int, help="Concurrent query clients (default: benchmark.concurrency)")
+    parser.add_argument("--refresh-fixture", action="store_true",
+                        help="Reload the HF fixture's datasets from the metadata snapshot and exit")
+    args = parser.parse_args()
+
+    if args.refresh_fixture:
+        refresh_hf_fixture(load_config().get('benchmark', {}).get('hf_fixture', 'benchmarks/fixtures/hf_datasets.jsonl'))
+        sys.exit(0)
+    sys.exit(main(args.output, args.baseline, args.update_baseline, args.backend, args.concurrency))
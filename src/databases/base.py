@@ -1,5 +1,61 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Union
+import numpy as np
+
+# Embeddings travel as float32 NumPy arrays; adapters convert them only where
+# their client library needs another type. Lists of floats are still accepted.
+Embedding = Union[np.ndarray, List[float]]
+Embeddings = Union[np.ndarray, List[List[float]]]
+
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+FILTER_OPERATORS = ("eq", "in") + RANGE_OPERATORS
+
+def parse_filters(filters: Dict[str, Any]) -> List[Tuple[str, str, Any]]:
+    """
+    Turn a metadata filter into (key, operator, value) conditions, all of which must hold.
+    
+    Filter values take three forms:
+    
+    - ``{"doc_type": "table"}``: equality; a list-valued field matches if it contains the value
+    - ``{"tags": ["nlp", "audio"]}``: any-of; matches if the field equals or contains any value
+    - ``{"downloads": {"gte": 100, "lt": 1000}}``: range (gt/gte/lt/lte); ``eq`` and
+      ``in`` may be spelled out the same way
+    
+    Raises:
+        ValueError: For unknown operators
+    """
+    conditions = []
+    for key, value in (filters or {}).items():
+        if isinstance(value, dict):
+            for operator, operand in value.items():
+                if operator not in FILTER_OPERATORS:
+                    raise ValueError(f"Unknown filter operator {operator!r} for {key!r}")
+                conditions.append((key, operator, list(operand) if operator == "in" else operand))
+        elif isinstance(value, (list, tuple, set)):
+            conditions.append((key, "in", list(value)))
+        else:
+            conditions.append((key, "eq", value))
+    return conditions
+
+def matches_filters(metadata: Dict[str, Any], conditions: List[Tuple[str, str, Any]]) -> bool:
+    """Evaluate conditions from ``parse_filters`` against one metadata dict."""
+    for key, operator, operand in conditions:
+        value = metadata.get(key)
+        values = value if isinstance(value, list) else [value]
+        if operator == "eq":
+            matched = operand in values
+        elif operator == "in":
+            matched = any(item in operand for item in values)
+        else:
+            matched = value is not None and not isinstance(value, list) and {
+                "gt": value > operand,
+                "gte": value >= operand,
+                "lt": value < operand,
+                "lte": value <= operand
+            }[operator]
+        if not matched:
+            return False
+    return True
 
 class VectorDatabase(ABC):
     """Base class for vector database implementations."""
@@ -10,16 +66,50 @@ class VectorDatabase(ABC):
         pass
     
     @abstractmethod
-    def insert(self, texts: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]] = None) -> None:
-        """Insert documents and their embeddings into the database."""
+    def insert(self, texts: List[str], embeddings: Embeddings, metadata: List[Dict[str, Any]] = None,
+               ids: List[Union[int, str]] = None) -> None:
+        """Insert documents and their embeddings into the database.
+        
+        ``embeddings`` is normally a (len(texts), dim) float32 array.
+        
+        If ``ids`` is omitted, documents are numbered from 0 within the call;
+        callers should normally pass content-addressed IDs from
+        ``utils.document_ids`` so batches never overwrite each other.
+        """
         pass
     
     @abstractmethod
-    def search(self, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar documents using query embedding."""
+    def search(self, query_embedding: Embedding, top_k: int = 5,
+               filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Search for similar documents using query embedding.
+        
+        ``filters`` restricts results to documents whose metadata matches it,
+        see ``parse_filters``. Adapters apply it inside the engine's search.
+        
+        Returns:
+            Dicts with the point "id" (as a string), "text", "metadata" and "distance"
+        """
         pass
     
+    def search_batch(self, query_embeddings: Embeddings, top_k: int = 5,
+                     filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Search for several query embeddings, returning one result list per query.
+        
+        Adapters should override this with their engine's native batch search;
+        the default issues one ``search`` per query.
+        """
+        return [self.search(query_embedding, top_k=top_k, filters=filters) for query_embedding in query_embeddings]
+    
     @abstractmethod
     def delete(self, ids: List[str]) -> None:
         """Delete documents from the database."""
-        pass 
\ No newline at end of file
+        pass
+    
+    @abstractmethod
+    def list_ids(self, filters: Dict[str, Any] = None) -> List[str]:
+        """Return the IDs of all stored documents, optionally only those matching ``filters``."""
+        pass
+    
+    def save(self) -> None:
+        """Persist pending changes. Server-backed databases persist on write, so this is a no-op."""
+        pass
@@ -1,8 +1,67 @@
+import json
 import chromadb
-from typing import List, Dict, Any
-from src.databases.base import VectorDatabase
+from typing import List, Dict, Any, Tuple, Union
+import numpy as np
+from databases.base import VectorDatabase, Embedding, Embeddings, parse_filters
+
+# Chroma metadata values must be str, int, float or bool. Lists and dicts are
+# stored as JSON strings, named under JSON_KEYS so they are decoded on read,
+# and each scalar list element also gets a boolean "<field>::<json value>" key
+# that containment filters match on.
+JSON_KEYS = "_json_keys"
+CONTAINS_SEPARATOR = "::"
+SCALAR_TYPES = (str, int, float, bool)
+
+def contains_key(field: str, value: Any) -> str:
+    """Boolean metadata key marking that list field ``field`` contains ``value``."""
+    return f"{field}{CONTAINS_SEPARATOR}{json.dumps(value)}"
+
+def encode_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert one metadata dict into Chroma's scalar-only form (see ``decode_metadata``)."""
+    encoded = {}
+    json_keys = []
+    for key, value in metadata.items():
+        if value is None:
+            continue
+        if isinstance(value, SCALAR_TYPES):
+            encoded[key] = value
+            continue
+        if isinstance(value, (tuple, set)):
+            value = list(value)
+        encoded[key] = json.dumps(value, default=str)
+        json_keys.append(key)
+        if isinstance(value, list):
+            for item in value:
+                if isinstance(item, SCALAR_TYPES):
+                    encoded[contains_key(key, item)] = True
+    if json_keys:
+        encoded[JSON_KEYS] = json.dumps(json_keys)
+    return encoded
+
+def decode_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Restore metadata written by ``encode_metadata``."""
+    if not metadata:
+        return {}
+    json_keys = json.loads(metadata.get(JSON_KEYS, "[]"))
+    return {
+        key: json.loads(value) if key in json_keys else value
+        for key, value in metadata.items()
+        if key != JSON_KEYS and not any(key.startswith(field + CONTAINS_SEPARATOR) for field in json_keys)
+    }
 
 class ChromaDBAdapter(VectorDatabase):
+    """
+    Chroma collection adapter.
+    
+    List and dict metadata fields are stored JSON-encoded (see
+    ``encode_metadata``), so they round-trip unchanged. Filters keep the
+    semantics of ``parse_filters``: equality and any-of match list fields by
+    containment through per-element boolean keys, and range conditions never
+    match list fields. Filters Chroma cannot evaluate the same way (non-scalar
+    values, non-numeric range bounds) raise ValueError instead of silently
+    returning different results.
+    """
+    
     def __init__(self, collection_name: str, persist_directory: str = None):
         self.collection_name = collection_name
         self.persist_directory = persist_directory
@@ -17,35 +76,104 @@ class ChromaDBAdapter(VectorDatabase):
         )
         self.collection = self.client.get_or_create_collection(self.collection_name)
     
-    def insert(self, texts: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]] = None) -> None:
+    def insert(self, texts: List[str], embeddings: Embeddings, metadata: List[Dict[str, Any]] = None,
+               ids: List[Union[int, str]] = None) -> None:
         if metadata is None:
             metadata = [{} for _ in texts]
+        if ids is None:
+            ids = range(len(texts))
         
-        self.collection.add(
+        self.collection.upsert(
             documents=texts,
-            embeddings=embeddings,
-            metadatas=metadata,
-            ids=[f"doc_{i}" for i in range(len(texts))]
+            embeddings=self._to_lists(embeddings),
+            metadatas=[encode_metadata(item) for item in metadata],
+            ids=[doc_id if isinstance(doc_id, str) else f"doc_{doc_id}" for doc_id in ids]
         )
     
-    def search(self, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query_embedding: Embedding, top_k: int = 5,
+               filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        return self.search_batch([query_embedding], top_k=top_k, filters=filters)[0]
+    
+    def search_batch(self, query_embeddings: Embeddings, top_k: int = 5,
+                     filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        where, matches_nothing = self._to_where(filters)
+        if matches_nothing:
+            return [[] for _ in query_embeddings]
         results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
+            query_embeddings=self._to_lists(query_embeddings),
+            n_results=top_k,
+            where=where
         )
         
         return [
-            {
-                "text": doc,
-                "metadata": metadata,
-                "distance": distance
-            }
-            for doc, metadata, distance in zip(
-                results["documents"][0],
-                results["metadatas"][0],
-                results["distances"][0]
+            [
+                {
+                    "id": doc_id,
+                    "text": doc,
+                    "metadata": decode_metadata(metadata),
+                    "distance": distance
+                }
+                for doc_id, doc, metadata, distance in zip(ids, docs, metadatas, distances)
+            ]
+            for ids, docs, metadatas, distances in zip(
+                results["ids"],
+                results["documents"],
+                results["metadatas"],
+                results["distances"]
             )
         ]
     
+    @staticmethod
+    def _to_lists(embeddings: Embeddings) -> List[List[float]]:
+        """Convert embeddings to lists of floats in one pass, at the client boundary."""
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1).tolist()
+    
+    @staticmethod
+    def _condition(key: str, operator: str, operand: Any) -> Dict[str, Any]:
+        """Chroma clause for one ``parse_filters`` condition."""
+        operands = operand if operator == "in" else [operand]
+        for value in operands:
+            if not isinstance(value, SCALAR_TYPES):
+                raise ValueError(
+                    f"Chroma filters only support str, int, float and bool values, got {value!r} for {key!r}"
+                )
+        if operator not in ("eq", "in"):
+            if isinstance(operand, (str, bool)):
+                raise ValueError(f"Chroma range filters only support int and float bounds, got {operand!r} for {key!r}")
+            # Lists are stored as JSON strings, which numeric ranges never match
+            return {key: {f"${operator}": operand}}
+        # A scalar field equal to a value, or a list field containing it
+        clauses = [{key: {f"${operator}": operand}}]
+        clauses += [{contains_key(key, value): {"$eq": True}} for value in operands]
+        return {"$or": clauses}
+    
+    @classmethod
+    def _to_where(cls, filters: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Translate the filter DSL (see ``parse_filters``) into a Chroma ``where`` clause.
+        
+        Returns:
+            The clause (None without filters), and whether the filter can match
+            nothing at all (an empty any-of list), so Chroma need not be asked
+        
+        Raises:
+            ValueError: For filter values Chroma metadata cannot hold
+        """
+        conditions = parse_filters(filters)
+        if any(operator == "in" and not operand for _, operator, operand in conditions):
+            return None, True
+        clauses = [cls._condition(key, operator, operand) for key, operator, operand in conditions]
+        if not clauses:
+            return None, False
+        if len(clauses) == 1:
+            return clauses[0], False
+        return {"$and": clauses}, False
+    
     def delete(self, ids: List[str]) -> None:
-        self.collection.delete(ids=ids) 
\ No newline at end of file
+        self.collection.delete(ids=ids)
+    
+    def list_ids(self, filters: Dict[str, Any] = None) -> List[str]:
+        where, matches_nothing = self._to_where(filters)
+        if matches_nothing:
+            return []
+        return self.collection.get(where=where, include=[])["ids"]
@@ -0,0 +1,53 @@
+from typing import Dict, Any
+from databases.base import VectorDatabase
+
+def create_vector_database(config: Dict[str, Any], collection_name: str = None) -> VectorDatabase:
+    """
+    Create and connect the vector database selected by ``databases.backend``.
+    
+    Adapters are imported lazily so only the selected backend's client
+    library needs to be installed.
+    
+    Args:
+        config: Full application config (see config/config.yaml)
+        collection_name: Override for the backend's configured collection name
+        
+    Returns:
+        Connected VectorDatabase
+    """
+    backend = config['databases'].get('backend', 'qdrant')
+    backend_config = config['databases'][backend]
+    collection_name = collection_name or backend_config['collection_name']
+    
+    if backend == 'qdrant':
+        from databases.qdrant_db import QdrantAdapter
+        vector_db = QdrantAdapter(
+            collection_name=collection_name,
+            vector_size=backend_config['vector_size'],
+            host=backend_config['host'],
+            port=backend_config['port'],
+            distance=backend_config.get('distance', 'cosine'),
+            payload_indexes=backend_config.get('payload_indexes')
+        )
+    elif backend == 'chroma':
+        from databases.chroma_db import ChromaDBAdapter
+        vector_db = ChromaDBAdapter(
+            collection_name=collection_name,
+            persist_directory=backend_config.get('persist_directory')
+        )
+    elif backend == 'numpy':
+        from databases.numpy_db import NumpyAdapter
+        vector_db = NumpyAdapter(
+            collection_name=collection_name,
+            vector_size=backend_config['vector_size'],
+            persist_directory=backend_config.get('persist_directory'),
+            dtype=backend_config.get('dtype', 'float32'),
+            index_type=backend_config.get('index_type'),
+            ivf_min_size=backend_config.get('ivf_min_size', 50_000),
+            nprobe=backend_config.get('nprobe', 8)
+        )
+    else:
+        raise ValueError(f"Unknown vector database backend: {backend}")
+    
+    vector_db.connect()
+    return vector_db
@@ -0,0 +1,240 @@
+import json
+import os
+from typing import List, Dict, Any, Union
+import numpy as np
+from databases.base import VectorDatabase, Embedding, Embeddings, parse_filters, matches_filters
+
+class NumpyAdapter(VectorDatabase):
+    """
+    In-process vector store backed by a contiguous NumPy matrix.
+
+    Vectors are L2-normalised on insert so cosine similarity is a single
+    matrix product, and top-k uses ``argpartition`` instead of a full sort.
+    Vectors can be stored as float32, float16 or int8 (scaled by 127) to trade
+    precision for memory. For large collections an optional IVF index
+    (k-means coarse quantiser) restricts each search to the ``nprobe`` closest
+    clusters. Like Qdrant, results report cosine similarity as ``distance``.
+
+    With ``persist_directory`` set, ``save()`` writes the matrix as ``.npy`` and
+    ``connect()`` memory-maps it back, so reopening a collection is instant.
+    """
+
+    def __init__(self, collection_name: str, vector_size: int = 384, persist_directory: str = None,
+                 dtype: str = "float32", index_type: str = None, ivf_min_size: int = 50_000,
+                 nlist: int = None, nprobe: int = 8):
+        """
+        Args:
+            collection_name: Name used for the persisted files
+            vector_size: Embedding dimension
+            persist_directory: Directory to save/load the collection (None keeps it in memory)
+            dtype: Storage type, one of "float32", "float16" or "int8"
+            index_type: None for exact search or "ivf" for an inverted-file index
+            ivf_min_size: Collections smaller than this are always searched exactly
+            nlist: Number of IVF clusters (defaults to sqrt of the collection size)
+            nprobe: Number of IVF clusters searched per query
+        """
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        if index_type not in (None, "ivf"):
+            raise ValueError(f"Unsupported index type: {index_type}")
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+        self.persist_directory = persist_directory
+        self.dtype = np.dtype(dtype)
+        self.index_type = index_type
+        self.ivf_min_size = ivf_min_size
+        self.nlist = nlist
+        self.nprobe = nprobe
+
+        self.vectors = np.empty((0, vector_size), dtype=self.dtype)
+        self.size = 0
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self._centroids = None
+        self._clusters = None
+
+    def _paths(self) -> tuple:
+        base = os.path.join(self.persist_directory, self.collection_name)
+        return f"{base}.vectors.npy", f"{base}.meta.json"
+
+    def connect(self) -> None:
+        if not self.persist_directory:
+            return
+        vectors_path, meta_path = self._paths()
+        if not (os.path.exists(vectors_path) and os.path.exists(meta_path)):
+            return
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        self.vectors = np.load(vectors_path, mmap_mode="r")
+        self.dtype = self.vectors.dtype
+        self.ids = meta["ids"]
+        self.texts = meta["texts"]
+        self.metadata = meta["metadata"]
+        self.size = len(self.ids)
+        self.id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._invalidate_index()
+
+    def save(self) -> None:
+        """Persist the collection to ``persist_directory`` (no-op for in-memory collections)."""
+        if not self.persist_directory:
+            return
+        os.makedirs(self.persist_directory, exist_ok=True)
+        vectors_path, meta_path = self._paths()
+        # Write to temporary files first: the current matrix may be memory-mapped from vectors_path
+        np.save(f"{vectors_path}.tmp.npy", np.ascontiguousarray(self.vectors[:self.size]))
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "metadata": self.metadata}, f)
+        os.replace(f"{vectors_path}.tmp.npy", vectors_path)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def _quantize(self, embeddings: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        normalized = embeddings / np.maximum(norms, 1e-12)
+        if self.dtype == np.int8:
+            return np.round(normalized * 127).astype(np.int8)
+        return normalized.astype(self.dtype)
+
+    def _ensure_capacity(self, needed: int) -> None:
+        """Grow the matrix geometrically; also detaches it from a read-only memory map."""
+        if needed <= self.vectors.shape[0] and not isinstance(self.vectors, np.memmap):
+            return
+        capacity = max(needed, 2 * self.vectors.shape[0], 1024)
+        grown = np.empty((capacity, self.vector_size), dtype=self.dtype)
+        grown[:self.size] = self.vectors[:self.size]
+        self.vectors = grown
+
+    def insert(self, texts: List[str], embeddings: Embeddings, metadata: List[Dict[str, Any]] = None,
+               ids: List[Union[int, str]] = None) -> None:
+        if metadata is None:
+            metadata = [{} for _ in texts]
+        if ids is None:
+            ids = list(range(len(texts)))
+
+        quantized = self._quantize(np.asarray(embeddings, dtype=np.float32).reshape(len(texts), self.vector_size))
+        self._ensure_capacity(self.size + len(texts))
+        for doc_id, text, meta, vector in zip(ids, texts, metadata, quantized):
+            doc_id = str(doc_id)
+            row = self.id_to_row.get(doc_id)
+            if row is None:
+                row = self.size
+                self.size += 1
+                self.ids.append(doc_id)
+                self.texts.append(text)
+                self.metadata.append(meta)
+                self.id_to_row[doc_id] = row
+            else:
+                self.texts[row] = text
+                self.metadata[row] = meta
+            self.vectors[row] = vector
+        self._invalidate_index()
+
+    def delete(self, ids: List[str]) -> None:
+        self._ensure_capacity(self.size)
+        for doc_id in ids:
+            row = self.id_to_row.pop(str(doc_id), None)
+            if row is None:
+                continue
+            # Move the last row into the hole to keep the matrix contiguous
+            last = self.size - 1
+            if row != last:
+                self.vectors[row] = self.vectors[last]
+                self.ids[row] = self.ids[last]
+                self.texts[row] = self.texts[last]
+                self.metadata[row] = self.metadata[last]
+                self.id_to_row[self.ids[row]] = row
+            self.ids.pop()
+            self.texts.pop()
+            self.metadata.pop()
+            self.size -= 1
+        self._invalidate_index()
+
+    def list_ids(self, filters: Dict[str, Any] = None) -> List[str]:
+        if not filters:
+            return list(self.ids)
+        return [self.ids[row] for row in np.flatnonzero(self._filter_mask(filters))]
+
+    def _invalidate_index(self) -> None:
+        self._centroids = None
+        self._clusters = None
+
+    def _build_ivf(self) -> None:
+        """Cluster the stored vectors with a few rounds of k-means."""
+        data = np.asarray(self.vectors[:self.size], dtype=np.float32)
+        nlist = self.nlist or max(1, int(np.sqrt(self.size)))
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(self.size, nlist, replace=False)].copy()
+        sample = data[rng.choice(self.size, min(self.size, nlist * 256), replace=False)]
+        for _ in range(10):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[cluster] = centroid / max(np.linalg.norm(centroid), 1e-12)
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        self._centroids = centroids
+        self._clusters = [np.flatnonzero(assignment == cluster) for cluster in range(nlist)]
+
+    def _filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask of rows whose metadata matches ``filters`` (see ``parse_filters``)."""
+        conditions = parse_filters(filters)
+        return np.fromiter((matches_filters(meta, conditions) for meta in self.metadata), dtype=bool, count=self.size)
+
+    def _candidate_rows(self, query: np.ndarray) -> np.ndarray:
+        """Rows belonging to the nprobe IVF clusters closest to a query."""
+        if self._centroids is None:
+            self._build_ivf()
+        nprobe = min(self.nprobe, len(self._clusters))
+        closest = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self._clusters[cluster] for cluster in closest])
+
+    def _top_k(self, scores: np.ndarray, rows: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        return [
+            {
+                "id": self.ids[rows[i]],
+                "text": self.texts[rows[i]],
+                "metadata": self.metadata[rows[i]],
+                "distance": float(scores[i])
+            }
+            for i in best
+        ]
+
+    def search(self, query_embedding: Embedding, top_k: int = 5,
+               filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        return self.search_batch(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1), top_k=top_k,
+                                 filters=filters)[0]
+
+    def search_batch(self, query_embeddings: Embeddings, top_k: int = 5,
+                     filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.vector_size)
+        # Not in place: the array may be the caller's (e.g. a cached query embedding)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        if self.size == 0:
+            return [[] for _ in queries]
+
+        scale = 1 / 127 if self.dtype == np.int8 else 1.0
+        mask = self._filter_mask(filters) if filters else None
+        all_rows = np.arange(self.size) if mask is None else np.flatnonzero(mask)
+
+        # Exact search scores every query against the whole matrix in one product
+        if self.index_type != "ivf" or self.size < self.ivf_min_size:
+            stored = self.vectors[:self.size] if mask is None else self.vectors[all_rows]
+            matrix = np.asarray(stored, dtype=np.float32)
+            scores = (queries @ matrix.T) * scale
+            return [self._top_k(query_scores, all_rows, top_k) for query_scores in scores]
+
+        results = []
+        for query in queries:
+            rows = self._candidate_rows(query)
+            if mask is not None:
+                rows = rows[mask[rows]]
+            scores = (np.asarray(self.vectors[rows], dtype=np.float32) @ query) * scale
+            results.append(self._top_k(scores, rows, top_k))
+        return results
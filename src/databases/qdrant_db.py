@@ -1,12 +1,28 @@
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from typing import List, Dict, Any
-from databases.base import VectorDatabase
+from typing import List, Dict, Any, Union
+import numpy as np
+from databases.base import VectorDatabase, Embedding, Embeddings, parse_filters
 
 class QdrantAdapter(VectorDatabase):
-    def __init__(self, collection_name: str, vector_size: int = 384, host: str = "localhost", port: int = 6333):
+    def __init__(self, collection_name: str, vector_size: int = 384, host: str = "localhost", port: int = 6333,
+                 distance: str = "cosine", payload_indexes: Dict[str, str] = None):
+        """
+        Args:
+            collection_name: Collection to store points in
+            vector_size: Embedding dimension
+            host: Qdrant host
+            port: Qdrant port
+            distance: Metric of a newly created collection: "cosine", or "dot"
+                for unit-length embeddings (same ranking, no normalization)
+            payload_indexes: Payload field -> index type ("keyword", "integer",
+                "float", "bool", ...) created on connect, so filtered searches
+                are resolved inside the HNSW traversal
+        """
         self.collection_name = collection_name
         self.vector_size = vector_size
+        self.distance = distance
+        self.payload_indexes = payload_indexes or {}
         self.host = host
         self.port = port
         self.client = None
@@ -22,47 +38,93 @@ class QdrantAdapter(VectorDatabase):
                 collection_name=self.collection_name,
                 vectors_config=models.VectorParams(
                     size=self.vector_size,
-                    distance=models.Distance.COSINE
+                    distance=models.Distance.DOT if self.distance == "dot" else models.Distance.COSINE
                 )
             )
 
-    def insert(self, texts: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]] = None) -> None:
+        # Index filterable payload fields that are not indexed yet
+        indexed = self.client.get_collection(self.collection_name).payload_schema or {}
+        for field_name, field_type in self.payload_indexes.items():
+            if field_name not in indexed:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=models.PayloadSchemaType(field_type)
+                )
+
+    def insert(self, texts: List[str], embeddings: Embeddings, metadata: List[Dict[str, Any]] = None,
+               ids: List[Union[int, str]] = None) -> None:
         if metadata is None:
             metadata = [{} for _ in texts]
+        if ids is None:
+            ids = list(range(len(texts)))
 
-        # Add text to metadata for retrieval
-        for i, text in enumerate(texts):
-            metadata[i]["text"] = text
-
-        points = [
-            models.PointStruct(
-                id=i,
-                vector=embedding,
-                payload=metadata[i]
-            )
-            for i, (embedding, meta) in enumerate(zip(embeddings, metadata))
-        ]
+        # Store the text in the payload for retrieval, leaving the caller's dicts untouched
+        payloads = [{**(meta or {}), "text": text} for text, meta in zip(texts, metadata)]
 
+        # One columnar batch instead of a PointStruct per point; the client needs plain lists
         self.client.upsert(
             collection_name=self.collection_name,
-            points=points
+            points=models.Batch(
+                ids=list(ids),
+                vectors=self._to_lists(embeddings),
+                payloads=payloads
+            )
         )
 
-    def search(self, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query_embedding: Embedding, top_k: int = 5,
+               filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         results = self.client.search(
             collection_name=self.collection_name,
-            query_vector=query_embedding,
+            query_vector=self._to_lists([query_embedding])[0],
+            query_filter=self._to_filter(filters),
             limit=top_k
         )
         
-        return [
-            {
-                "text": hit.payload["text"],
-                "metadata": {k: v for k, v in hit.payload.items() if k != "text"},
-                "distance": hit.score
-            }
-            for hit in results
-        ]
+        return [self._hit_to_result(hit) for hit in results]
+
+    def search_batch(self, query_embeddings: Embeddings, top_k: int = 5,
+                     filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Search for several query embeddings in one request."""
+        query_filter = self._to_filter(filters)
+        results = self.client.search_batch(
+            collection_name=self.collection_name,
+            requests=[
+                models.SearchRequest(vector=embedding, filter=query_filter, limit=top_k, with_payload=True)
+                for embedding in self._to_lists(query_embeddings)
+            ]
+        )
+        return [[self._hit_to_result(hit) for hit in hits] for hits in results]
+
+    @staticmethod
+    def _to_lists(embeddings: Embeddings) -> List[List[float]]:
+        """Convert embeddings to lists of floats in one pass, at the client boundary."""
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1).tolist()
+
+    @staticmethod
+    def _to_filter(filters: Dict[str, Any]) -> models.Filter:
+        """Translate the filter DSL (see ``parse_filters``) into a Qdrant filter."""
+        conditions = []
+        ranges = {}
+        for key, operator, operand in parse_filters(filters):
+            if operator == "eq":
+                conditions.append(models.FieldCondition(key=key, match=models.MatchValue(value=operand)))
+            elif operator == "in":
+                conditions.append(models.FieldCondition(key=key, match=models.MatchAny(any=operand)))
+            else:
+                ranges.setdefault(key, {})[operator] = operand
+        for key, bounds in ranges.items():
+            conditions.append(models.FieldCondition(key=key, range=models.Range(**bounds)))
+        return models.Filter(must=conditions) if conditions else None
+
+    @staticmethod
+    def _hit_to_result(hit: models.ScoredPoint) -> Dict[str, Any]:
+        return {
+            "id": str(hit.id),
+            "text": hit.payload["text"],
+            "metadata": {k: v for k, v in hit.payload.items() if k != "text"},
+            "distance": hit.score
+        }
 
     def delete(self, ids: List[str]) -> None:
         self.client.delete(
@@ -70,4 +132,20 @@ class QdrantAdapter(VectorDatabase):
             points_selector=models.PointIdsList(
                 points=ids
             )
-        ) 
\ No newline at end of file
+        )
+
+    def list_ids(self, filters: Dict[str, Any] = None) -> List[str]:
+        ids = []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self._to_filter(filters),
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            ids.extend(str(point.id) for point in points)
+            if offset is None:
+                return ids
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Dict, Any, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): only safe for one process per cache directory
+    fcntl = None
+
+class EmbeddingCache:
+    """
+    Persistent LRU cache of embeddings keyed by (model name, text hash).
+
+    Vectors live in a memory-mapped float32 matrix of ``max_entries`` rows and
+    a JSON index maps each text hash to its row, in least-recently-used order.
+    When the cache is full the least recently used row is overwritten.
+
+    Every write is appended to a journal, so it costs O(new entries). The
+    full index, including the LRU order of hits, is rewritten once the
+    journal reaches ``journal_max_entries`` and on ``close``.
+
+    All methods are thread-safe, and several processes may share one cache
+    directory: row allocation, reads and index rewrites hold an ``flock`` on
+    a lock file, and each process replays the journal entries of the others
+    before using its index. An evicted row is released in the journal before
+    it is overwritten and claimed only after, so a crash never leaves an
+    entry pointing at another text's vector.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, dim: int, max_entries: int = 100_000,
+                 journal_max_entries: int = None):
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max_entries
+        self.journal_max_entries = journal_max_entries or max(1024, max_entries // 10)
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.matrix_path = os.path.join(cache_dir, f"{safe_name}.f32")
+        self.index_path = os.path.join(cache_dir, f"{safe_name}.index.json")
+        self.journal_path = os.path.join(cache_dir, f"{safe_name}.journal")
+        self.lock_path = os.path.join(cache_dir, f"{safe_name}.lock")
+
+        # key -> row, ordered from least to most recently used
+        self.index: "OrderedDict[str, int]" = OrderedDict()
+        self.free_rows: List[int] = []
+        # Identity of the index file the in-memory index was loaded from, and
+        # the journal bytes and entries applied on top of it
+        self._index_version: Optional[Tuple[int, int, int]] = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        # Whether rows were written since the matrix was last flushed
+        self._dirty = False
+        # Guards the in-memory index, row allocation and counters within this process
+        self._lock = threading.Lock()
+        self._lock_file = open(self.lock_path, "a+")
+        with self._file_lock():
+            self._load()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = True) -> Iterator[None]:
+        """Hold the inter-process lock of the cache directory."""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> None:
+        """Open the matrix file and index, resetting them if the layout changed (caller holds the file lock)."""
+        index = None
+        if os.path.exists(self.index_path) and os.path.exists(self.matrix_path):
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if index.get("dim") != self.dim or index.get("max_entries") != self.max_entries:
+                index = None
+
+        mode = "r+" if index is not None else "w+"
+        self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode=mode,
+                                shape=(self.max_entries, self.dim))
+
+        if index is None:
+            # Start a fresh index file so the journal has a base to replay onto
+            self.index = OrderedDict()
+            self._write_index()
+        else:
+            self.index = OrderedDict((key, row) for key, row in index["entries"])
+            self._index_version = self._stat_index()
+            self._journal_offset = 0
+            self._journal_entries = 0
+            self._replay_journal()
+        self._rebuild_free_rows()
+
+    def _stat_index(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _rebuild_free_rows(self) -> None:
+        used_rows = set(self.index.values())
+        self.free_rows = [row for row in range(self.max_entries - 1, -1, -1) if row not in used_rows]
+
+    def _replay_journal(self) -> int:
+        """Apply the journal entries written since the last replay, returning how many there were."""
+        if not os.path.exists(self.journal_path):
+            return 0
+        applied = 0
+        row_owners = None
+        with open(self.journal_path, "r") as f:
+            f.seek(self._journal_offset)
+            while True:
+                line = f.readline()
+                if not line.endswith("\n"):
+                    # End of file, or the torn last line of an interrupted append
+                    break
+                self._journal_offset = f.tell()
+                try:
+                    key, row = json.loads(line)
+                except ValueError:
+                    # A torn append completed by a newline (see _append_journal)
+                    continue
+                if row_owners is None:
+                    row_owners = {row: key for key, row in self.index.items()}
+                if row is None:
+                    # The row was released for eviction; its new owner follows once written
+                    row_owners.pop(self.index.pop(key, None), None)
+                else:
+                    owner = row_owners.get(row)
+                    if owner is not None and owner != key:
+                        del self.index[owner]
+                    self.index[key] = row
+                    self.index.move_to_end(key)
+                    row_owners[row] = key
+                applied += 1
+        self._journal_entries += applied
+        return applied
+
+    def _refresh(self) -> None:
+        """Catch up with writes by other processes (caller holds both locks)."""
+        if self._stat_index() != self._index_version:
+            # Another process rewrote the index and truncated the journal
+            self._load()
+        elif self._replay_journal():
+            self._rebuild_free_rows()
+
+    def _append_journal(self, entries: List[Tuple[str, Optional[int]]]) -> None:
+        """Append entries to the journal (caller holds the exclusive file lock)."""
+        with open(self.journal_path, "a+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(f.tell() - 1)
+                if f.read(1) != "\n":
+                    # Terminate the torn last line of an interrupted append
+                    f.write("\n")
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+            self._journal_offset = f.tell()
+        self._journal_entries += len(entries)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Return cached vectors for ``texts``, with None for each miss."""
+        keys = [self._key(text) for text in texts]
+        results = []
+        with self._lock, self._file_lock(exclusive=False):
+            self._refresh()
+            for key in keys:
+                row = self.index.get(key)
+                if row is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    self.index.move_to_end(key)
+                    results.append(np.array(self.matrix[row]))
+        return results
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray) -> None:
+        """Store vectors for ``texts``, evicting least recently used rows if full."""
+        keys = [self._key(text) for text in texts]
+        with self._lock, self._file_lock():
+            self._refresh()
+            rows = {}
+            released = []
+            for key in dict.fromkeys(keys):
+                row = self.index.pop(key, None)
+                if row is not None:
+                    # Rewritten in place: release it first like an evicted row
+                    released.append((key, None))
+                elif self.free_rows:
+                    row = self.free_rows.pop()
+                elif self.index:
+                    evicted_key, row = self.index.popitem(last=False)
+                    released.append((evicted_key, None))
+                else:
+                    # More texts than rows: the earliest of this call are not kept
+                    row = rows.pop(next(iter(rows)))
+                rows[key] = row
+            if released:
+                self._append_journal(released)
+            for key, embedding in zip(keys, embeddings):
+                if key in rows:
+                    self.matrix[rows[key]] = embedding
+            for key, row in rows.items():
+                self.index[key] = row
+            self._append_journal(list(rows.items()))
+            self._dirty = True
+
+    def save(self) -> None:
+        """Flush the matrix, compacting the journal into the index file once it is large."""
+        with self._lock:
+            if not self._dirty:
+                return
+            with self._file_lock():
+                self.matrix.flush()
+                self._dirty = False
+                self._refresh()
+                if self._journal_entries > self.journal_max_entries:
+                    self._write_index()
+
+    def close(self) -> None:
+        """Flush the matrix and rewrite the index file, emptying the journal."""
+        with self._lock, self._file_lock():
+            self.matrix.flush()
+            self._dirty = False
+            self._refresh()
+            self._write_index()
+
+    def _write_index(self) -> None:
+        """Atomically rewrite the index file and truncate the journal (caller holds both locks)."""
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "model_name": self.model_name,
+                "dim": self.dim,
+                "max_entries": self.max_entries,
+                "entries": list(self.index.items())
+            }, f)
+        os.replace(tmp_path, self.index_path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._index_version = self._stat_index()
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.index),
+                "max_entries": self.max_entries
+            }
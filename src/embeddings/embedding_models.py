@@ -1,12 +1,139 @@
-from sentence_transformers import SentenceTransformer
-from typing import List, Union
+from typing import List, Optional, Union
+import numpy as np
+from embeddings.embedding_cache import EmbeddingCache
+from embeddings.encode_pool import MultiProcessEncoder
 
 class EmbeddingModel:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", cache_dir: str = None,
+                 cache_max_entries: int = 100_000, num_workers: int = 0, devices: List[str] = None,
+                 max_seq_length: Optional[int] = None, worker_batch_size: int = 32,
+                 multi_process_min_texts: int = None, backend: str = "torch", onnx_dir: str = None,
+                 onnx_quantized: bool = False, normalize: bool = False):
+        """
+        Args:
+            model_name: SentenceTransformer model name
+            cache_dir: Directory of the persistent embedding cache (None disables it)
+            cache_max_entries: Max cached embeddings
+            num_workers: Encode large jobs on this many worker processes (0 or 1 encodes in-process)
+            devices: Devices of the worker processes, round-robin (default: CPU)
+            max_seq_length: Truncate inputs to this many tokens (None keeps the model's default)
+            worker_batch_size: Texts per forward pass and per task on the workers
+            multi_process_min_texts: Smallest job sent to the workers (default: one batch per
+                worker); smaller jobs are not worth the inter-process overhead
+            backend: "torch" (SentenceTransformer) or "onnx" (onnxruntime, no torch import)
+            onnx_dir: Model directory written by ``embeddings.onnx_backend.export_onnx``
+            onnx_quantized: Use the dynamic int8 ONNX graph
+            normalize: Return unit-length embeddings by default
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.onnx_quantized = onnx_quantized
+        if backend == "onnx":
+            from embeddings.onnx_backend import OnnxEncoder
+            self.model = OnnxEncoder(onnx_dir, quantized=onnx_quantized)
+            # Keep embeddings of each numeric variant apart in the cache
+            cache_model_name = f"{model_name}@onnx-{'int8' if onnx_quantized else 'fp32'}"
+        elif backend == "torch":
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(model_name)
+            cache_model_name = model_name
+        else:
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+        if max_seq_length:
+            self.model.max_seq_length = max_seq_length
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.normalize = normalize
+        self.num_workers = num_workers
+        self.devices = devices
+        self.max_seq_length = max_seq_length
+        self.worker_batch_size = worker_batch_size
+        self.multi_process_min_texts = multi_process_min_texts or num_workers * worker_batch_size
+        self._pool: Optional[MultiProcessEncoder] = None
+        self.cache = None
+        if cache_dir:
+            self.cache = EmbeddingCache(
+                cache_dir,
+                cache_model_name,
+                dim=self.dimension,
+                max_entries=cache_max_entries
+            )
     
-    def encode(self, texts: Union[str, List[str]]) -> List[List[float]]:
-        """Generate embeddings for input texts."""
+    def count_tokens(self, text: str) -> int:
+        """Number of the model's tokens in ``text``, without special tokens or truncation."""
+        if self.backend == "onnx":
+            return self.model.count_tokens(text)
+        return len(self.model.tokenizer.tokenize(text))
+    
+    @property
+    def max_text_tokens(self) -> int:
+        """Tokens of text embedded before the model truncates, i.e. ``max_seq_length`` minus special tokens."""
+        if self.backend == "onnx":
+            special_tokens = self.model.num_special_tokens
+        else:
+            special_tokens = self.model.tokenizer.num_special_tokens_to_add()
+        return self.model.max_seq_length - special_tokens
+    
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """Encode in-process, or on the worker pool for jobs large enough to split."""
+        if self.num_workers <= 1 or len(texts) < self.multi_process_min_texts:
+            return self.model.encode(texts, batch_size=batch_size)
+        if self._pool is None:
+            # Workers take a while to load the model, so the pool is started once and reused
+            self._pool = MultiProcessEncoder(
+                self.model_name,
+                num_workers=self.num_workers,
+                devices=self.devices,
+                batch_size=self.worker_batch_size,
+                max_seq_length=self.max_seq_length,
+                onnx_dir=self.onnx_dir if self.backend == "onnx" else None,
+                onnx_quantized=self.onnx_quantized
+            )
+        return self._pool.encode(texts)
+    
+    def close(self) -> None:
+        """Stop the worker processes, if any were started, and compact the cache index."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        if self.cache is not None:
+            self.cache.close()
+    
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32,
+               normalize: Optional[bool] = None) -> np.ndarray:
+        """
+        Generate embeddings for input texts.
+        
+        Args:
+            texts: Text or texts to embed
+            batch_size: Texts per forward pass
+            normalize: Scale rows to unit length, so cosine similarity is a dot
+                product (default: the model's ``normalize`` setting)
+        
+        Returns:
+            C-contiguous float32 array of shape (len(texts), dimension)
+        """
         if isinstance(texts, str):
             texts = [texts]
-        return self.model.encode(texts).tolist() 
\ No newline at end of file
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        
+        if self.cache is None:
+            embeddings = np.ascontiguousarray(self._encode(texts, batch_size), dtype=np.float32)
+        else:
+            # Serve hits from the cache and embed all misses in a single call
+            cached = self.cache.get_many(texts)
+            missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+            computed = {}
+            if missing:
+                missing_embeddings = np.asarray(self._encode(missing, batch_size), dtype=np.float32)
+                self.cache.put_many(missing, missing_embeddings)
+                self.cache.save()
+                computed = dict(zip(missing, missing_embeddings))
+            embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+            for row, (text, vector) in enumerate(zip(texts, cached)):
+                embeddings[row] = computed[text] if vector is None else vector
+        
+        if self.normalize if normalize is None else normalize:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings
@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+import numpy as np
+
+# Model of the current worker process, set by _init_worker
+_worker_model = None
+
+def _init_worker(model_name: str, devices, max_seq_length: Optional[int], num_threads: int,
+                 onnx_dir: Optional[str], onnx_quantized: bool) -> None:
+    global _worker_model
+    if onnx_dir:
+        from embeddings.onnx_backend import OnnxEncoder
+        _worker_model = OnnxEncoder(onnx_dir, quantized=onnx_quantized, num_threads=num_threads)
+    else:
+        try:
+            import torch
+            torch.set_num_threads(num_threads)
+        except ImportError:
+            pass
+        from sentence_transformers import SentenceTransformer
+        # Every worker takes the next device from the shared queue
+        _worker_model = SentenceTransformer(model_name, device=devices.get())
+    if max_seq_length:
+        _worker_model.max_seq_length = max_seq_length
+
+def _encode_chunk(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+class MultiProcessEncoder:
+    """
+    Shard encode jobs across a pool of processes, each holding its own model copy.
+
+    Texts are processed in windows of ``window_size`` in input order. Within a
+    window they are sorted by length and cut into chunks of ``batch_size``, so
+    each batch pads to similar lengths and every worker gets equally sized
+    work. Windows are reassembled in input order. Up to ``max_pending_windows``
+    windows are in flight, so memory stays bounded while workers stay busy.
+    On CPU each worker uses ``cpu_count // num_workers`` threads to avoid
+    oversubscription.
+    """
+
+    def __init__(self, model_name: str, num_workers: int = None, devices: List[str] = None,
+                 batch_size: int = 32, max_seq_length: Optional[int] = None,
+                 window_size: int = 4096, max_pending_windows: int = 2, onnx_dir: Optional[str] = None,
+                 onnx_quantized: bool = False):
+        """
+        Args:
+            model_name: SentenceTransformer model to load in every worker
+            num_workers: Worker processes (default: one per device, or one per CPU core)
+            devices: Devices assigned to workers round-robin, e.g. ["cuda:0", "cuda:1"] (default: CPU)
+            batch_size: Texts per model forward pass and per task sent to a worker
+            max_seq_length: Truncate inputs to this many tokens (None keeps the model's default)
+            window_size: Texts sorted and reassembled together
+            max_pending_windows: Windows submitted ahead of the one being returned
+            onnx_dir: Run this ``OnnxEncoder`` model directory instead of PyTorch (CPU only)
+            onnx_quantized: Use the int8 ONNX graph
+        """
+        devices = devices or ["cpu"]
+        self.num_workers = num_workers or (len(devices) if devices != ["cpu"] else os.cpu_count() or 1)
+        self.batch_size = batch_size
+        self.window_size = window_size
+        self.max_pending_windows = max_pending_windows
+
+        # spawn: forking a process that already runs torch threads can deadlock
+        context = multiprocessing.get_context("spawn")
+        device_queue = context.Queue()
+        for i in range(self.num_workers):
+            device_queue.put(devices[i % len(devices)])
+        num_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_name, device_queue, max_seq_length, num_threads, onnx_dir, onnx_quantized)
+        )
+
+    def __enter__(self) -> "MultiProcessEncoder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def _submit_window(self, texts: List[str]):
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        futures = [
+            self.executor.submit(_encode_chunk, [texts[i] for i in order[start:start + self.batch_size]], self.batch_size)
+            for start in range(0, len(order), self.batch_size)
+        ]
+        return order, futures
+
+    @staticmethod
+    def _collect_window(order: List[int], futures) -> np.ndarray:
+        sorted_embeddings = np.concatenate([future.result() for future in futures])
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
+
+    def encode_stream(self, texts: Iterable[str]) -> Iterator[np.ndarray]:
+        """Yield float32 embedding arrays of consecutive windows of ``texts``, in input order."""
+        pending = deque()
+        window = []
+        for text in texts:
+            window.append(text)
+            if len(window) == self.window_size:
+                pending.append(self._submit_window(window))
+                window = []
+                if len(pending) > self.max_pending_windows:
+                    yield self._collect_window(*pending.popleft())
+        if window:
+            pending.append(self._submit_window(window))
+        while pending:
+            yield self._collect_window(*pending.popleft())
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` into a float32 array, one row per text in input order."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(list(self.encode_stream(texts)))
@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+
+VALIDATION_TEXTS = [
+    "Table 'books' with columns: book_id (INTEGER) (Primary Key), title (VARCHAR) (Required)",
+    "Column 'retail_price' (NUMERIC(10, 2)) of table 'inventory'",
+    "Dataset: imdb\nTasks: text-classification\nTags: sentiment, movies",
+    "A large-scale corpus of question-answer pairs collected from web forums.",
+    "book.author.first_name: str",
+    "translation",
+]
+
+class OnnxEncoder:
+    """
+    CPU sentence encoder running an exported ONNX transformer with onnxruntime.
+
+    Needs only ``onnxruntime``, ``tokenizers`` and NumPy at runtime, so torch
+    is never imported. The model directory is a saved SentenceTransformer
+    (see ``export_onnx``). Pooling and normalization follow its
+    ``1_Pooling/config.json`` and ``modules.json``, so the embeddings match
+    the PyTorch model's. Texts are length-sorted into batches to minimise
+    padding.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, max_seq_length: Optional[int] = None,
+                 num_threads: Optional[int] = None):
+        """
+        Args:
+            model_dir: Directory written by ``export_onnx``
+            quantized: Run the dynamic int8 graph instead of the fp32 one
+            max_seq_length: Truncate inputs to this many tokens (default: the model's setting)
+            num_threads: onnxruntime intra-op threads (default: all cores)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, ONNX_INT8_FILE if quantized else ONNX_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found; create it with "
+                f"python -m embeddings.onnx_backend export --model MODEL --output {model_dir}"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+        with open(os.path.join(model_dir, "1_Pooling", "config.json"), "r") as f:
+            pooling = json.load(f)
+        self.dimension = pooling["word_embedding_dimension"]
+        self.pooling_mode = "cls" if pooling.get("pooling_mode_cls_token") else "mean"
+        with open(os.path.join(model_dir, "modules.json"), "r") as f:
+            self.normalize = any(module["type"].endswith("Normalize") for module in json.load(f))
+
+        if max_seq_length is None:
+            with open(os.path.join(model_dir, "sentence_bert_config.json"), "r") as f:
+                max_seq_length = json.load(f).get("max_seq_length", 512)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.max_seq_length = max_seq_length
+        self.tokenizer.no_padding()
+        # Counts tokens of whole texts, so it must not truncate like the encoding tokenizer
+        self._counting_tokenizer = Tokenizer.from_str(self.tokenizer.to_str())
+        self._counting_tokenizer.no_truncation()
+        self.num_special_tokens = len(self._counting_tokenizer.encode("").ids)
+
+    @property
+    def max_seq_length(self) -> int:
+        return self._max_seq_length
+
+    @max_seq_length.setter
+    def max_seq_length(self, value: int) -> None:
+        self._max_seq_length = value
+        self.tokenizer.enable_truncation(max_length=value)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def count_tokens(self, text: str) -> int:
+        """Number of tokens in ``text``, without special tokens or truncation."""
+        return len(self._counting_tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        length = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.zeros((len(texts), length), dtype=np.int64)
+        attention_mask = np.zeros((len(texts), length), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask,
+                 "token_type_ids": np.zeros_like(input_ids)}
+        hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+
+        if self.pooling_mode == "cls":
+            embeddings = hidden[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            embeddings = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings.astype(np.float32)
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Embed ``texts`` into a float32 array, one row per text in input order."""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._encode_batch([texts[i] for i in rows])
+        return embeddings
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True, opset: int = 17) -> None:
+    """
+    Save ``model_name`` with its tokenizer/pooling config and export the transformer to ONNX.
+
+    Needs torch and sentence-transformers, plus ``onnx`` for the int8 graph;
+    only this offline step does.
+
+    Args:
+        model_name: SentenceTransformer model name or path
+        output_dir: Model directory for ``OnnxEncoder``
+        quantize: Also write a dynamically int8-quantized graph
+        opset: ONNX opset version
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    model.save(output_dir)
+    transformer = model[0].auto_model.eval()
+    sample = model.tokenizer(["An example sentence"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            os.path.join(output_dir, ONNX_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(
+            os.path.join(output_dir, ONNX_FILE),
+            os.path.join(output_dir, ONNX_INT8_FILE),
+            weight_type=QuantType.QInt8
+        )
+
+def validate_onnx(model_name: str, model_dir: str, quantized: bool = False, texts: List[str] = None,
+                  min_cosine: float = None) -> Dict[str, Any]:
+    """
+    Compare ONNX embeddings with the PyTorch model's.
+
+    Args:
+        model_name: SentenceTransformer model the directory was exported from
+        model_dir: Directory written by ``export_onnx``
+        quantized: Validate the int8 graph
+        texts: Texts to compare (default: a small mixed sample)
+        min_cosine: Lowest acceptable per-text cosine similarity
+            (default: 0.999 for fp32, 0.98 for int8)
+
+    Returns:
+        "min_cosine", "mean_cosine" and the number of "texts"
+
+    Raises:
+        ValueError: If any text's cosine similarity is below ``min_cosine``
+    """
+    from sentence_transformers import SentenceTransformer
+
+    texts = texts or VALIDATION_TEXTS
+    min_cosine = min_cosine if min_cosine is not None else (0.98 if quantized else 0.999)
+    encoder = OnnxEncoder(model_dir, quantized=quantized)
+    reference = SentenceTransformer(model_name, device="cpu")
+    reference.max_seq_length = encoder.max_seq_length
+
+    expected = np.asarray(reference.encode(texts), dtype=np.float32)
+    actual = encoder.encode(texts)
+    cosines = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    report = {"min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean()), "texts": len(texts)}
+    if report["min_cosine"] < min_cosine:
+        raise ValueError(f"ONNX embeddings disagree with PyTorch: {report} (required min cosine {min_cosine})")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and validate ONNX embedding models")
+    parser.add_argument("command", choices=["export", "validate"])
+    parser.add_argument("--model", required=True, help="SentenceTransformer model name")
+    parser.add_argument("--output", required=True, help="ONNX model directory")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 graph")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model, args.output, quantize=not args.no_quantize)
+    print("fp32:", validate_onnx(args.model, args.output))
+    if not args.no_quantize:
+        print("int8:", validate_onnx(args.model, args.output, quantized=True))
@@ -1,20 +1,13 @@
-from src.databases.qdrant_db import QdrantAdapter
-from src.databases.chroma_db import ChromaDBAdapter
+from src.databases.factory import create_vector_database
 from src.embeddings.embedding_models import EmbeddingModel
+from src.retrievers.hybrid import lexical_index_path
 from src.retrievers.retriever import RAGRetriever
 from src.utils.config import load_config
-from src.utils.data_loader import HuggingFaceMetaLoader, DocumentProcessor
-from typing import List, Dict, Any
-import time
-from contextlib import contextmanager
-
-@contextmanager
-def timer(description: str):
-    """Utility context manager for timing code blocks."""
-    start = time.time()
-    yield
-    elapsed = time.time() - start
-    print(f"{description}: {elapsed:.2f} seconds")
+from src.utils.data_loader import HuggingFaceMetaLoader, DocumentProcessor, HF_DATASET_SOURCE
+from src.utils.chunking import MarkdownChunker, create_chunker
+from src.utils.dedup import DuplicateFilter
+from src.utils.metrics import timer
+from typing import List, Dict, Any, Iterator
 
 def explore_datasets(loader: HuggingFaceMetaLoader):
     """Explore and print dataset statistics."""
@@ -31,37 +24,78 @@ def explore_datasets(loader: HuggingFaceMetaLoader):
     print("\n=== Popular Tags ===")
     print(stats['popular_tags'])
 
-def load_dataset_metadata(dataset_config: dict, max_documents: int = 10) -> List[Dict[str, Any]]:
+def get_dataset_names(loader: HuggingFaceMetaLoader, dataset_config: dict) -> List[str]:
+    """Resolve the dataset names selected by the dataset config."""
+    if "datasets" in dataset_config:
+        return dataset_config["datasets"]
+    elif "search" in dataset_config:
+        search_config = dataset_config.get("search", {})
+        return loader.search_datasets(
+            query=search_config.get("query"),
+            task=search_config.get("task"),
+            limit=search_config.get("limit", 5)
+        )
+    return loader.dataset_ids()
+
+def iter_dataset_documents(loader: HuggingFaceMetaLoader, dataset_names: List[str],
+                           max_datasets: int = None, batch_size: int = 256,
+                           chunker: MarkdownChunker = None,
+                           duplicate_filter: DuplicateFilter = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield documents (card chunks, with a chunker) for the given datasets.
+    
+    ``max_datasets`` limits the datasets whose metadata is loaded, so the
+    limit does not depend on how many chunks each card is split into. With a
+    ``duplicate_filter``, exact and near-duplicate documents are dropped
+    here, before they reach the embedding model.
+    """
+    processor = DocumentProcessor()
+    
+    def documents() -> Iterator[Dict[str, Any]]:
+        loaded = 0
+        for start in range(0, len(dataset_names), batch_size):
+            batch = dataset_names[start:start + batch_size]
+            if max_datasets:
+                batch = batch[:max_datasets - loaded]
+            for metadata in loader.load_many(batch):
+                yield from processor.iter_documents_from_metadata(metadata, chunker)
+                loaded += 1
+                if max_datasets and loaded >= max_datasets:
+                    return
+    
+    stream = documents()
+    if duplicate_filter is not None:
+        stream = processor.iter_deduplicated(stream, duplicate_filter)
+    return stream
+
+def create_duplicate_filter(ingest_config: Dict[str, Any]) -> DuplicateFilter:
+    """Create the duplicate filter from ``ingest.dedup``, or None if deduplication is disabled."""
+    dedup_config = ingest_config.get('dedup', {})
+    if not dedup_config.get('enabled', False):
+        return None
+    return DuplicateFilter(
+        threshold=dedup_config.get('threshold', 0.85),
+        num_perm=dedup_config.get('num_perm', 128),
+        shingle_size=dedup_config.get('shingle_size', 5),
+        min_tokens=dedup_config.get('min_tokens', 32),
+        max_entries=dedup_config.get('max_entries', 1_000_000)
+    )
+
+def load_dataset_metadata(dataset_config: dict, max_datasets: int = 10,
+                          chunker: MarkdownChunker = None,
+                          duplicate_filter: DuplicateFilter = None) -> List[Dict[str, Any]]:
     """Load and process dataset metadata from Hugging Face."""
     with timer("Initializing loaders"):
         loader = HuggingFaceMetaLoader()
-        processor = DocumentProcessor()
     
     with timer("Searching/collecting dataset names"):
-        if "datasets" in dataset_config:
-            dataset_names = dataset_config["datasets"]
-        elif "search" in dataset_config:
-            search_config = dataset_config.get("search", {})
-            dataset_names = loader.search_datasets(
-                query=search_config.get("query"),
-                task=search_config.get("task"),
-                limit=search_config.get("limit", 5)
-            )
-        else:
-            dataset_names = loader.metadata_dataset['datasetId'].tolist()
+        dataset_names = get_dataset_names(loader, dataset_config)
     
     print(f"\nProcessing {len(dataset_names)} datasets...")
     
     with timer("Processing dataset metadata"):
-        all_documents = []
-        for dataset_name in dataset_names:
-            metadata = loader.load_dataset_metadata(dataset_name)
-            if metadata:
-                documents = processor.create_documents_from_metadata(metadata)
-                all_documents.extend(documents)
-                
-            if max_documents and len(all_documents) >= max_documents:
-                break
+        all_documents = list(iter_dataset_documents(loader, dataset_names, max_datasets, chunker=chunker,
+                                                    duplicate_filter=duplicate_filter))
     
     print(f"Loaded {len(all_documents)} documents")
     return all_documents
@@ -70,43 +104,104 @@ def main():
     with timer("Loading configuration"):
         config = load_config()
     
-    with timer("Initializing Qdrant"):
-        qdrant_config = config['databases']['qdrant']
-        qdrant_db = QdrantAdapter(
-            collection_name=qdrant_config['collection_name'],
-            vector_size=qdrant_config['vector_size'],
-            host=qdrant_config['host'],
-            port=qdrant_config['port']
-        )
-        qdrant_db.connect()
+    with timer("Initializing vector database"):
+        vector_db = create_vector_database(config)
     
     with timer("Initializing embedding model"):
-        embedding_model = EmbeddingModel(model_name=config['embedding']['model_name'])
+        embedding_model = EmbeddingModel(
+            model_name=config['embedding']['model_name'],
+            cache_dir=config['embedding'].get('cache_dir'),
+            cache_max_entries=config['embedding'].get('cache_max_entries', 100_000),
+            num_workers=config['embedding'].get('num_workers', 0),
+            devices=config['embedding'].get('devices'),
+            max_seq_length=config['embedding'].get('max_seq_length'),
+            backend=config['embedding'].get('backend', 'torch'),
+            onnx_dir=config['embedding'].get('onnx_dir'),
+            onnx_quantized=config['embedding'].get('onnx_quantized', False),
+            normalize=config['embedding'].get('normalize', False)
+        )
     
     with timer("Initializing retriever"):
-        retriever = RAGRetriever(qdrant_db, embedding_model)
-    
-    with timer("Loading dataset metadata"):
-        dataset_documents = load_dataset_metadata(config['dataset'], max_documents=10)
-        print(f"\nLoaded metadata for {len(dataset_documents)} documents")
+        retrieval_config = config.get('retrieval', {})
+        retriever = RAGRetriever(
+            vector_db,
+            embedding_model,
+            query_cache_size=retrieval_config.get('query_cache_size', 1024),
+            query_cache_ttl=retrieval_config.get('query_cache_ttl', 3600),
+            result_cache_size=retrieval_config.get('result_cache_size', 0),
+            result_cache_ttl=retrieval_config.get('result_cache_ttl', 300),
+            hybrid=retrieval_config.get('hybrid', False),
+            rrf_k=retrieval_config.get('rrf_k', 60),
+            hybrid_candidates=retrieval_config.get('hybrid_candidates', 50),
+            lexical_index_path=lexical_index_path(retrieval_config.get('lexical_index_dir'),
+                                                  vector_db.collection_name, HF_DATASET_SOURCE)
+        )
     
-    with timer("Adding documents to vector database"):
-        texts = [doc["text"] for doc in dataset_documents]
-        metadata = [doc["metadata"] for doc in dataset_documents]
-        retriever.add_documents(texts, metadata=metadata)
+    ingest_config = config.get('ingest', {})
+    # Chunk with the embedding model's tokenizer so chunks are not truncated when embedded
+    chunker = create_chunker(ingest_config.get('chunking', {}), embedding_model)
+    duplicate_filter = create_duplicate_filter(ingest_config)
+    if ingest_config.get('incremental', False):
+        with timer("Syncing documents with vector database"):
+            loader = HuggingFaceMetaLoader()
+            dataset_names = get_dataset_names(loader, config['dataset'])
+            retriever.sync_documents(
+                iter_dataset_documents(loader, dataset_names, ingest_config.get('max_datasets'), chunker=chunker,
+                                       duplicate_filter=duplicate_filter),
+                # Only dataset documents; schema documents share the collection
+                scope={"source": HF_DATASET_SOURCE},
+                delete_missing=ingest_config.get('delete_missing', True),
+                encode_batch_size=ingest_config.get('encode_batch_size', 256),
+                upsert_batch_size=ingest_config.get('upsert_batch_size', 64)
+            )
+    elif ingest_config.get('streaming', False):
+        with timer("Streaming documents into vector database"):
+            loader = HuggingFaceMetaLoader()
+            dataset_names = get_dataset_names(loader, config['dataset'])
+            retriever.add_documents_stream(
+                iter_dataset_documents(loader, dataset_names, ingest_config.get('max_datasets'), chunker=chunker,
+                                       duplicate_filter=duplicate_filter),
+                encode_batch_size=ingest_config.get('encode_batch_size', 256),
+                upsert_batch_size=ingest_config.get('upsert_batch_size', 64)
+            )
+    else:
+        with timer("Loading dataset metadata"):
+            dataset_documents = load_dataset_metadata(config['dataset'], max_datasets=10, chunker=chunker,
+                                                      duplicate_filter=duplicate_filter)
+            print(f"\nLoaded metadata for {len(dataset_documents)} documents")
+        
+        with timer("Adding documents to vector database"):
+            texts = [doc["text"] for doc in dataset_documents]
+            metadata = [doc["metadata"] for doc in dataset_documents]
+            keys = [doc["key"] for doc in dataset_documents]
+            retriever.add_documents(texts, metadata=metadata, keys=keys)
+    if duplicate_filter is not None:
+        print(f"Deduplication: {duplicate_filter.stats()}")
+    retriever.save()
     
     with timer("Performing test retrieval"):
         query = "What datasets are available for question answering?"
-        results = retriever.retrieve(query, top_k=3)
+        # Filtered inside the vector database rather than after over-fetching
+        filters = {"task_categories": ["question-answering"]}
+        # Chunk hits are grouped back to their dataset
+        results = retriever.retrieve_grouped(query, top_k=3, filters=filters)
         
-        print(f"\nQuery: {query}")
-        print("\nRetrieved documents:")
-        for i, result in enumerate(results, 1):
+        print(f"\nQuery: {query} (filters: {filters})")
+        print("\nRetrieved datasets:")
+        for i, group in enumerate(results, 1):
+            result = group['best']
             print(f"\n{i}.")
-            print(f"   Dataset: {result['metadata']['dataset']}")
+            print(f"   Dataset: {group['parent']}")
             print(f"   Type: {result['metadata']['doc_type']}")
+            if result['metadata'].get('section'):
+                print(f"   Section: {result['metadata']['section']}")
+            print(f"   Matching documents: {len(group['hits'])}")
             print(f"   Tasks: {', '.join(result['metadata']['task_categories'])}")
             print(f"   Distance: {result['distance']}")
+    
+    if embedding_model.cache is not None:
+        print(f"\nEmbedding cache: {embedding_model.cache.stats()}")
+    embedding_model.close()
 
 if __name__ == "__main__":
     with timer("Total execution"):
@@ -1,54 +1,66 @@
-from typing import List, Dict, Any
-import requests
-import json
+from typing import List, Dict, Any, AsyncIterator, Iterator, Tuple
+from llm.ollama_client import OllamaClient
+from llm.prompt_builder import PromptBuilder
 
 class CodeGenerator:
     def __init__(self, host: str = "localhost", port: int = 11434, 
-                 model: str = "codellama:7b-instruct", parameters: dict = None):
+                 model: str = "codellama:7b-instruct", parameters: dict = None,
+                 timeout: float = 300.0, connect_timeout: float = 5.0, max_retries: int = 3,
+                 cache_size: int = 256, cache_dir: str = None, prompt_token_budget: int = 2048,
+                 pool_size: int = 4, cache_disk_entries: int = 4096):
         self.base_url = f"http://{host}:{port}"
         self.model = model
         self.parameters = parameters or {}
+        self.prompt_builder = PromptBuilder(token_budget=prompt_token_budget)
+        self.last_prompt_stats: Dict[str, int] = {}
+        self.client = OllamaClient(
+            self.base_url,
+            timeout=timeout,
+            connect_timeout=connect_timeout,
+            max_retries=max_retries,
+            pool_size=pool_size,
+            cache_size=cache_size,
+            cache_dir=cache_dir,
+            cache_disk_entries=cache_disk_entries
+        )
+
+    def _options(self) -> Dict[str, Any]:
+        return {
+            "num_gpu": self.parameters.get("num_gpu", 1),
+            "num_thread": self.parameters.get("num_thread", 4),
+            "temperature": self.parameters.get("temperature", 0.7),
+            "top_p": self.parameters.get("top_p", 0.9),
+        }
 
     def generate_code(self, table_schemas: List[Dict[str, Any]], json_structure: Dict[str, Any]) -> str:
         """Generate code based on table schemas and JSON structure."""
         prompt = self._create_prompt(table_schemas, json_structure)
-        
-        request_body = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "num_gpu": self.parameters.get("num_gpu", 1),
-                "num_thread": self.parameters.get("num_thread", 4),
-                "temperature": self.parameters.get("temperature", 0.7),
-                "top_p": self.parameters.get("top_p", 0.9),
-            }
-        }
-        
-        response = requests.post(
-            f"{self.base_url}/api/generate",
-            json=request_body
-        )
-        
-        if response.status_code == 200:
-            return response.json()["response"]
-        else:
-            raise Exception(f"Failed to generate code: {response.text}")
+        return self.generate_from_prompt(prompt)
+
+    def build_prompt(self, table_schemas: List[Dict[str, Any]],
+                     json_structure: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+        """Return the prompt and its token stats; unlike ``_create_prompt`` it keeps no state, so threads can share it."""
+        return self.prompt_builder.build(table_schemas, json_structure)
+
+    def generate_from_prompt(self, prompt: str) -> str:
+        """Generate code for a prompt from ``build_prompt``."""
+        return self.client.generate(self.model, prompt, self._options())
+
+    def stream_code(self, table_schemas: List[Dict[str, Any]], json_structure: Dict[str, Any]) -> Iterator[str]:
+        """Like ``generate_code``, but yield the code token by token as it is generated."""
+        prompt = self._create_prompt(table_schemas, json_structure)
+        return self.client.stream(self.model, prompt, self._options())
+
+    def astream_code(self, table_schemas: List[Dict[str, Any]], json_structure: Dict[str, Any]) -> AsyncIterator[str]:
+        """Async iterator version of ``stream_code``."""
+        prompt = self._create_prompt(table_schemas, json_structure)
+        return self.client.astream(self.model, prompt, self._options())
+
+    def close(self) -> None:
+        """Close the client's pooled connections."""
+        self.client.close()
 
     def _create_prompt(self, table_schemas: List[Dict[str, Any]], json_structure: Dict[str, Any]) -> str:
-        """Create a prompt for code generation."""
-        schemas_str = json.dumps(table_schemas, indent=2)
-        json_str = json.dumps(json_structure, indent=2)
-        
-        return f"""Given these SQL table schemas:
-{schemas_str}
-
-And this JSON structure:
-{json_str}
-
-Generate Python code that:
-1. Creates SQLAlchemy models for the relevant tables
-2. Includes a function to insert the JSON data into these tables
-3. Handles relationships between tables appropriately
-
-Please provide only the code without explanations.""" 
\ No newline at end of file
+        """Create a compact prompt for code generation; its token counts go to ``last_prompt_stats``."""
+        prompt, self.last_prompt_stats = self.prompt_builder.build(table_schemas, json_structure)
+        return prompt
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple, Union
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.cache import TTLCache
+
+class OllamaClient:
+    """
+    Client for the Ollama ``/api/generate`` endpoint.
+
+    Requests go through one ``requests.Session`` whose connection pool is
+    reused across calls. Connection errors and 429/5xx responses are retried
+    with exponential backoff before any response body is read, so a stream is
+    never restarted halfway. Read timeouts are not retried: the server may
+    still be generating, and each retry could wait another full ``timeout``.
+    Completed responses are cached by (model,
+    options, prompt hash), in memory and optionally as JSON files on disk, so
+    repeated prompts return without calling the model. The disk cache keeps at
+    most ``cache_disk_entries`` files and removes the least recently used ones
+    past that.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, base_url: str = "http://localhost:11434", timeout: float = 300.0,
+                 connect_timeout: float = 5.0, max_retries: int = 3, backoff_factor: float = 0.5,
+                 pool_size: int = 4, cache_size: int = 256, cache_dir: Optional[str] = None,
+                 cache_disk_entries: int = 4096):
+        """
+        Args:
+            base_url: Ollama server URL
+            timeout: Max seconds to wait for the next bytes of a response
+            connect_timeout: Max seconds to establish a connection
+            max_retries: Retries for connection errors and retryable statuses (never for read timeouts)
+            backoff_factor: Base of the exponential backoff between retries
+            pool_size: Connections kept open to the server
+            cache_size: Responses kept in memory (0 disables the cache)
+            cache_dir: Directory for persisted responses (None keeps them in memory only)
+            cache_disk_entries: Max responses kept in ``cache_dir``
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout: Tuple[float, float] = (connect_timeout, timeout)
+        self.cache = TTLCache(max_size=cache_size) if cache_size > 0 else None
+        self.cache_dir = cache_dir
+        self.cache_disk_entries = cache_disk_entries
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            status=max_retries,
+            read=0,
+            other=0,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=["POST"],
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self) -> "OllamaClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
+
+    @staticmethod
+    def cache_key(model: str, prompt: str, options: Dict[str, Any] = None) -> str:
+        """Key of a completion: model, options and a hash of the prompt."""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        payload = json.dumps([model, options or {}, prompt_hash], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _cached(self, key: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        response = self.cache.get(key)
+        if response is None and self.cache_dir:
+            try:
+                with open(self._cache_path(key), "r") as f:
+                    response = json.load(f)["response"]
+                # Mark the file as recently used for _prune_disk_cache
+                os.utime(self._cache_path(key))
+            except FileNotFoundError:
+                # Not cached, or pruned by another client sharing the directory
+                return None
+            self.cache.put(key, response)
+        return response
+
+    def _store(self, key: str, response: str) -> None:
+        if self.cache is None:
+            return
+        self.cache.put(key, response)
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._cache_path(key)}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"response": response}, f)
+            os.replace(tmp_path, self._cache_path(key))
+            self._prune_disk_cache()
+
+    def _prune_disk_cache(self) -> None:
+        """Remove the least recently used response files past ``cache_disk_entries``."""
+        with os.scandir(self.cache_dir) as entries:
+            files = [entry for entry in entries if entry.name.endswith(".json")]
+        if len(files) <= self.cache_disk_entries:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime_ns)
+        for entry in files[:len(files) - self.cache_disk_entries]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _post(self, model: str, prompt: str, options: Dict[str, Any], stream: bool) -> requests.Response:
+        response = self.session.post(
+            f"{self.base_url}/api/generate",
+            json={"model": model, "prompt": prompt, "stream": stream, "options": options or {}},
+            timeout=self.timeout,
+            stream=stream
+        )
+        if response.status_code != 200:
+            text = response.text
+            response.close()
+            raise Exception(f"Failed to generate code: {text}")
+        return response
+
+    def generate(self, model: str, prompt: str, options: Dict[str, Any] = None, use_cache: bool = True) -> str:
+        """Return the full completion for ``prompt``."""
+        key = self.cache_key(model, prompt, options)
+        cached = self._cached(key) if use_cache else None
+        if cached is not None:
+            return cached
+
+        response = self._post(model, prompt, options, stream=False)
+        text = response.json()["response"]
+        self._store(key, text)
+        return text
+
+    def stream(self, model: str, prompt: str, options: Dict[str, Any] = None,
+               use_cache: bool = True) -> Iterator[str]:
+        """
+        Yield the completion for ``prompt`` token by token as the server produces it.
+
+        A cached completion is yielded as a single chunk. The completion is
+        cached only if the server marked it ``done``; a stream that is
+        abandoned or whose connection ends early is not cached.
+        """
+        key = self.cache_key(model, prompt, options)
+        cached = self._cached(key) if use_cache else None
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        finished = False
+        with self._post(model, prompt, options, stream=True) as response:
+            # Ollama streams one JSON object per line
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise Exception(f"Failed to generate code: {message['error']}")
+                token = message.get("response", "")
+                if token:
+                    chunks.append(token)
+                    yield token
+                if message.get("done"):
+                    finished = True
+                    break
+        if finished:
+            self._store(key, "".join(chunks))
+
+    async def astream(self, model: str, prompt: str, options: Dict[str, Any] = None,
+                      use_cache: bool = True) -> AsyncIterator[str]:
+        """Async version of ``stream``; the blocking reads run in the default executor."""
+        loop = asyncio.get_running_loop()
+        iterator = self.stream(model, prompt, options, use_cache)
+        done = object()
+        try:
+            while True:
+                token = await loop.run_in_executor(None, next, iterator, done)
+                if token is done:
+                    return
+                yield token
+        finally:
+            # Closing the generator releases the pooled connection of an abandoned stream
+            await loop.run_in_executor(None, iterator.close)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Response cache hit/miss counters."""
+        return self.cache.stats() if self.cache is not None else {}
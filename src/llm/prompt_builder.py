@@ -0,0 +1,169 @@
+import json
+import re
+from typing import Any, Dict, List, Set, Tuple
+
+# Letter runs, single digits and single punctuation marks: a close, tokenizer-free
+# estimate of BPE token counts for code-like text (identifiers split on "_", etc.)
+TOKEN_ESTIMATE_PATTERN = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]")
+
+INSTRUCTIONS = """Generate Python code that:
+1. Creates SQLAlchemy models for the relevant tables
+2. Includes a function to insert the JSON data into these tables
+3. Handles relationships between tables appropriately
+
+Please provide only the code without explanations."""
+
+def count_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in ``text``."""
+    return len(TOKEN_ESTIMATE_PATTERN.findall(text))
+
+def _name_tokens(name: str) -> Set[str]:
+    return set(re.findall(r"[a-z]+|\d+", name.lower()))
+
+def _json_fields(json_obj: Any, prefix: str = "") -> List[str]:
+    """Leaf field paths of a JSON object, with arrays of objects collapsed to their first item."""
+    if isinstance(json_obj, dict):
+        fields = []
+        for key, value in json_obj.items():
+            fields.extend(_json_fields(value, f"{prefix}.{key}" if prefix else key))
+        return fields
+    if isinstance(json_obj, list) and json_obj and isinstance(json_obj[0], dict):
+        return _json_fields(json_obj[0], f"{prefix}[]")
+    return [prefix]
+
+def _compact_json(json_obj: Any) -> Any:
+    """Drop all but the first item of arrays of objects; the rest repeat the structure."""
+    if isinstance(json_obj, dict):
+        return {key: _compact_json(value) for key, value in json_obj.items()}
+    if isinstance(json_obj, list) and json_obj and isinstance(json_obj[0], dict):
+        return [_compact_json(json_obj[0])]
+    return json_obj
+
+class PromptBuilder:
+    """
+    Build code-generation prompts that fit a token budget.
+
+    Each schema is rendered as one DDL-like line, e.g.
+    ``books(id INTEGER PK, title VARCHAR NOT NULL, publisher_id INTEGER -> publishers.id)``.
+    Foreign keys appear once, on their column, instead of again in a separate
+    relationship list. Only columns relevant to the JSON are kept: keys,
+    required columns, columns matched to a field by the schema retriever and
+    columns sharing a name token with a field. If the prompt is still over
+    budget, the least relevant tables are dropped (the first one is always kept).
+    """
+
+    def __init__(self, token_budget: int = 2048):
+        """
+        Args:
+            token_budget: Max estimated tokens of the prompt (0 disables the limit)
+        """
+        self.token_budget = token_budget
+
+    @staticmethod
+    def relevant_columns(schema: Dict[str, Any], field_tokens: Set[str], matched_columns: Set[str]) -> Set[str]:
+        """Columns of ``schema`` that the generated code is likely to need."""
+        fk_columns = {column for fk in schema["foreign_keys"] for column in fk["constrained_columns"]}
+        return {
+            col["name"]
+            for col in schema["columns"]
+            if col["primary_key"]
+            or not col["nullable"]
+            or col["name"] in fk_columns
+            or col["name"] in matched_columns
+            or _name_tokens(col["name"]) & field_tokens
+        }
+
+    @staticmethod
+    def schema_to_ddl(schema: Dict[str, Any], keep_columns: Set[str] = None) -> str:
+        """Render ``schema`` as a one-line table definition, optionally with a subset of its columns."""
+        references = {}
+        composite = []
+        for fk in schema["foreign_keys"]:
+            if len(fk["constrained_columns"]) == 1:
+                references[fk["constrained_columns"][0]] = f"{fk['referred_table']}.{fk['referred_columns'][0]}"
+            else:
+                composite.append(
+                    f"FK({','.join(fk['constrained_columns'])}) -> "
+                    f"{fk['referred_table']}({','.join(fk['referred_columns'])})"
+                )
+
+        parts = []
+        for col in schema["columns"]:
+            if keep_columns is not None and col["name"] not in keep_columns:
+                continue
+            part = f"{col['name']} {col['type']}"
+            if col["primary_key"]:
+                part += " PK"
+            elif not col["nullable"]:
+                part += " NOT NULL"
+            if col["name"] in references:
+                part += f" -> {references[col['name']]}"
+            parts.append(part)
+        omitted = len(schema["columns"]) - len(parts)
+        if omitted:
+            parts.append(f"...{omitted} more")
+        return f"{schema['table_name']}({', '.join(parts + composite)})"
+
+    @staticmethod
+    def _render(table_lines: List[str], json_str: str) -> str:
+        tables_str = "\n".join(table_lines)
+        return f"""SQL tables (-> marks foreign keys):
+{tables_str}
+
+JSON structure:
+{json_str}
+
+{INSTRUCTIONS}"""
+
+    @staticmethod
+    def verbose_prompt(table_schemas: List[Dict[str, Any]], json_structure: Dict[str, Any]) -> str:
+        """The uncompacted prompt: pretty-printed schema dicts and JSON."""
+        return f"""Given these SQL table schemas:
+{json.dumps(table_schemas, indent=2)}
+
+And this JSON structure:
+{json.dumps(json_structure, indent=2)}
+
+{INSTRUCTIONS}"""
+
+    def build(self, table_schemas: List[Dict[str, Any]],
+              json_structure: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+        """
+        Create the prompt for ``table_schemas`` (most relevant first) and ``json_structure``.
+
+        Args:
+            table_schemas: Dicts with "table_name", "schema" and optionally the
+                "matched_fields" (field -> column) found by ``SchemaRetriever``
+            json_structure: Sample JSON object to store
+
+        Returns:
+            (prompt, stats with estimated "tokens_before" and "tokens_after"
+            compaction and the number of "tables" kept)
+        """
+        field_tokens = set()
+        for field in _json_fields(json_structure):
+            field_tokens |= _name_tokens(field)
+
+        table_lines = []
+        seen_tables = set()
+        for table in table_schemas:
+            if table["table_name"] in seen_tables:
+                continue
+            seen_tables.add(table["table_name"])
+            matched_columns = set(table.get("matched_fields", {}).values())
+            keep_columns = self.relevant_columns(table["schema"], field_tokens, matched_columns)
+            table_lines.append(self.schema_to_ddl(table["schema"], keep_columns))
+
+        json_str = json.dumps(_compact_json(json_structure), separators=(",", ":"))
+        prompt = self._render(table_lines, json_str)
+        tokens = count_tokens(prompt)
+        while self.token_budget and tokens > self.token_budget and len(table_lines) > 1:
+            table_lines.pop()
+            prompt = self._render(table_lines, json_str)
+            tokens = count_tokens(prompt)
+
+        return prompt, {
+            "tokens_before": count_tokens(self.verbose_prompt(table_schemas, json_structure)),
+            "tokens_after": tokens,
+            "tables": len(table_lines)
+        }
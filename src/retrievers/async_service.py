@@ -0,0 +1,174 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
+from retrievers.retriever import RAGRetriever
+from utils.metrics import percentile
+
+class AsyncRetrievalService:
+    """
+    Asyncio front end that micro-batches queries for a RAGRetriever.
+
+    Queries arriving within ``max_wait_ms`` of the first queued query (or until
+    ``max_batch_size`` queries are collected) are embedded in one
+    ``EmbeddingModel.encode`` call and searched through
+    ``RAGRetriever.retrieve_embedded``, so the batch gets the retriever's
+    result cache, filters and hybrid fusion. Blocking work runs on a thread
+    pool so the event loop stays free.
+
+    Usage:
+        async with AsyncRetrievalService(retriever) as service:
+            results = await service.retrieve("question answering datasets")
+    """
+
+    def __init__(self, retriever: RAGRetriever, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 max_queue_size: int = 1024, max_concurrent_batches: int = 1):
+        """
+        Args:
+            retriever: Retriever whose embedding model and vector store are used
+            max_batch_size: Max queries embedded and searched together
+            max_wait_ms: Max time the first query of a batch waits for others
+            max_queue_size: Max queued queries before ``retrieve`` applies backpressure
+            max_concurrent_batches: Batches processed in parallel while the next is collected
+        """
+        self.retriever = retriever
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.max_concurrent_batches = max_concurrent_batches
+
+        self._queue: asyncio.Queue = None
+        self._worker: asyncio.Task = None
+        self._batch_slots: asyncio.Semaphore = None
+        self._batch_tasks = set()
+        self._executor = None
+
+        self._started_at = None
+        self._queries = 0
+        self._batches = 0
+        self._latencies = deque(maxlen=10_000)
+
+    async def start(self) -> None:
+        """Start the batching worker."""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent_batches)
+        self._started_at = time.perf_counter()
+        self._worker = asyncio.create_task(self._collect_batches())
+
+    async def stop(self) -> None:
+        """Finish queued queries and stop the worker."""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks)
+        self._executor.shutdown()
+        self._worker = None
+
+    async def __aenter__(self) -> "AsyncRetrievalService":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def retrieve(self, query: str, top_k: int = 5, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Retrieve relevant documents for a query."""
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, top_k, filters, future, time.perf_counter()))
+        return await future
+
+    async def retrieve_many(self, queries: List[str], top_k: int = 5,
+                            filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """Retrieve relevant documents for several queries."""
+        return await asyncio.gather(*(self.retrieve(query, top_k, filters) for query in queries))
+
+    async def _collect_batches(self) -> None:
+        """Group queued queries into batches and dispatch them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._batch_slots.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple]) -> None:
+        """Embed and search one batch off the event loop, then resolve its futures."""
+        loop = asyncio.get_running_loop()
+        try:
+            queries = [(query, top_k, filters) for query, top_k, filters, _, _ in batch]
+            results = await loop.run_in_executor(self._executor, self._search, queries)
+            for (_, _, _, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            now = time.perf_counter()
+            self._latencies.extend(now - enqueued_at for _, _, _, _, enqueued_at in batch)
+            self._queries += len(batch)
+            self._batches += 1
+            self._batch_slots.release()
+            for _ in batch:
+                self._queue.task_done()
+
+    def _search(self, queries: List[Tuple[str, int, Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """Embed all queries in one call and retrieve once per distinct (top_k, filters)."""
+        embeddings = self.retriever.embed_queries([query for query, _, _ in queries])
+
+        groups = defaultdict(list)
+        for position, (_, top_k, filters) in enumerate(queries):
+            groups[(top_k, repr(sorted(filters.items())) if filters else None)].append(position)
+
+        results = [None] * len(queries)
+        for (top_k, _), positions in groups.items():
+            filters = queries[positions[0]][2]
+            batch_results = self.retriever.retrieve_embedded(
+                [queries[position][0] for position in positions],
+                embeddings[positions],
+                top_k=top_k,
+                filters=filters
+            )
+            for position, result in zip(positions, batch_results):
+                results[position] = result
+        return results
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return queue depth, batching, latency and throughput metrics."""
+        latencies = sorted(self._latencies)
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight_batches": len(self._batch_tasks),
+            "queries": self._queries,
+            "batches": self._batches,
+            "avg_batch_size": self._queries / self._batches if self._batches else 0.0,
+            "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+            "latency_p95_ms": percentile(latencies, 0.95) * 1000,
+            "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+            "queries_per_second": self._queries / elapsed if elapsed else 0.0
+        }
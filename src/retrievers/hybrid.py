@@ -0,0 +1,144 @@
+import os
+import pickle
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from databases.base import parse_filters, matches_filters
+from utils.text_index import BM25Index
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], top_k: int,
+                           k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists with reciprocal-rank fusion.
+
+    A document scores ``sum(1 / (k + rank))`` over the lists it appears in
+    (ranks start at 1), so agreement between lists outweighs a single top
+    rank, and raw scores of different retrievers never need to be compared.
+    Results are matched by "id". The first list's dict is kept for a document
+    found by several retrievers, with the fused score added as "score".
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            doc_id = result["id"]
+            fused.setdefault(doc_id, result)
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1 / (k + rank)
+    ranked = sorted(scores, key=lambda doc_id: -scores[doc_id])[:top_k]
+    return [dict(fused[doc_id], score=scores[doc_id]) for doc_id in ranked]
+
+def lexical_index_path(index_dir: Optional[str], collection_name: str, corpus: str) -> Optional[str]:
+    """
+    File of the BM25 index of ``corpus`` in ``collection_name``, or None if ``index_dir`` is unset.
+
+    Each script writing to a collection keeps its own file, so corpora that
+    share a collection never overwrite each other's index.
+    """
+    if not index_dir:
+        return None
+    return os.path.join(index_dir, f"{collection_name}.{corpus}.pkl")
+
+class LexicalIndex:
+    """
+    BM25 index over the documents stored in a vector database, keyed by point ID.
+
+    Keeps each document's text and metadata next to the BM25 postings, so
+    lexical hits can be filtered with the vector database's filter DSL and
+    returned in the same shape as dense hits. Candidate sets for filters are
+    cached until the next write. All methods are thread-safe.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Pickle file the index is loaded from and saved to (None keeps it in memory)
+        """
+        self.path = path
+        self.index = BM25Index()
+        self.documents: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._candidates: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") == self.VERSION:
+                self.index = state["index"]
+                self.documents = state["documents"]
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.documents
+
+    def add(self, ids: Iterable[str], texts: Iterable[str], metadata: Iterable[Dict[str, Any]]) -> None:
+        """Index documents, replacing earlier versions with the same IDs."""
+        with self._lock:
+            for doc_id, text, meta in zip(ids, texts, metadata):
+                doc_id = str(doc_id)
+                self.index.add(doc_id, text)
+                self.documents[doc_id] = (text, meta)
+            self._candidates.clear()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        """Remove documents (unknown IDs are ignored)."""
+        with self._lock:
+            for doc_id in ids:
+                doc_id = str(doc_id)
+                self.index.remove(doc_id)
+                self.documents.pop(doc_id, None)
+            self._candidates.clear()
+
+    def ids(self, filters: Dict[str, Any] = None) -> List[str]:
+        """IDs of the indexed documents, optionally only those matching ``filters``."""
+        with self._lock:
+            if not filters:
+                return list(self.documents)
+            return list(self._matching(filters))
+
+    def _matching(self, filters: Dict[str, Any]) -> set:
+        cache_key = repr(sorted(filters.items()))
+        candidates = self._candidates.get(cache_key)
+        if candidates is None:
+            conditions = parse_filters(filters)
+            candidates = {
+                doc_id for doc_id, (_, meta) in self.documents.items()
+                if matches_filters(meta, conditions)
+            }
+            self._candidates[cache_key] = candidates
+        return candidates
+
+    def search(self, query: str, top_k: int = 5, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Rank documents for ``query`` with BM25.
+
+        Returns:
+            Dicts with "id", "text", "metadata" and the BM25 score as "distance"
+            (higher is better), best first
+        """
+        with self._lock:
+            candidates = self._matching(filters) if filters else None
+            hits = self.index.search(query, limit=top_k, candidates=candidates,
+                                     get_text=lambda doc_id: self.documents[doc_id][0])
+            return [
+                {
+                    "id": doc_id,
+                    "text": self.documents[doc_id][0],
+                    "metadata": self.documents[doc_id][1],
+                    "distance": score
+                }
+                for doc_id, score in hits
+            ]
+
+    def save(self) -> None:
+        """Write the index to ``path`` (no-op without one)."""
+        if not self.path:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"version": self.VERSION, "index": self.index, "documents": self.documents},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
@@ -1,18 +1,381 @@
-from typing import List, Dict, Any
-from databases.base import VectorDatabase
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import time
+import numpy as np
+from databases.base import VectorDatabase, Embeddings
 from embeddings.embedding_models import EmbeddingModel
+from retrievers.hybrid import LexicalIndex, reciprocal_rank_fusion
+from retrievers.query_cache import SingleFlight
+from utils.cache import TTLCache
+from utils.document_ids import document_id, id_for_document
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield successive lists of at most ``size`` items from any iterable."""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 class RAGRetriever:
-    def __init__(self, vector_db: VectorDatabase, embedding_model: EmbeddingModel):
+    def __init__(self, vector_db: VectorDatabase, embedding_model: EmbeddingModel,
+                 query_cache_size: int = 1024, query_cache_ttl: float = 3600,
+                 result_cache_size: int = 0, result_cache_ttl: float = 300,
+                 hybrid: bool = False, rrf_k: int = 60, hybrid_candidates: int = 50,
+                 lexical_index_path: str = None):
+        """
+        In hybrid mode every write is mirrored into a BM25 index over the same
+        texts, and queries run a lexical and a dense search concurrently and
+        merge them with reciprocal-rank fusion, so exact tokens (dataset IDs,
+        column names, tags) are found without inflating ``top_k``.
+        
+        Args:
+            vector_db: Vector database to store and search documents in
+            embedding_model: Model used to embed documents and queries
+            query_cache_size: Max cached query embeddings (0 disables the cache)
+            query_cache_ttl: Seconds before a cached query embedding expires
+            result_cache_size: Max cached (query, top_k) results (0 disables the cache)
+            result_cache_ttl: Seconds before a cached result expires
+            hybrid: Fuse BM25 and dense results
+            rrf_k: Rank offset of reciprocal-rank fusion; larger values flatten rank differences
+            hybrid_candidates: Min results fetched from each retriever before fusion
+            lexical_index_path: File the BM25 index is persisted to by ``save``
+        """
         self.vector_db = vector_db
         self.embedding_model = embedding_model
+        self.query_cache = TTLCache(query_cache_size, query_cache_ttl) if query_cache_size else None
+        self.result_cache = TTLCache(result_cache_size, result_cache_ttl) if result_cache_size else None
+        self._inflight_queries = SingleFlight()
+        self.hybrid = hybrid
+        self.rrf_k = rrf_k
+        self.hybrid_candidates = hybrid_candidates
+        self.lexical_index = LexicalIndex(lexical_index_path) if hybrid else None
+        # Runs lexical searches while the calling thread runs the dense search
+        self._lexical_executor = ThreadPoolExecutor(max_workers=1) if hybrid else None
+        # Bumped on every write so results computed before it are not cached
+        self._generation = 0
+    
+    def _invalidate_results(self) -> None:
+        """Drop cached results after the stored documents change."""
+        self._generation += 1
+        if self.result_cache is not None:
+            self.result_cache.clear()
     
-    def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]] = None) -> None:
-        """Add documents to the vector database."""
+    def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]] = None,
+                      keys: List[str] = None) -> None:
+        """Add documents to the vector database under content-addressed IDs."""
+        if keys is None:
+            keys = [None] * len(texts)
+        ids = [document_id(text, key, meta) for text, key, meta in zip(texts, keys, metadata or [None] * len(texts))]
         embeddings = self.embedding_model.encode(texts)
-        self.vector_db.insert(texts, embeddings, metadata)
+        self.vector_db.insert(texts, embeddings, metadata, ids=ids)
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, texts, metadata or [{} for _ in texts])
+        self._invalidate_results()
+    
+    def add_documents_stream(self, documents: Iterable[Dict[str, Any]],
+                             encode_batch_size: int = 256,
+                             upsert_batch_size: int = 64) -> Dict[str, Any]:
+        """
+        Add documents from any iterable in bounded chunks.
+        
+        Each chunk of ``encode_batch_size`` documents is embedded in one call and
+        written in upserts of ``upsert_batch_size`` points. The upsert of a chunk
+        runs on a background thread while the next chunk is being encoded, so at
+        most two chunks are held in memory at a time.
+        
+        Points are stored under content-addressed IDs (see ``utils.document_ids``)
+        built from each document's optional "key", its text and its metadata.
+        
+        Args:
+            documents: Iterable of {"text": ..., "metadata": ..., "key": ...} dicts
+            encode_batch_size: Number of documents embedded per encode call
+            upsert_batch_size: Number of points sent per database upsert
+            
+        Returns:
+            Dictionary with document counts and per-stage timings/throughput
+        """
+        stats = {"documents": 0, "encode_seconds": 0.0, "upsert_seconds": 0.0}
+        
+        def upsert(texts, embeddings, metadata, ids):
+            start = time.perf_counter()
+            for i in range(0, len(texts), upsert_batch_size):
+                self.vector_db.insert(
+                    texts[i:i + upsert_batch_size],
+                    embeddings[i:i + upsert_batch_size],
+                    metadata[i:i + upsert_batch_size],
+                    ids=ids[i:i + upsert_batch_size]
+                )
+            if self.lexical_index is not None:
+                self.lexical_index.add(ids, texts, metadata)
+            self._invalidate_results()
+            stats["upsert_seconds"] += time.perf_counter() - start
+        
+        wall_start = time.perf_counter()
+        pending = None
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            for chunk in _chunked(documents, encode_batch_size):
+                texts = [doc["text"] for doc in chunk]
+                metadata = [doc.get("metadata", {}) for doc in chunk]
+                ids = [id_for_document(doc) for doc in chunk]
+                
+                start = time.perf_counter()
+                embeddings = self.embedding_model.encode(texts, batch_size=encode_batch_size)
+                stats["encode_seconds"] += time.perf_counter() - start
+                
+                # Wait for the previous upsert before queueing this one to bound memory
+                if pending is not None:
+                    pending.result()
+                pending = executor.submit(upsert, texts, embeddings, metadata, ids)
+                stats["documents"] += len(chunk)
+            
+            if pending is not None:
+                pending.result()
+        
+        stats["wall_seconds"] = time.perf_counter() - wall_start
+        stats["encode_docs_per_second"] = stats["documents"] / stats["encode_seconds"] if stats["encode_seconds"] else 0.0
+        stats["upsert_docs_per_second"] = stats["documents"] / stats["upsert_seconds"] if stats["upsert_seconds"] else 0.0
+        
+        print(f"Ingested {stats['documents']} documents in {stats['wall_seconds']:.2f} seconds "
+              f"(encode: {stats['encode_docs_per_second']:.1f} docs/s, "
+              f"upsert: {stats['upsert_docs_per_second']:.1f} docs/s)")
+        return stats
+    
+    def sync_documents(self, documents: Iterable[Dict[str, Any]],
+                       delete_missing: bool = True,
+                       scope: Dict[str, Any] = None,
+                       encode_batch_size: int = 256,
+                       upsert_batch_size: int = 64) -> Dict[str, Any]:
+        """
+        Incrementally bring the vector database in line with ``documents``.
+        
+        Documents whose content-addressed ID is already stored are skipped
+        without being embedded. With ``delete_missing``, stored points that no
+        longer correspond to any document (dropped or changed source rows) are
+        deleted afterwards.
+        
+        Args:
+            documents: Iterable of {"text": ..., "metadata": ..., "key": ...} dicts
+            delete_missing: Delete stored points absent from ``documents``
+            scope: Metadata filter selecting the stored points this sync owns, so
+                other document sources sharing the collection are left alone
+            encode_batch_size: Number of documents embedded per encode call
+            upsert_batch_size: Number of points sent per database upsert
+            
+        Returns:
+            Ingestion stats plus "skipped" and "deleted" counts
+        """
+        existing_ids = set(self.vector_db.list_ids(filters=scope))
+        seen_ids = set()
+        skipped = 0
+        
+        def changed_documents():
+            nonlocal skipped
+            for doc in documents:
+                doc_id = id_for_document(doc)
+                if doc_id in seen_ids:
+                    continue
+                seen_ids.add(doc_id)
+                if doc_id in existing_ids:
+                    skipped += 1
+                    # Stored documents need no embedding, but the lexical index may not have them yet
+                    if self.lexical_index is not None and doc_id not in self.lexical_index:
+                        self.lexical_index.add([doc_id], [doc["text"]], [doc.get("metadata", {})])
+                    continue
+                yield doc
+        
+        stats = self.add_documents_stream(
+            changed_documents(),
+            encode_batch_size=encode_batch_size,
+            upsert_batch_size=upsert_batch_size
+        )
+        
+        stale_ids = list(existing_ids - seen_ids) if delete_missing else []
+        for i in range(0, len(stale_ids), upsert_batch_size):
+            self.delete(stale_ids[i:i + upsert_batch_size])
+        if delete_missing and self.lexical_index is not None:
+            # Also drop lexical entries whose points were deleted by someone else
+            self.lexical_index.remove([doc_id for doc_id in self.lexical_index.ids(scope) if doc_id not in seen_ids])
+        
+        stats["skipped"] = skipped
+        stats["deleted"] = len(stale_ids)
+        print(f"Sync: {stats['documents']} added, {skipped} unchanged, {len(stale_ids)} deleted")
+        return stats
+    
+    def delete(self, ids: List[str]) -> None:
+        """Delete documents from the vector database."""
+        self.vector_db.delete(ids)
+        if self.lexical_index is not None:
+            self.lexical_index.remove(ids)
+        self._invalidate_results()
+    
+    def save(self) -> None:
+        """Persist the vector database and, in hybrid mode, the lexical index."""
+        self.vector_db.save()
+        if self.lexical_index is not None:
+            self.lexical_index.save()
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embed a query, reusing cached embeddings.
+        
+        Concurrent calls for the same uncached query share one encode call.
+        """
+        if self.query_cache is not None:
+            cached = self.query_cache.get(query)
+            if cached is not None:
+                return cached
+        
+        def encode():
+            embedding = self.embedding_model.encode(query)[0]
+            if self.query_cache is not None:
+                self.query_cache.put(query, embedding)
+            return embedding
+        
+        return self._inflight_queries.do(query, encode)
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed several queries into one (len(queries), dim) array, encoding all uncached ones in a single call."""
+        embeddings = {}
+        if self.query_cache is not None:
+            for query in queries:
+                cached = self.query_cache.get(query)
+                if cached is not None:
+                    embeddings[query] = cached
+        
+        missing = [query for query in dict.fromkeys(queries) if query not in embeddings]
+        if missing:
+            encoded = self.embedding_model.encode(missing, batch_size=len(missing))
+            for query, embedding in zip(missing, encoded):
+                embeddings[query] = embedding
+                if self.query_cache is not None:
+                    # Copy so the cache does not keep the whole batch array alive
+                    self.query_cache.put(query, embedding.copy())
+        
+        result = np.empty((len(queries), self.embedding_model.dimension), dtype=np.float32)
+        for row, query in enumerate(queries):
+            result[row] = embeddings[query]
+        return result
+    
+    @staticmethod
+    def _result_key(query: str, top_k: int, filters: Dict[str, Any]) -> Tuple:
+        return (query, top_k, repr(sorted(filters.items())) if filters else None)
+    
+    def retrieve(self, query: str, top_k: int = 5, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Retrieve relevant documents for a query."""
-        query_embedding = self.embedding_model.encode(query)
-        return self.vector_db.search(query_embedding[0], top_k=top_k) 
\ No newline at end of file
+        cache_key = self._result_key(query, top_k, filters)
+        if self.result_cache is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return list(cached)
+        
+        generation = self._generation
+        if self.hybrid:
+            depth = max(top_k, self.hybrid_candidates)
+            lexical = self._lexical_executor.submit(self.lexical_index.search, query, depth, filters)
+            dense = self.vector_db.search(self.embed_query(query), top_k=depth, filters=filters)
+            results = reciprocal_rank_fusion([dense, lexical.result()], top_k, k=self.rrf_k)
+        else:
+            results = self.vector_db.search(self.embed_query(query), top_k=top_k, filters=filters)
+        if self.result_cache is not None and generation == self._generation:
+            self.result_cache.put(cache_key, list(results))
+        return results
+    
+    def retrieve_grouped(self, query: str, top_k: int = 5, filters: Dict[str, Any] = None,
+                         group_by: str = "dataset", hits_per_group: int = 4) -> List[Dict[str, Any]]:
+        """
+        Retrieve the best parents of chunked documents, e.g. datasets from their card chunks.
+        
+        ``top_k * hits_per_group`` hits are fetched and grouped by their
+        ``group_by`` metadata value, in order of each group's best hit.
+        
+        Returns:
+            Up to ``top_k`` dicts with the "parent" value, its "best" hit and all its "hits"
+        """
+        groups: Dict[Any, Dict[str, Any]] = {}
+        for hit in self.retrieve(query, top_k=top_k * hits_per_group, filters=filters):
+            parent = hit["metadata"].get(group_by, hit.get("id"))
+            group = groups.get(parent)
+            if group is None:
+                if len(groups) == top_k:
+                    continue
+                group = groups[parent] = {"parent": parent, "best": hit, "hits": []}
+            group["hits"].append(hit)
+        return list(groups.values())
+    
+    def retrieve_many(self, queries: List[str], top_k: int = 5, filters: Dict[str, Any] = None,
+                      batch_size: int = 256) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve relevant documents for many queries.
+        
+        Queries are embedded and searched ``batch_size`` at a time, so each
+        batch costs one encode call and one vector database round trip
+        (see ``retrieve_embedded``).
+        
+        Args:
+            queries: Query texts
+            top_k: Number of results per query
+            filters: Metadata filters applied to every query
+            batch_size: Number of queries per encode/search batch
+            
+        Returns:
+            One result list per query, in input order
+        """
+        results = []
+        for chunk in _chunked(queries, batch_size):
+            results.extend(self.retrieve_embedded(chunk, self.embed_queries(chunk), top_k=top_k, filters=filters))
+        return results
+    
+    def retrieve_embedded(self, queries: List[str], embeddings: Embeddings, top_k: int = 5,
+                          filters: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve relevant documents for queries whose embeddings are already computed.
+        
+        Takes the same path as ``retrieve``: cached results are reused, the
+        rest are searched with one ``search_batch`` call (fused with BM25 in
+        hybrid mode) and cached.
+        
+        Args:
+            queries: Query texts, for the lexical search and the result cache
+            embeddings: (len(queries), dim) query embeddings, e.g. from ``embed_queries``
+            top_k: Number of results per query
+            filters: Metadata filters applied to every query
+            
+        Returns:
+            One result list per query, in input order
+        """
+        cache_keys = [self._result_key(query, top_k, filters) for query in queries]
+        results = [None] * len(queries)
+        if self.result_cache is not None:
+            for position, cache_key in enumerate(cache_keys):
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    results[position] = list(cached)
+        
+        missing = [position for position, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        missing_queries = [queries[position] for position in missing]
+        missing_embeddings = np.asarray(embeddings, dtype=np.float32)[missing]
+        
+        generation = self._generation
+        if self.hybrid:
+            depth = max(top_k, self.hybrid_candidates)
+            lexical = self._lexical_executor.submit(
+                lambda: [self.lexical_index.search(query, depth, filters) for query in missing_queries]
+            )
+            dense = self.vector_db.search_batch(missing_embeddings, top_k=depth, filters=filters)
+            searched = [
+                reciprocal_rank_fusion([dense_hits, lexical_hits], top_k, k=self.rrf_k)
+                for dense_hits, lexical_hits in zip(dense, lexical.result())
+            ]
+        else:
+            searched = self.vector_db.search_batch(missing_embeddings, top_k=top_k, filters=filters)
+        
+        for position, hits in zip(missing, searched):
+            results[position] = hits
+            if self.result_cache is not None and generation == self._generation:
+                self.result_cache.put(cache_keys[position], list(hits))
+        return results
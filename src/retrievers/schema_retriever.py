@@ -0,0 +1,111 @@
+from collections import defaultdict
+from typing import List, Dict, Any
+from retrievers.retriever import RAGRetriever
+from utils.sql_schema_loader import SQLSchemaLoader
+
+class SchemaRetriever:
+    """
+    Two-stage table retrieval over a schema index with column-level documents.
+
+    Stage one matches every JSON field path against the column documents with
+    one batched encode and one batch search. Stage two turns the column hits
+    into table scores. For each field, a table earns ``1 / (1 + rank)`` of its
+    best-ranked matching column, so a table that covers many fields ranks
+    above one that matches a single field very closely. Scores are rank-based
+    and therefore comparable across vector stores whose ``distance`` means
+    similarity (Qdrant) or distance (Chroma).
+
+    Optionally the result is expanded with the tables on the shortest
+    foreign-key join paths between the hits (e.g. ``book_authors`` between
+    ``books`` and ``authors``), using the loader's ``ForeignKeyGraph``.
+    """
+
+    def __init__(self, retriever: RAGRetriever, loader: SQLSchemaLoader):
+        self.retriever = retriever
+        self.loader = loader
+
+    def retrieve_tables(self, fields: List[str], top_k: int = 5, columns_per_field: int = 3,
+                        expand_joins: bool = True, max_join_hops: int = 3) -> List[Dict[str, Any]]:
+        """
+        Find the tables best suited to store the given JSON fields.
+
+        Args:
+            fields: Field descriptions, e.g. from ``analyze_json_structure``
+            top_k: Number of tables to return
+            columns_per_field: Column hits fetched per field
+            expand_joins: Add the tables needed to join the hits to each other
+            max_join_hops: Max foreign keys on a single join path
+
+        Returns:
+            Dicts with "table_name", "schema", "score" and the "matched_fields"
+            mapped to the best matching column of the table, best table first.
+            Tables added by join expansion follow with score 0 and
+            "join_table" set.
+        """
+        return self.retrieve_tables_many([fields], top_k, columns_per_field, expand_joins, max_join_hops)[0]
+
+    def retrieve_tables_many(self, field_lists: List[List[str]], top_k: int = 5, columns_per_field: int = 3,
+                             expand_joins: bool = True, max_join_hops: int = 3) -> List[List[Dict[str, Any]]]:
+        """
+        ``retrieve_tables`` for several JSON shapes at once.
+
+        Fields shared between shapes are embedded and searched once, and all
+        unique fields go through a single ``retrieve_many`` call.
+
+        Returns:
+            One ``retrieve_tables`` result per field list, in input order
+        """
+        unique_fields = list(dict.fromkeys(field for fields in field_lists for field in fields))
+        if not unique_fields:
+            return [[] for _ in field_lists]
+
+        hits_by_field = dict(zip(unique_fields, self.retriever.retrieve_many(
+            unique_fields,
+            top_k=columns_per_field,
+            filters={"doc_type": "column"}
+        )))
+        return [
+            self._rank_tables(fields, hits_by_field, top_k, expand_joins, max_join_hops)
+            for fields in field_lists
+        ]
+
+    def _rank_tables(self, fields: List[str], hits_by_field: Dict[str, List[Dict[str, Any]]], top_k: int,
+                     expand_joins: bool, max_join_hops: int) -> List[Dict[str, Any]]:
+        """Turn the column hits of ``fields`` into ranked tables (stage two)."""
+        scores = defaultdict(float)
+        matched_fields = defaultdict(dict)
+        for field in fields:
+            seen_tables = set()
+            for rank, hit in enumerate(hits_by_field[field]):
+                table_name = hit["metadata"]["table_name"]
+                if table_name in seen_tables:
+                    continue
+                seen_tables.add(table_name)
+                scores[table_name] += 1 / (1 + rank)
+                matched_fields[table_name][field] = hit["metadata"]["column_name"]
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+        results = [
+            {
+                "table_name": table_name,
+                "schema": self.loader.get_table_schema(table_name),
+                "score": score,
+                "matched_fields": matched_fields[table_name]
+            }
+            for table_name, score in ranked
+        ]
+
+        if expand_joins and len(ranked) > 1:
+            tables, _ = self.loader.fk_graph().join_tree([table for table, _ in ranked], max_hops=max_join_hops)
+            hit_tables = {table for table, _ in ranked}
+            results.extend(
+                {
+                    "table_name": table_name,
+                    "schema": self.loader.get_table_schema(table_name),
+                    "score": 0.0,
+                    "matched_fields": {},
+                    "join_table": True
+                }
+                for table_name in tables
+                if table_name not in hit_tables
+            )
+        return results
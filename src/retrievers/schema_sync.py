@@ -0,0 +1,67 @@
+import threading
+from typing import Dict, Any, Optional
+from retrievers.retriever import RAGRetriever
+from utils.sql_schema_loader import SQLSchemaLoader, SCHEMA_SOURCE
+
+class SchemaIndexSync:
+    """
+    Keep the schema documents in the vector database in line with the database catalog.
+
+    Each table document's point ID is derived from the table name and a hash of
+    its text and metadata, including the ``schema`` dict (see ``utils.document_ids``). A sync therefore embeds and upserts
+    only added or changed tables and deletes the points of dropped tables.
+    ``run`` repeats the sync whenever the catalog fingerprint changes. It waits
+    on DDL notifications when available and otherwise polls the fingerprint,
+    which is a single catalog query.
+    """
+
+    def __init__(self, loader: SQLSchemaLoader, retriever: RAGRetriever, poll_interval: float = 30.0,
+                 include_columns: bool = True):
+        """
+        Args:
+            loader: Loader for the database whose schema is indexed
+            retriever: Retriever for the schema index
+            poll_interval: Max seconds between fingerprint checks while watching
+            include_columns: Index column-level documents next to table documents
+        """
+        self.loader = loader
+        self.retriever = retriever
+        self.poll_interval = poll_interval
+        self.include_columns = include_columns
+        self.last_fingerprint: Optional[str] = None
+
+    def sync(self, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Upsert added/changed tables and delete dropped ones.
+
+        Args:
+            refresh: Reflect the database even if the cached schemas look current
+
+        Returns:
+            Stats from ``RAGRetriever.sync_documents``
+        """
+        fingerprint = self.loader.catalog_fingerprint()
+        # Without a fingerprint (non-PostgreSQL) changes cannot be detected, so always reflect.
+        # On the first sync the loader's snapshot is still validated against the fingerprint.
+        changed = fingerprint is None or (self.last_fingerprint is not None and fingerprint != self.last_fingerprint)
+        self.loader.reflect_all(refresh=refresh or changed)
+        stats = self.retriever.sync_documents(
+            self.loader.load_all_schemas(include_columns=self.include_columns),
+            scope={"source": SCHEMA_SOURCE}
+        )
+        self.retriever.save()
+        self.last_fingerprint = fingerprint
+        return stats
+
+    def run(self, stop_event: threading.Event = None) -> None:
+        """Sync now, then re-sync on every catalog change until ``stop_event`` is set."""
+        stop_event = stop_event or threading.Event()
+        self.sync()
+        while not stop_event.is_set():
+            self.loader.wait_for_change(self.poll_interval)
+            if stop_event.is_set():
+                return
+            fingerprint = self.loader.catalog_fingerprint()
+            if fingerprint is None or fingerprint != self.last_fingerprint:
+                print("Schema change detected, syncing schema index")
+                self.sync(refresh=True)
@@ -9,14 +9,21 @@ setup(
     install_requires=[
         "chromadb",
         "sentence-transformers",
+        "numpy",
         "pyyaml",
         "pytest",
         "qdrant-client",
         "datasets",
+        "pandas",
+        "pyarrow",
         "tqdm",
         "huggingface-hub",
         "sqlalchemy",  # Added for SQL schema handling
-        "psycopg2-binary"  # Added for PostgreSQL support
+        "psycopg2-binary",  # Added for PostgreSQL support
+        "requests",  # Ollama client
+        "onnxruntime",  # ONNX embedding backend
+        "onnx",
+        "tokenizers"
     ],
     python_requires=">=3.11",
     classifiers=[
@@ -1,31 +1,21 @@
-from databases.qdrant_db import QdrantAdapter
+from databases.factory import create_vector_database
 from embeddings.embedding_models import EmbeddingModel
+from retrievers.hybrid import lexical_index_path
 from retrievers.retriever import RAGRetriever
+from retrievers.schema_retriever import SchemaRetriever
+from retrievers.schema_sync import SchemaIndexSync
 from utils.config import load_config
-from utils.sql_schema_loader import SQLSchemaLoader
-from typing import List, Dict, Any
+from utils.sql_schema_loader import SQLSchemaLoader, SCHEMA_SOURCE
+from utils.metrics import StageMetrics, timer
+from typing import List, Dict, Any, Iterator, Tuple
 import time
-from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import hashlib
 import json
+import sys
 from llm.code_generator import CodeGenerator
 
-@contextmanager
-def timer(description: str):
-    """Utility context manager for timing code blocks."""
-    start = time.time()
-    yield
-    elapsed = time.time() - start
-    print(f"{description}: {elapsed:.2f} seconds")
-
-def load_sql_schemas(connection_string: str) -> List[Dict[str, Any]]:
-    """Load and process SQL schema information."""
-    with timer("Loading SQL schemas"):
-        loader = SQLSchemaLoader(connection_string)
-        schemas = loader.load_all_schemas()
-    
-    print(f"Loaded {len(schemas)} table schemas")
-    return schemas
-
 def analyze_json_structure(json_obj: Dict[str, Any], prefix: str = "") -> List[str]:
         """Analyze JSON structure and return field descriptions."""
         descriptions = []
@@ -53,87 +43,341 @@ def analyze_json_query(json_obj: Dict[str, Any], loader: SQLSchemaLoader) -> str
     query = "\n".join(fields)
     return query
 
-def main():
+def json_signature(json_obj: Dict[str, Any]) -> str:
+    """Structural signature of a JSON object: a hash of its field paths and value types."""
+    fields = "\n".join(analyze_json_structure(json_obj))
+    return hashlib.sha1(fields.encode("utf-8")).hexdigest()
+
+def read_json_documents(input_path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (line number, object) from a JSONL file, or stdin for "-"; invalid lines are skipped."""
+    f = sys.stdin if input_path == "-" else open(input_path, "r")
+    try:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                json_obj = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_number}: {e}")
+                continue
+            if isinstance(json_obj, dict):
+                yield line_number, json_obj
+            else:
+                print(f"Skipping line {line_number}: not a JSON object")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def create_code_generator(llm_config: Dict[str, Any], pool_size: int = 4) -> CodeGenerator:
+    """Create a CodeGenerator from the ``llm`` config section."""
+    return CodeGenerator(
+        host=llm_config['host'],
+        port=llm_config['port'],
+        model=llm_config['model'],
+        parameters=llm_config.get('parameters', {}),
+        timeout=llm_config.get('timeout', 300),
+        connect_timeout=llm_config.get('connect_timeout', 5),
+        max_retries=llm_config.get('max_retries', 3),
+        cache_size=llm_config.get('cache_size', 256),
+        cache_dir=llm_config.get('cache_dir'),
+        cache_disk_entries=llm_config.get('cache_disk_entries', 4096),
+        prompt_token_budget=llm_config.get('prompt_token_budget', 2048),
+        pool_size=pool_size
+    )
+
+def run_batch(input_path: str, output_path: str, retriever: RAGRetriever, schema_loader: SQLSchemaLoader,
+              code_generator: CodeGenerator, schema_index_config: Dict[str, Any],
+              workers: int = 4, retrieval_batch_size: int = 256) -> Dict[str, Dict[str, Any]]:
+    """
+    Generate code for every distinct JSON shape in a JSONL input.
+
+    Documents are grouped by ``json_signature``, so each shape is retrieved and
+    generated once. Table retrieval for all shapes goes through batched
+    embedding and search, ``retrieval_batch_size`` shapes at a time. Generation
+    runs on a pool of ``workers`` threads sharing the client's connection pool.
+    Each output line holds one shape's signature, fields, document count, first
+    input line, tables and code (or error), written as generation finishes.
+    A shape whose retrieval, prompt or generation fails gets an "error"
+    record; the other shapes are not affected.
+
+    Returns:
+        Per-stage throughput and latency percentiles, see ``StageMetrics.summary``
+    """
+    metrics = StageMetrics()
+    two_stage = schema_index_config.get('two_stage', True)
+    top_k = schema_index_config.get('top_k', 5)
+    
+    shapes: Dict[str, Dict[str, Any]] = {}
+    start = time.perf_counter()
+    for line_number, json_obj in read_json_documents(input_path):
+        signature = json_signature(json_obj)
+        shape = shapes.get(signature)
+        if shape is None:
+            shapes[signature] = {
+                "signature": signature,
+                "fields": analyze_json_structure(json_obj),
+                "count": 1,
+                "first_line": line_number,
+                "json": json_obj
+            }
+        else:
+            shape["count"] += 1
+        # Includes reading and decoding the line
+        end = time.perf_counter()
+        metrics.record("parse", start, end)
+        start = end
+    
+    unique_shapes = list(shapes.values())
+    documents_read = sum(shape["count"] for shape in unique_shapes)
+    print(f"Read {documents_read} documents with {len(unique_shapes)} distinct shapes")
+    
+    schema_retriever = SchemaRetriever(retriever, schema_loader)
+    
+    def retrieve(batch: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        if two_stage:
+            return schema_retriever.retrieve_tables_many(
+                [shape["fields"] for shape in batch],
+                top_k=top_k,
+                columns_per_field=schema_index_config.get('columns_per_field', 3),
+                expand_joins=schema_index_config.get('expand_joins', True),
+                max_join_hops=schema_index_config.get('max_join_hops', 3)
+            )
+        hits = retriever.retrieve_many(
+            ["\n".join(shape["fields"]) for shape in batch],
+            top_k=top_k,
+            filters={"doc_type": "table"}
+        )
+        return [
+            [{"table_name": hit['metadata']['table_name'], "schema": hit['metadata']['schema']} for hit in shape_hits]
+            for shape_hits in hits
+        ]
+    
+    for start in range(0, len(unique_shapes), retrieval_batch_size):
+        batch = unique_shapes[start:start + retrieval_batch_size]
+        with metrics.measure("retrieve", items=len(batch)):
+            try:
+                results = retrieve(batch)
+            except Exception:
+                # Retry shape by shape so one bad shape does not fail its whole batch
+                results = []
+                for shape in batch:
+                    try:
+                        results.append(retrieve([shape])[0])
+                    except Exception as e:
+                        shape["error"] = f"Table retrieval failed: {e}"
+                        results.append([])
+        for shape, tables in zip(batch, results):
+            shape["tables"] = [
+                {
+                    "table_name": table['table_name'],
+                    "schema": table['schema'],
+                    "matched_fields": table.get('matched_fields', {})
+                }
+                for table in tables
+            ]
+    
+    def generate(shape: Dict[str, Any]) -> Dict[str, Any]:
+        with metrics.measure("generate"):
+            record = {
+                "signature": shape["signature"],
+                "fields": shape["fields"],
+                "count": shape["count"],
+                "first_line": shape["first_line"],
+                "tables": [table["table_name"] for table in shape["tables"]]
+            }
+            if "error" in shape:
+                record["error"] = shape["error"]
+                return record
+            try:
+                prompt, prompt_stats = code_generator.build_prompt(shape["tables"], shape["json"])
+                record["prompt_tokens"] = prompt_stats["tokens_after"]
+                record["code"] = code_generator.generate_from_prompt(prompt)
+            except Exception as e:
+                record["error"] = str(e)
+            return record
+    
+    failed = 0
+    with open(output_path, "w") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(generate, shape) for shape in unique_shapes]):
+            record = future.result()
+            failed += "error" in record
+            with metrics.measure("write"):
+                out.write(json.dumps(record) + "\n")
+    
+    print(f"Wrote {len(unique_shapes)} results to {output_path} ({failed} failed)")
+    return metrics.summary()
+
+def main(watch: bool = False, batch_input: str = None, batch_output: str = None, workers: int = None):
     with timer("Loading configuration"):
         config = load_config()
     
-    with timer("Initializing Qdrant"):
-        qdrant_config = config['databases']['qdrant']
-        qdrant_db = QdrantAdapter(
-            collection_name=qdrant_config['collection_name'],
-            vector_size=qdrant_config['vector_size'],
-            host=qdrant_config['host'],
-            port=qdrant_config['port']
-        )
-        qdrant_db.connect()
+    with timer("Initializing vector database"):
+        vector_db = create_vector_database(config)
     
     with timer("Initializing embedding model"):
-        embedding_model = EmbeddingModel(model_name=config['embedding']['model_name'])
-    
-    with timer("Initializing retriever"):
-        retriever = RAGRetriever(qdrant_db, embedding_model)
-    
-    # Load SQL schemas
-    connection_string = config['database']['connection_string']
-    schema_loader = SQLSchemaLoader(connection_string)
-    
-    with timer("Loading SQL schemas"):
-        schema_documents = load_sql_schemas(connection_string)
-    
-    with timer("Adding schemas to vector database"):
-        texts = [doc["text"] for doc in schema_documents]
-        metadata = [doc["metadata"] for doc in schema_documents]
-        retriever.add_documents(texts, metadata=metadata)
-    
-    # Example JSON query
-    sample_json = {
-        "book": {
-            "title": "The Great Gatsby",
-            "isbn": "9780743273565",
-            "author": {
-                "first_name": "F. Scott",
-                "last_name": "Fitzgerald"
-            },
-            "inventory": {
-                "condition": "new",
-                "quantity": 50,
-                "retail_price": 15.99
-            },
-            "categories": ["Fiction", "Classics"]
+        embedding_model = EmbeddingModel(
+            model_name=config['embedding']['model_name'],
+            cache_dir=config['embedding'].get('cache_dir'),
+            cache_max_entries=config['embedding'].get('cache_max_entries', 100_000),
+            num_workers=config['embedding'].get('num_workers', 0),
+            devices=config['embedding'].get('devices'),
+            max_seq_length=config['embedding'].get('max_seq_length'),
+            backend=config['embedding'].get('backend', 'torch'),
+            onnx_dir=config['embedding'].get('onnx_dir'),
+            onnx_quantized=config['embedding'].get('onnx_quantized', False),
+            normalize=config['embedding'].get('normalize', False)
+        )
+    
+    try:
+        with timer("Initializing retriever"):
+            retrieval_config = config.get('retrieval', {})
+            retriever = RAGRetriever(
+                vector_db,
+                embedding_model,
+                query_cache_size=retrieval_config.get('query_cache_size', 1024),
+                query_cache_ttl=retrieval_config.get('query_cache_ttl', 3600),
+                result_cache_size=retrieval_config.get('result_cache_size', 0),
+                result_cache_ttl=retrieval_config.get('result_cache_ttl', 300),
+                hybrid=retrieval_config.get('hybrid', False),
+                rrf_k=retrieval_config.get('rrf_k', 60),
+                hybrid_candidates=retrieval_config.get('hybrid_candidates', 50),
+                lexical_index_path=lexical_index_path(retrieval_config.get('lexical_index_dir'),
+                                                      vector_db.collection_name, SCHEMA_SOURCE)
+            )
+    
+        # Load SQL schemas
+        connection_string = config['database']['connection_string']
+        schema_loader = SQLSchemaLoader(
+            connection_string,
+            schema=config['database'].get('schema'),
+            snapshot_dir=config['database'].get('schema_snapshot_dir', '.cache/sql_schemas')
+        )
+    
+        schema_index_config = config.get('schema_index', {})
+        two_stage = schema_index_config.get('two_stage', True)
+        schema_sync = SchemaIndexSync(
+            schema_loader,
+            retriever,
+            poll_interval=config['database'].get('watch_poll_interval', 30.0),
+            include_columns=two_stage
+        )
+        if watch:
+            # Keep the schema index fresh until interrupted
+            schema_sync.run()
+            return
+    
+        with timer("Syncing schemas with vector database"):
+            # Only added or changed tables are embedded; dropped tables are deleted
+            schema_sync.sync()
+    
+        if batch_input:
+            batch_config = config.get('batch', {})
+            workers = workers or batch_config.get('workers', 4)
+            code_generator = create_code_generator(config['llm'], pool_size=workers)
+            with timer("Batch code generation"):
+                stage_metrics = run_batch(
+                    batch_input,
+                    batch_output or batch_config.get('output', 'generated_code.jsonl'),
+                    retriever,
+                    schema_loader,
+                    code_generator,
+                    schema_index_config,
+                    workers=workers,
+                    retrieval_batch_size=batch_config.get('retrieval_batch_size', 256)
+                )
+            code_generator.close()
+            print("\nStage metrics:")
+            for stage, stats in stage_metrics.items():
+                print(f"  {stage}: {stats['items']} items, {stats['items_per_second']:.1f}/s, "
+                      f"p50 {stats['latency_p50_ms']:.1f} ms, p95 {stats['latency_p95_ms']:.1f} ms, "
+                      f"p99 {stats['latency_p99_ms']:.1f} ms")
+            return
+    
+        # Example JSON query
+        sample_json = {
+            "book": {
+                "title": "The Great Gatsby",
+                "isbn": "9780743273565",
+                "author": {
+                    "first_name": "F. Scott",
+                    "last_name": "Fitzgerald"
+                },
+                "inventory": {
+                    "condition": "new",
+                    "quantity": 50,
+                    "retail_price": 15.99
+                },
+                "categories": ["Fiction", "Classics"]
+            }
         }
-    }
     
-    with timer("Performing schema matching"):
-        query = analyze_json_query(sample_json, schema_loader)
-        results = retriever.retrieve(query, top_k=5)
+        with timer("Performing schema matching"):
+            top_k = schema_index_config.get('top_k', 5)
+            print(f"\nAnalyzing JSON structure:\n{json.dumps(sample_json, indent=2)}")
         
-        print(f"\nAnalyzing JSON structure:\n{json.dumps(sample_json, indent=2)}")
-        print(f"\nGenerated Query:\n{query}")
-        print("\nRecommended tables:")
+            if two_stage:
+                # Match each field against column vectors, then aggregate hits per table
+                fields = analyze_json_structure(sample_json)
+                results = SchemaRetriever(retriever, schema_loader).retrieve_tables(
+                    fields,
+                    top_k=top_k,
+                    columns_per_field=schema_index_config.get('columns_per_field', 3),
+                    expand_joins=schema_index_config.get('expand_joins', True),
+                    max_join_hops=schema_index_config.get('max_join_hops', 3)
+                )
+                print("\nFields:\n" + "\n".join(fields))
+            else:
+                query = analyze_json_query(sample_json, schema_loader)
+                results = [
+                    {"table_name": hit['metadata']['table_name'], "schema": hit['metadata']['schema']}
+                    for hit in retriever.retrieve(query, top_k=top_k, filters={"doc_type": "table"})
+                ]
+                print(f"\nGenerated Query:\n{query}")
+            print("\nRecommended tables:")
         
-        # Collect relevant table schemas
-        relevant_schemas = []
-        for i, result in enumerate(results, 1):
-            table_name = result['metadata']['table_name']
-            schema = result['metadata']['schema']
-            print(f"\n{i}. Table: {table_name}")
-            relevant_schemas.append({
-                "table_name": table_name,
-                "schema": schema
-            })
+            # Collect relevant table schemas
+            relevant_schemas = []
+            for i, result in enumerate(results, 1):
+                print(f"\n{i}. Table: {result['table_name']}")
+                if result.get('matched_fields'):
+                    print(f"   Matched fields: {result['matched_fields']}")
+                if result.get('join_table'):
+                    print("   (added to join the tables above)")
+                relevant_schemas.append({
+                    "table_name": result['table_name'],
+                    "schema": result['schema'],
+                    "matched_fields": result.get('matched_fields', {})
+                })
 
-        # Generate code using Ollama
-        with timer("Generating code"):
-            code_generator = CodeGenerator(
-                host=config['llm']['host'],
-                port=config['llm']['port'],
-                model=config['llm']['model'],
-                parameters=config['llm'].get('parameters', {})
-            )
-            generated_code = code_generator.generate_code(relevant_schemas, sample_json)
-            print("\nGenerated Code:")
-            print(generated_code)
+            # Generate code using Ollama
+            with timer("Generating code"):
+                llm_config = config['llm']
+                code_generator = create_code_generator(llm_config)
+                print("\nGenerated Code:")
+                if llm_config.get('stream', True):
+                    # Print tokens as they arrive instead of waiting for the whole completion
+                    for token in code_generator.stream_code(relevant_schemas, sample_json):
+                        print(token, end="", flush=True)
+                    print()
+                else:
+                    print(code_generator.generate_code(relevant_schemas, sample_json))
+                prompt_stats = code_generator.last_prompt_stats
+                print(f"Prompt tokens: {prompt_stats['tokens_before']} -> {prompt_stats['tokens_after']} "
+                      f"({prompt_stats['tables']} tables)")
+                code_generator.close()
+    
+        if embedding_model.cache is not None:
+            print(f"\nEmbedding cache: {embedding_model.cache.stats()}")
+    finally:
+        # Stop encode workers and compact the embedding cache index, also on errors and Ctrl-C
+        embedding_model.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match JSON documents to SQL tables and generate insert code")
+    parser.add_argument("--watch", action="store_true", help="Keep the schema index in sync with the database")
+    parser.add_argument("--batch", metavar="INPUT", help="JSONL file of documents to process, or - for stdin")
+    parser.add_argument("--output", help="JSONL file for batch results")
+    parser.add_argument("--workers", type=int, help="Concurrent code generation requests in batch mode")
+    args = parser.parse_args()
     with timer("Total execution"):
-        main() 
\ No newline at end of file
+        main(watch=args.watch, batch_input=args.batch, batch_output=args.output, workers=args.workers) 
\ No newline at end of file
@@ -0,0 +1,152 @@
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+FRONT_MATTER_PATTERN = re.compile(r"\A---[ \t]*\n.*?\n---[ \t]*(?:\n|\Z)", re.DOTALL)
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s+")
+# Words and single punctuation marks, roughly what a WordPiece/BPE tokenizer emits
+TOKEN_ESTIMATE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of model tokens in ``text`` without a tokenizer."""
+    return len(TOKEN_ESTIMATE_PATTERN.findall(text))
+
+def strip_front_matter(text: str) -> str:
+    """Remove a leading YAML front-matter block (``---`` ... ``---``), as found on dataset cards."""
+    match = FRONT_MATTER_PATTERN.match(text)
+    return text[match.end():] if match else text
+
+def split_sections(text: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (heading path, body) for each markdown section of ``text``.
+
+    The heading path joins the enclosing headings with " > ". Lines inside
+    fenced code blocks are never taken for headings.
+    """
+    headings: List[Tuple[int, str]] = []
+    body: List[str] = []
+    in_fence = False
+
+    def current() -> Tuple[str, str]:
+        return " > ".join(title for _, title in headings), "\n".join(body).strip()
+
+    for line in text.splitlines():
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else HEADING_PATTERN.match(line)
+        if match is None:
+            body.append(line)
+            continue
+        path, section_body = current()
+        if section_body:
+            yield path, section_body
+        level = len(match.group(1))
+        headings = [(lvl, title) for lvl, title in headings if lvl < level] + [(level, match.group(2))]
+        body = []
+    path, section_body = current()
+    if section_body:
+        yield path, section_body
+
+class MarkdownChunker:
+    """
+    Split long markdown into overlapping chunks that fit an embedding model's input.
+
+    Text is first split into markdown sections, so a chunk never spans two
+    sections. Within a section, paragraphs are packed greedily up to
+    ``max_tokens``. A paragraph that does not fit on its own is split at
+    sentence ends, and over-long sentences at word boundaries. Each new chunk
+    of a section starts with up to ``overlap_tokens`` tokens from the end of
+    the previous one.
+    """
+
+    def __init__(self, max_tokens: int = 256, overlap_tokens: int = 32,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        """
+        Args:
+            max_tokens: Max tokens per chunk; keep below the model's max sequence length
+                to leave room for the prefix added to each chunk
+            overlap_tokens: Tokens repeated from the previous chunk of the same section
+            count_tokens: Token counter, e.g. backed by the embedding model's tokenizer
+        """
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count_tokens = count_tokens
+
+    def _pieces(self, section_body: str) -> Iterator[str]:
+        """Yield paragraphs, or sentences/word windows of paragraphs that exceed ``max_tokens``."""
+        for paragraph in re.split(r"\n\s*\n", section_body):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if self.count_tokens(paragraph) <= self.max_tokens:
+                yield paragraph
+                continue
+            for sentence in SENTENCE_END_PATTERN.split(paragraph):
+                if self.count_tokens(sentence) <= self.max_tokens:
+                    yield sentence
+                    continue
+                words = sentence.split()
+                window: List[str] = []
+                for word in words:
+                    if window and self.count_tokens(" ".join(window + [word])) > self.max_tokens:
+                        yield " ".join(window)
+                        window = []
+                    window.append(word)
+                if window:
+                    yield " ".join(window)
+
+    def _overlap(self, text: str) -> str:
+        """The last ``overlap_tokens`` tokens' worth of whole words of ``text``."""
+        if not self.overlap_tokens:
+            return ""
+        words = text.split()
+        tail: List[str] = []
+        while words and self.count_tokens(" ".join([words[-1]] + tail)) <= self.overlap_tokens:
+            tail.insert(0, words.pop())
+        return " ".join(tail)
+
+    def chunk(self, text: str) -> Iterator[Tuple[str, str]]:
+        """Yield (heading path, chunk text) pairs for ``text``, in document order."""
+        for section, body in split_sections(strip_front_matter(text)):
+            current: List[str] = []
+            tokens = 0
+            for piece in self._pieces(body):
+                piece_tokens = self.count_tokens(piece)
+                if current and tokens + piece_tokens > self.max_tokens:
+                    chunk_text = "\n\n".join(current)
+                    yield section, chunk_text
+                    overlap = self._overlap(chunk_text)
+                    current = [overlap] if overlap else []
+                    tokens = self.count_tokens(overlap) if overlap else 0
+                    # Drop the overlap if it would push the next piece over the limit
+                    if tokens + piece_tokens > self.max_tokens:
+                        current, tokens = [], 0
+                current.append(piece)
+                tokens += piece_tokens
+            if current:
+                yield section, "\n\n".join(current)
+
+def create_chunker(chunking_config: Dict[str, Any], embedding_model: Any = None) -> Optional[MarkdownChunker]:
+    """
+    Create the card chunker from an ``ingest.chunking`` config, or None if chunking is disabled.
+
+    With an ``embedding_model`` (an ``EmbeddingModel``), chunks are measured
+    with its tokenizer, and ``max_tokens`` is capped so a chunk plus
+    ``prefix_tokens`` of document prefix fits its input without truncation.
+    Otherwise tokens are estimated (see ``estimate_tokens``).
+    """
+    if not chunking_config.get('enabled', False):
+        return None
+    max_tokens = chunking_config.get('max_tokens', 256)
+    count_tokens = estimate_tokens
+    if embedding_model is not None:
+        count_tokens = embedding_model.count_tokens
+        max_tokens = min(max_tokens, embedding_model.max_text_tokens - chunking_config.get('prefix_tokens', 32))
+    return MarkdownChunker(
+        max_tokens=max_tokens,
+        overlap_tokens=chunking_config.get('overlap_tokens', 32),
+        count_tokens=count_tokens
+    )
@@ -1,33 +1,177 @@
-from datasets import load_dataset
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Union
 from tqdm import tqdm
+import os
 import re
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from utils.chunking import MarkdownChunker
+from utils.dedup import DuplicateFilter
+from utils.document_ids import content_hash
+from utils.text_index import BM25Index
+
+# Metadata "source" of dataset documents, used to scope index syncs
+HF_DATASET_SOURCE = "hf_dataset"
 
 class HuggingFaceMetaLoader:
-    """Loader for fetching dataset metadata from librarian-bots/dataset_cards_with_metadata."""
+    """
+    Loader for fetching dataset metadata from librarian-bots/dataset_cards_with_metadata.
+    
+    The cleaned table is written once to a local Arrow IPC snapshot. Later
+    loads memory-map that file instead of going through ``datasets`` and
+    pandas, so construction reads no column data. Rows are read straight from
+    the Arrow table. The name and task/tag indexes, and the pandas
+    ``metadata_dataset`` frame, are built on first use, from Arrow buffers.
+    
+    Text queries in ``search_datasets`` are answered from a BM25 index over
+    the cards, built on first use and persisted next to the snapshot.
+    """
+    
+    DATASET_NAME = "librarian-bots/dataset_cards_with_metadata"
+    LIST_COLUMNS = ['task_categories', 'tags']
+    STRING_COLUMNS = ['datasetId', 'author', 'card']
     
-    def __init__(self):
-        # Load dataset and convert to DataFrame
-        self.metadata_dataset = pd.DataFrame(load_dataset("librarian-bots/dataset_cards_with_metadata")['train'])
-        # Clean up DataFrame
-        self.metadata_dataset = self._clean_dataframe()
+    def __init__(self, snapshot_path: str = ".cache/hf_metadata/dataset_cards.arrow", refresh: bool = False):
+        """
+        Args:
+            snapshot_path: Location of the local Arrow snapshot of the cleaned table
+            refresh: Rebuild the snapshot from the Hugging Face dataset even if it exists
+        """
+        self.snapshot_path = snapshot_path
+        if refresh or not os.path.exists(snapshot_path):
+            self._build_snapshot()
+        
+        # Memory-map the snapshot; reading the table does not copy the column buffers
+        self._table = pa.ipc.open_file(pa.memory_map(snapshot_path, 'r')).read_all()
+        self._cards = self._table.column('card')
+        self._text_index = None
+        self._metadata_dataset: Optional[pd.DataFrame] = None
+        self._dataset_index: Optional[Dict[str, int]] = None
+        self._task_index: Optional[Dict[str, List[int]]] = None
+        self._tag_index: Optional[Dict[str, List[int]]] = None
     
-    def _clean_dataframe(self) -> pd.DataFrame:
+    def _build_snapshot(self) -> None:
+        """Load the dataset (from the local HF cache when available), clean it and write the snapshot."""
+        # Only building the snapshot needs ``datasets``; loading it and DocumentProcessor do not
+        from datasets import load_dataset
+        
+        df = self._clean_dataframe(pd.DataFrame(load_dataset(self.DATASET_NAME)['train']))
+        
+        table = pa.table({
+            **{column: pa.array(df[column].tolist(), type=pa.string()) for column in self.STRING_COLUMNS},
+            **{column: pa.array(df[column].tolist(), type=pa.list_(pa.string())) for column in self.LIST_COLUMNS},
+        })
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self.snapshot_path)
+    
+    @staticmethod
+    def _clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         """Clean and prepare the DataFrame."""
-        df = self.metadata_dataset.copy()
+        df = df.copy()
         
         # Fill NaN values
-        df['task_categories'] = df['task_categories'].fillna('').apply(lambda x: [] if x == '' else x)
-        df['tags'] = df['tags'].fillna('').apply(lambda x: [] if x == '' else x)
+        df['task_categories'] = df['task_categories'].fillna('').apply(lambda x: [] if x == '' else list(x))
+        df['tags'] = df['tags'].fillna('').apply(lambda x: [] if x == '' else list(x))
         df['card'] = df['card'].fillna('')
         df['author'] = df['author'].fillna('')
         
         return df
     
+    @property
+    def metadata_dataset(self) -> pd.DataFrame:
+        """The small columns (no cards) as a DataFrame, converted from Arrow on first access."""
+        if self._metadata_dataset is None:
+            self._metadata_dataset = self._table.select(['datasetId', 'author'] + self.LIST_COLUMNS).to_pandas()
+        return self._metadata_dataset
+    
+    @property
+    def dataset_index(self) -> Dict[str, int]:
+        """datasetId -> row position of its first row, built on first use."""
+        if self._dataset_index is None:
+            dataset_ids = self._table.column('datasetId').to_pylist()
+            # Reversed, so the first row of a repeated datasetId wins
+            self._dataset_index = dict(zip(reversed(dataset_ids), range(len(dataset_ids) - 1, -1, -1)))
+        return self._dataset_index
+    
+    @property
+    def task_index(self) -> Dict[str, List[int]]:
+        """Task category -> ascending row positions, built on first use."""
+        if self._task_index is None:
+            self._task_index = self._posting_lists('task_categories')
+        return self._task_index
+    
+    @property
+    def tag_index(self) -> Dict[str, List[int]]:
+        """Tag -> ascending row positions, built on first use."""
+        if self._tag_index is None:
+            self._tag_index = self._posting_lists('tags')
+        return self._tag_index
+    
+    def _posting_lists(self, column: str) -> Dict[str, List[int]]:
+        """Map each value of list column ``column`` to the positions of the rows containing it."""
+        values = self._table.column(column).combine_chunks()
+        pairs = pd.DataFrame({
+            "value": pc.list_flatten(values).to_numpy(zero_copy_only=False),
+            "position": pc.list_parent_indices(values).to_numpy()
+        }).drop_duplicates()
+        return {value: positions.tolist() for value, positions in pairs.groupby("value", sort=False)["position"]}
+    
+    def dataset_ids(self, positions: List[int] = None) -> List[str]:
+        """datasetIds of the rows at ``positions`` (default: all rows), in table order."""
+        column = self._table.column('datasetId')
+        return (column if positions is None else column.take(positions)).to_pylist()
+    
+    def get_card(self, position: int) -> str:
+        """Read the dataset card of the row at ``position`` from the snapshot."""
+        return self._cards[position].as_py() or ''
+    
+    def _searchable_text(self, position: int) -> str:
+        return f"{self._table.column('datasetId')[position].as_py()}\n{self.get_card(position)}"
+    
+    def _get_text_index(self) -> BM25Index:
+        """Load the persisted card index, building it if it is missing or stale."""
+        if self._text_index is not None:
+            return self._text_index
+        
+        index_path = f"{self.snapshot_path}.bm25.pkl"
+        snapshot_stat = os.stat(self.snapshot_path)
+        fingerprint = (snapshot_stat.st_size, snapshot_stat.st_mtime_ns)
+        self._text_index = BM25Index.load(index_path, fingerprint)
+        if self._text_index is None:
+            self._text_index = BM25Index()
+            position = 0
+            dataset_ids = self.dataset_ids()
+            # Stream the card column chunk by chunk instead of materialising it
+            for chunk in tqdm(self._cards.chunks, desc="Indexing dataset cards"):
+                for card in chunk.to_pylist():
+                    self._text_index.add(position, f"{dataset_ids[position]}\n{card or ''}")
+                    position += 1
+            self._text_index.save(index_path, fingerprint)
+        return self._text_index
+    
+    def _rows_metadata(self, positions: List[int]) -> List[Dict[str, Any]]:
+        """Build the metadata dicts of the rows at ``positions`` with one Arrow ``take``."""
+        rows = self._table.take(positions).to_pydict()
+        return [
+            {
+                "name": dataset_id,
+                "description": card or '',
+                "task_categories": tasks,
+                "tags": tags,
+                "author": author,
+            }
+            for dataset_id, card, tasks, tags, author in zip(
+                rows['datasetId'], rows['card'], rows['task_categories'], rows['tags'], rows['author']
+            )
+        ]
+    
     def load_dataset_metadata(self, dataset_name: str) -> Dict[str, Any]:
         """
-        Load dataset metadata from the DataFrame.
+        Load dataset metadata from the snapshot.
         
         Args:
             dataset_name: Name of the dataset on Hugging Face
@@ -36,101 +180,165 @@ class HuggingFaceMetaLoader:
             Dictionary containing processed metadata and documentation
         """
         try:
-            # Query the DataFrame
-            dataset_info = self.metadata_dataset[self.metadata_dataset['datasetId'] == dataset_name]
+            position = self.dataset_index.get(dataset_name)
             
-            if dataset_info.empty:
+            if position is None:
                 print(f"Dataset {dataset_name} not found in metadata collection")
                 return {}
             
-            # Get the first matching row
-            row = dataset_info.iloc[0]
-            
-            metadata = {
-                "name": dataset_name,
-                "description": row['card'],
-                "task_categories": row['task_categories'],
-                "tags": row['tags'],
-                "author": row['author'],
-            }
-            
-            return metadata
+            return self._rows_metadata([position])[0]
             
         except Exception as e:
             print(f"Error loading metadata for {dataset_name}: {str(e)}")
             return {}
+    
+    def load_many(self, dataset_names: List[str]) -> List[Dict[str, Any]]:
+        """
+        Load metadata for several datasets with a single row selection.
+        
+        Args:
+            dataset_names: Names of datasets on Hugging Face
+            
+        Returns:
+            Metadata dicts for the datasets that were found, in input order
+        """
+        positions = [self.dataset_index[name] for name in dataset_names if name in self.dataset_index]
+        missing = len(dataset_names) - len(positions)
+        if missing:
+            print(f"{missing} of {len(dataset_names)} datasets not found in metadata collection")
+        return self._rows_metadata(positions)
 
     def search_datasets(self, 
                        query: str = None, 
                        task: str = None,
+                       tag: str = None,
                        limit: int = 100) -> List[str]:
         """
-        Search for datasets based on various criteria using DataFrame operations.
+        Search for datasets based on various criteria.
+        
+        Task and tag filters are answered from the inverted indexes. With a
+        text query, results are ranked by BM25 relevance over the dataset ids
+        and cards; otherwise they keep the table order.
         
         Args:
-            query: Text search query
+            query: Text search query; supports ``prefix*`` terms and "quoted phrases"
             task: Task category filter
+            tag: Tag filter
             limit: Maximum number of results
             
         Returns:
             List of dataset names
         """
-        # Start with all rows
-        mask = pd.Series(True, index=self.metadata_dataset.index)
-        
-        # Apply filters
+        positions = None
         if task:
-            mask &= self.metadata_dataset['task_categories'].apply(lambda x: task in x)
+            positions = self.task_index.get(task, [])
+        if tag:
+            tag_positions = self.tag_index.get(tag, [])
+            positions = tag_positions if positions is None else sorted(set(positions).intersection(tag_positions))
         
         if query:
-            mask &= self.metadata_dataset['card'].str.contains(query, case=False, na=False)
+            hits = self._get_text_index().search(
+                query,
+                limit=limit,
+                candidates=set(positions) if positions is not None else None,
+                get_text=self._searchable_text
+            )
+            return self.dataset_ids([position for position, _ in hits])
         
-        # Get filtered results
-        results = self.metadata_dataset[mask]['datasetId'].head(limit).tolist()
-        return results
+        if positions is None:
+            return self._table.column('datasetId').slice(0, limit).to_pylist()
+        return self.dataset_ids(positions[:limit])
 
     def get_dataset_stats(self) -> Dict[str, Any]:
         """Get general statistics about the datasets."""
-        # Flatten task categories and tags for counting
-        all_tasks = [task for tasks in self.metadata_dataset['task_categories'] for task in tasks if tasks]
-        all_tags = [tag for tags in self.metadata_dataset['tags'] for tag in tags if tags]
+        task_counts = pd.Series({task: len(rows) for task, rows in self.task_index.items()}, dtype=int)
+        tag_counts = pd.Series({tag: len(rows) for tag, rows in self.tag_index.items()}, dtype=int)
         
         return {
-            "total_datasets": len(self.metadata_dataset),
-            "total_tasks": len(set(all_tasks)),
-            "total_tags": len(set(all_tags)),
-            "popular_tasks": pd.Series(all_tasks).value_counts().head(),
-            "popular_tags": pd.Series(all_tags).value_counts().head()
+            "total_datasets": self._table.num_rows,
+            "total_tasks": len(self.task_index),
+            "total_tags": len(self.tag_index),
+            "popular_tasks": task_counts.sort_values(ascending=False).head(),
+            "popular_tags": tag_counts.sort_values(ascending=False).head()
         }
 
 class DocumentProcessor:
     """Process and filter documents before insertion into vector database."""
     
     @staticmethod
-    def create_documents_from_metadata(metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def create_documents_from_metadata(metadata: Dict[str, Any],
+                                       chunker: MarkdownChunker = None) -> List[Dict[str, Any]]:
         """Convert dataset metadata into documents for vector storage."""
-        documents = []
+        return list(DocumentProcessor.iter_documents_from_metadata(metadata, chunker))
+    
+    @staticmethod
+    def iter_documents_from_metadata(metadata: Dict[str, Any],
+                                     chunker: MarkdownChunker = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily convert dataset metadata into documents for vector storage.
+        
+        Without a chunker the whole card goes into one "basic_info" document.
+        With one, "basic_info" keeps only the dataset summary, and the card is
+        split into "card_chunk" documents. Each chunk is prefixed with the
+        dataset name and section so it can be understood on its own.
+        Chunk keys hash the chunk's section and text, so an edit to a card
+        changes the IDs of the edited chunks only. Every document's "dataset"
+        metadata names its parent, see ``RAGRetriever.retrieve_grouped``.
         
+        Args:
+            metadata: Dataset metadata from ``HuggingFaceMetaLoader``
+            chunker: Splits the card into chunks (None keeps it whole)
+        """
+        if chunker is None:
+            yield DocumentProcessor._basic_info_document(metadata, metadata['description'])
+            return
+        
+        yield DocumentProcessor._basic_info_document(metadata, None)
+        seen = set()
+        for index, (section, chunk) in enumerate(chunker.chunk(metadata['description'] or "")):
+            heading = f" / {section}" if section else ""
+            chunk_hash = content_hash(section + "\n" + chunk)[:16]
+            # Repeated boilerplate would collide on the same key
+            if chunk_hash in seen:
+                continue
+            seen.add(chunk_hash)
+            yield {
+                "key": f"{metadata['name']}:chunk:{chunk_hash}",
+                "text": f"Dataset: {metadata['name']}{heading}\n{chunk}",
+                "metadata": {
+                    "source": HF_DATASET_SOURCE,
+                    "dataset": metadata["name"],
+                    "doc_type": "card_chunk",
+                    "section": section,
+                    "chunk_index": index,
+                    "task_categories": metadata.get('task_categories', []),
+                    "tags": metadata.get('tags', [])
+                }
+            }
+    
+    @staticmethod
+    def _basic_info_document(metadata: Dict[str, Any], description: Optional[str]) -> Dict[str, Any]:
+        """The dataset's summary document, with the card as description if given."""
         # Create document from basic metadata
         basic_info = (
             f"Dataset: {metadata['name']}\n"
-            f"Description: {metadata['description']}\n"
-            f"Tasks: {', '.join(metadata.get('task_categories', []))}\n"
+            + (f"Description: {description}\n" if description is not None else "")
+            + f"Tasks: {', '.join(metadata.get('task_categories', []))}\n"
             f"Tags: {', '.join(metadata.get('tags', []))}\n"
             f"Author: {metadata['author']}"
         )
         
-        documents.append({
+        return {
+            "key": f"{metadata['name']}:basic_info",
             "text": basic_info,
             "metadata": {
+                "source": HF_DATASET_SOURCE,
                 "dataset": metadata["name"],
                 "doc_type": "basic_info",
                 "task_categories": metadata.get('task_categories', []),
                 "tags": metadata.get('tags', [])
             }
-        })
-        
-        return documents
+        }
     
     @staticmethod
     def filter_by_length(documents: List[Dict[str, Any]], 
@@ -143,14 +351,21 @@ class DocumentProcessor:
         ]
     
     @staticmethod
-    def deduplicate(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Remove duplicate documents based on text content."""
-        seen_texts = set()
-        unique_docs = []
+    def deduplicate(documents: Iterable[Dict[str, Any]],
+                    duplicate_filter: DuplicateFilter = None) -> List[Dict[str, Any]]:
+        """Remove duplicate documents based on text content (exact duplicates only by default)."""
+        duplicate_filter = duplicate_filter or DuplicateFilter(threshold=None)
+        return list(DocumentProcessor.iter_deduplicated(documents, duplicate_filter))
+    
+    @staticmethod
+    def iter_deduplicated(documents: Iterable[Dict[str, Any]],
+                          duplicate_filter: DuplicateFilter) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily drop exact and near-duplicate documents, keeping the first of each.
         
+        Memory stays bounded by ``duplicate_filter.max_entries`` however long
+        the stream is, so this can run over all dataset cards before embedding.
+        """
         for doc in documents:
-            if doc["text"] not in seen_texts:
-                seen_texts.add(doc["text"])
-                unique_docs.append(doc)
-        
-        return unique_docs 
\ No newline at end of file
+            if duplicate_filter.check(doc["text"]) is None:
+                yield doc
@@ -0,0 +1,186 @@
+import hashlib
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from utils.text_index import tokenize
+
+# Mersenne prime 2**61 - 1 for the universal hash family of MinHash permutations
+MERSENNE_PRIME = (1 << 61) - 1
+# Multiplier combining token hashes into shingle hashes
+SHINGLE_BASE = 1_000_003
+# Rows of the shingle-by-permutation matrix hashed at once, bounding temporary memory
+SHINGLE_BLOCK = 4096
+
+def text_digest(text: str) -> int:
+    """Return a 64-bit BLAKE2b digest of ``text`` as an int."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+def lsh_parameters(threshold: float, num_perm: int, false_positive_weight: float = 0.3) -> Tuple[int, int]:
+    """
+    Choose (bands, rows per band) for MinHash LSH at a Jaccard ``threshold``.
+
+    Minimises the weighted false positive and false negative probability mass
+    of the banding S-curve ``1 - (1 - s**rows)**bands``, as datasketch does.
+    False positives are weighted less by default, since candidates are
+    verified against their full signature anyway and only cost a comparison.
+    """
+    similarities = np.linspace(0.0, 1.0, 201)
+    below = similarities <= threshold
+    best, best_error = (1, num_perm), float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        candidate = 1 - (1 - similarities ** rows) ** bands
+        error = false_positive_weight * candidate[below].sum() + (1 - false_positive_weight) * (1 - candidate[~below]).sum()
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+class DuplicateFilter:
+    """
+    Streaming exact and near-duplicate detection over document texts.
+
+    Every kept text is remembered by a 64-bit digest, so exact duplicates are
+    caught without storing texts. With a ``threshold``, texts of at least
+    ``min_tokens`` tokens also get a MinHash signature over word shingles.
+    Signatures are split into LSH bands, and a text is a near duplicate if it
+    shares a band with a kept text whose estimated Jaccard similarity is at
+    least ``threshold``. Shorter texts are only checked for exact duplicates,
+    as a few shared words say little about them.
+
+    Memory is bounded by ``max_entries``: once that many texts are kept, the
+    oldest are forgotten first, so duplicates further apart than that in the
+    stream are missed. Each entry costs ``4 * num_perm`` bytes of signature
+    plus one dict entry per band.
+    """
+
+    def __init__(self, threshold: Optional[float] = 0.85, num_perm: int = 128, shingle_size: int = 5,
+                 min_tokens: int = 32, max_entries: int = 1_000_000, seed: int = 1):
+        """
+        Args:
+            threshold: Jaccard similarity of word shingles above which texts are near duplicates
+                (None only removes exact duplicates)
+            num_perm: MinHash permutations; more estimate similarity more precisely
+            shingle_size: Words per shingle
+            min_tokens: Shortest text, in words, checked for near duplicates
+            max_entries: Kept texts remembered at most
+            seed: Seed of the MinHash permutations
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.min_tokens = min_tokens
+        self.max_entries = max_entries
+
+        rng = np.random.RandomState(seed)
+        # (a * x + b) % p with a, b < p; like datasketch, a * x may wrap around 2**64,
+        # which mixes far better than keeping it small
+        self._a = rng.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows = lsh_parameters(threshold, num_perm) if threshold is not None else (0, 0)
+
+        # Ring of kept entries; slot arrays grow by doubling up to max_entries
+        self._digests = np.zeros(0, dtype=np.uint64)
+        self._signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self._has_signature = np.zeros(0, dtype=bool)
+        self._exact: Dict[int, int] = {}
+        self._buckets: List[Dict[int, int]] = [{} for _ in range(self.bands)]
+        self._next_slot = 0
+        self._size = 0
+        self.counts = {"seen": 0, "kept": 0, "exact_duplicates": 0, "near_duplicates": 0}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of ``text``'s word shingles, or None if it has fewer than ``min_tokens`` words."""
+        tokens = tokenize(text)
+        if len(tokens) < max(self.min_tokens, 1):
+            return None
+        size = min(self.shingle_size, len(tokens))
+        token_hashes = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens),
+                                   dtype=np.uint64, count=len(tokens))
+        # Polynomial hash of each window of ``size`` token hashes (uint64 arithmetic wraps)
+        count = len(tokens) - size + 1
+        hashes = np.zeros(count, dtype=np.uint64)
+        for offset in range(size):
+            hashes = hashes * np.uint64(SHINGLE_BASE) + token_hashes[offset:offset + count]
+        hashes = np.unique(hashes & np.uint64(0xFFFFFFFF))
+        signature = np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(hashes), SHINGLE_BLOCK):
+            block = hashes[start:start + SHINGLE_BLOCK, None]
+            permuted = (block * self._a + self._b) % np.uint64(MERSENNE_PRIME)
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return (signature & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [hash(signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _near_duplicate_of(self, signature: np.ndarray, band_keys: List[int]) -> Optional[int]:
+        checked = set()
+        for band, key in enumerate(band_keys):
+            slot = self._buckets[band].get(key)
+            if slot is None or slot in checked:
+                continue
+            checked.add(slot)
+            if np.mean(self._signatures[slot] == signature) >= self.threshold:
+                return slot
+        return None
+
+    def _slot(self) -> int:
+        """Next slot to write, evicting the oldest entry once ``max_entries`` are kept."""
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % self.max_entries
+        if slot < self._size:
+            self._exact.pop(int(self._digests[slot]), None)
+            if self._has_signature[slot]:
+                for band, key in enumerate(self._band_keys(self._signatures[slot])):
+                    if self._buckets[band].get(key) == slot:
+                        del self._buckets[band][key]
+            return slot
+        if slot == len(self._digests):
+            capacity = min(self.max_entries, max(1024, 2 * slot))
+            self._digests = np.resize(self._digests, capacity)
+            self._has_signature = np.resize(self._has_signature, capacity)
+            if self.threshold is not None:
+                signatures = np.zeros((capacity, self.num_perm), dtype=np.uint32)
+                signatures[:slot] = self._signatures
+                self._signatures = signatures
+        self._size += 1
+        return slot
+
+    def check(self, text: str) -> Optional[str]:
+        """
+        Check ``text`` against the texts kept so far, and keep it if it is new.
+
+        Returns:
+            None for a new text, "exact" or "near" for a duplicate
+        """
+        self.counts["seen"] += 1
+        digest = text_digest(text)
+        if digest in self._exact:
+            self.counts["exact_duplicates"] += 1
+            return "exact"
+
+        signature = band_keys = None
+        if self.threshold is not None:
+            signature = self.signature(text)
+            if signature is not None:
+                band_keys = self._band_keys(signature)
+                if self._near_duplicate_of(signature, band_keys) is not None:
+                    self.counts["near_duplicates"] += 1
+                    return "near"
+
+        slot = self._slot()
+        self._digests[slot] = digest
+        self._exact[digest] = slot
+        self._has_signature[slot] = signature is not None
+        if signature is not None:
+            self._signatures[slot] = signature
+            for band, key in enumerate(band_keys):
+                self._buckets[band].setdefault(key, slot)
+        self.counts["kept"] += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Texts seen, kept and dropped as exact or near duplicates."""
+        return dict(self.counts, remembered=self._size)
@@ -0,0 +1,42 @@
+import hashlib
+import json
+import uuid
+from typing import Any, Dict
+
+# Fixed namespace so the same document always maps to the same point ID
+DOCUMENT_NAMESPACE = uuid.UUID("6f1c9a52-3d0e-4b7a-9a51-2f8e4c7d1b03")
+
+def content_hash(text: str) -> str:
+    """Return the SHA-256 hex digest of a document text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def metadata_hash(metadata: Dict[str, Any]) -> str:
+    """Return the SHA-256 hex digest of a metadata dict, independent of key order."""
+    payload = json.dumps(metadata, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def document_id(text: str, key: str = None, metadata: Dict[str, Any] = None) -> str:
+    """
+    Build a deterministic point ID from a document key and the hash of its payload.
+    
+    The ID is a UUID (accepted by both Qdrant and ChromaDB), so re-inserting an
+    unchanged document is a no-op and a changed document gets a new ID. The
+    metadata is part of the hash, so a change that only touches the stored
+    payload (e.g. a table's ``schema`` dict) also gets a new ID.
+    
+    Args:
+        text: Document text
+        key: Stable source key (e.g. dataset name or table name)
+        metadata: Metadata stored with the document
+        
+    Returns:
+        UUID string
+    """
+    name = f"{key or ''}\x00{content_hash(text)}"
+    if metadata:
+        name += f"\x00{metadata_hash(metadata)}"
+    return str(uuid.uuid5(DOCUMENT_NAMESPACE, name))
+
+def id_for_document(document: Dict[str, Any]) -> str:
+    """Return the point ID for a {"text", "metadata", "key"} document dict."""
+    return document_id(document["text"], document.get("key"), document.get("metadata"))
@@ -0,0 +1,103 @@
+from collections import deque
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+
+class ForeignKeyGraph:
+    """
+    Undirected adjacency index of the foreign keys between tables.
+
+    Built once from reflected schemas, it answers join-path questions with
+    breadth-first searches over plain dicts. Searches are depth-limited by
+    ``max_hops``, so a lookup only touches the neighbourhood of the tables
+    involved, however large the whole graph is.
+    """
+
+    def __init__(self, schemas: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            schemas: Table name -> schema dict, as returned by ``SQLSchemaLoader.reflect_all``
+        """
+        # table -> neighbour -> foreign keys linking the two (in either direction)
+        self.adjacency: Dict[str, Dict[str, List[Dict[str, Any]]]] = {table: {} for table in schemas}
+        for table_name, schema in schemas.items():
+            for fk in schema["foreign_keys"]:
+                referred = fk["referred_table"]
+                edge = {
+                    "table": table_name,
+                    "columns": fk["constrained_columns"],
+                    "referred_table": referred,
+                    "referred_columns": fk["referred_columns"]
+                }
+                self.adjacency.setdefault(referred, {})
+                self.adjacency[table_name].setdefault(referred, []).append(edge)
+                if referred != table_name:
+                    self.adjacency[referred].setdefault(table_name, []).append(edge)
+
+    def neighbors(self, table: str) -> List[str]:
+        """Tables directly linked to ``table`` by a foreign key."""
+        return list(self.adjacency.get(table, {}))
+
+    def _nearest(self, sources: Set[str], targets: Set[str], max_hops: int) -> Optional[List[str]]:
+        """Shortest path from any source to any target within ``max_hops`` edges."""
+        parents = {source: None for source in sources}
+        frontier = deque((source, 0) for source in sources)
+        while frontier:
+            table, depth = frontier.popleft()
+            if table in targets:
+                path = [table]
+                while parents[path[-1]] is not None:
+                    path.append(parents[path[-1]])
+                return path[::-1]
+            if depth == max_hops:
+                continue
+            for neighbor in self.adjacency.get(table, {}):
+                if neighbor not in parents:
+                    parents[neighbor] = table
+                    frontier.append((neighbor, depth + 1))
+        return None
+
+    def shortest_path(self, source: str, target: str, max_hops: int = 4) -> Optional[List[str]]:
+        """Tables on the shortest join path from ``source`` to ``target`` (inclusive), or None."""
+        return self._nearest({source}, {target}, max_hops)
+
+    def join_tree(self, tables: Iterable[str], max_hops: int = 3) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Connect ``tables`` with short join paths (Steiner tree approximation).
+
+        Starting from the first table, the nearest not-yet-connected table is
+        repeatedly joined to the tree through its shortest path. Tables that
+        cannot be reached within ``max_hops`` start a new component.
+
+        Args:
+            tables: Tables to connect, most relevant first
+            max_hops: Max foreign keys on any single connecting path
+
+        Returns:
+            (tables in the tree, input tables first; foreign keys used by the tree)
+        """
+        terminals = [table for table in dict.fromkeys(tables) if table in self.adjacency]
+        if not terminals:
+            return [], []
+
+        tree = [terminals[0]]
+        in_tree = {terminals[0]}
+        edges = []
+        remaining = set(terminals[1:])
+        while remaining:
+            path = self._nearest(in_tree, remaining, max_hops)
+            if path is None:
+                # Unreachable within max_hops: start a new component from the best remaining table
+                table = next(t for t in terminals if t in remaining)
+                path = [table]
+            for previous, table in zip(path, path[1:]):
+                if table not in in_tree:
+                    edges.append(self.adjacency[previous][table][0])
+            for table in path:
+                if table not in in_tree:
+                    in_tree.add(table)
+                    tree.append(table)
+            remaining -= in_tree
+
+        terminal_set = set(terminals)
+        ordered = [table for table in terminals if table in in_tree]
+        ordered += [table for table in tree if table not in terminal_set]
+        return ordered, edges
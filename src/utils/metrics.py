@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+@contextmanager
+def timer(description: str):
+    """Utility context manager for timing code blocks."""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    print(f"{description}: {elapsed:.2f} seconds")
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile ``p`` (0..1) of already sorted values, 0.0 if empty."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+class StageMetrics:
+    """
+    Thread-safe latency and throughput bookkeeping for the stages of a pipeline.
+
+    Each ``measure`` call records one operation of a stage, covering ``items``
+    items (e.g. a batch). Throughput is items per second of the stage's wall
+    time, from its first operation's start to its last operation's end, so
+    concurrent operations are not double counted.
+    """
+
+    def __init__(self):
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._items: Dict[str, int] = defaultdict(int)
+        self._spans: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, started_at: float, ended_at: float, items: int = 1) -> None:
+        """Record one operation of ``stage`` between two ``time.perf_counter`` readings."""
+        with self._lock:
+            self._latencies[stage].append(ended_at - started_at)
+            self._items[stage] += items
+            span = self._spans.setdefault(stage, [started_at, ended_at])
+            span[0] = min(span[0], started_at)
+            span[1] = max(span[1], ended_at)
+
+    @contextmanager
+    def measure(self, stage: str, items: int = 1):
+        """Context manager recording the enclosed block as one operation of ``stage``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, start, time.perf_counter(), items)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per stage: operations, items, wall seconds, items per second and latency percentiles in ms."""
+        with self._lock:
+            summary = {}
+            for stage, latencies in self._latencies.items():
+                latencies = sorted(latencies)
+                wall = self._spans[stage][1] - self._spans[stage][0]
+                summary[stage] = {
+                    "operations": len(latencies),
+                    "items": self._items[stage],
+                    "seconds": wall,
+                    "items_per_second": self._items[stage] / wall if wall else 0.0,
+                    "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+                    "latency_p95_ms": percentile(latencies, 0.95) * 1000,
+                    "latency_p99_ms": percentile(latencies, 0.99) * 1000
+                }
+            return summary
@@ -1,21 +1,88 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import sqlalchemy as sa
 from sqlalchemy import MetaData, inspect
+import hashlib
 import json
+import os
+import select
+import time
+from utils.fk_graph import ForeignKeyGraph
+
+# Metadata "source" of schema documents, used to scope index syncs
+SCHEMA_SOURCE = "sql_schema"
+# NOTIFY channel used by the DDL event trigger
+SCHEMA_CHANGE_CHANNEL = "schema_changed"
+
+# Hash of every column definition and constraint in one schema; changes on any DDL
+POSTGRES_FINGERPRINT_QUERY = sa.text("""
+    SELECT md5(coalesce(string_agg(definition, '|' ORDER BY definition), ''))
+    FROM (
+        SELECT c.relname || '.' || a.attname || ' ' || format_type(a.atttypid, a.atttypmod)
+               || CASE WHEN a.attnotnull THEN ' not null' ELSE '' END AS definition
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relkind IN ('r', 'p')
+          AND a.attnum > 0 AND NOT a.attisdropped
+        UNION ALL
+        SELECT c.relname || ' ' || con.conname || ' ' || pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema
+    ) definitions
+""")
+
+POSTGRES_CHANGE_TRIGGER_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_schema_change() RETURNS event_trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('{SCHEMA_CHANGE_CHANNEL}', tg_tag);
+END;
+$$;
+DROP EVENT TRIGGER IF EXISTS schema_change_notify;
+CREATE EVENT TRIGGER schema_change_notify ON ddl_command_end
+    EXECUTE FUNCTION notify_schema_change();
+"""
 
 class SQLSchemaLoader:
-    def __init__(self, connection_string: str):
-        """Initialize the SQL Schema Loader with a database connection string."""
+    def __init__(self, connection_string: str, schema: str = None,
+                 snapshot_dir: Optional[str] = ".cache/sql_schemas"):
+        """
+        Initialize the SQL Schema Loader with a database connection string.
+        
+        Args:
+            connection_string: SQLAlchemy database URL
+            schema: Database schema to reflect (None for the default schema)
+            snapshot_dir: Directory for reflected-schema snapshots (None disables them)
+        """
         self.engine = sa.create_engine(connection_string)
         self.metadata = MetaData()
         self.inspector = inspect(self.engine)
+        self.schema = schema
+        self.snapshot_dir = snapshot_dir
+        self._schemas: Optional[Dict[str, Dict[str, Any]]] = None
+        self._fk_graph: Optional[ForeignKeyGraph] = None
+        self._listen_connection = None
     
-    def get_table_schema(self, table_name: str) -> Dict[str, Any]:
-        """Get schema information for a specific table."""
-        columns = self.inspector.get_columns(table_name)
-        pk = self.inspector.get_pk_constraint(table_name)
-        fks = self.inspector.get_foreign_keys(table_name)
-        
+    def catalog_fingerprint(self) -> Optional[str]:
+        """Return a hash of the schema's catalog definitions, or None if the dialect is unsupported."""
+        if self.engine.dialect.name != "postgresql":
+            return None
+        schema = self.schema or self.inspector.default_schema_name
+        with self.engine.connect() as conn:
+            return conn.execute(POSTGRES_FINGERPRINT_QUERY, {"schema": schema}).scalar()
+    
+    def _snapshot_path(self) -> str:
+        url = self.engine.url.render_as_string(hide_password=True)
+        key = hashlib.sha256(f"{url}|{self.schema}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.snapshot_dir, f"{key}.schema.json")
+    
+    @staticmethod
+    def _build_schema(table_name: str, columns: List[Dict[str, Any]], pk: Dict[str, Any],
+                      fks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Convert reflected columns/constraints into the schema dict stored in documents."""
+        pk_columns = pk["constrained_columns"] if pk else []
         return {
             "table_name": table_name,
             "columns": [
@@ -23,11 +90,11 @@ class SQLSchemaLoader:
                     "name": col["name"],
                     "type": str(col["type"]),
                     "nullable": col["nullable"],
-                    "primary_key": col["name"] in pk["constrained_columns"] if pk else False
+                    "primary_key": col["name"] in pk_columns
                 }
                 for col in columns
             ],
-            "primary_keys": pk["constrained_columns"] if pk else [],
+            "primary_keys": pk_columns,
             "foreign_keys": [
                 {
                     "referred_table": fk["referred_table"],
@@ -38,9 +105,80 @@ class SQLSchemaLoader:
             ]
         }
     
-    def create_schema_document(self, table_name: str) -> Dict[str, Any]:
+    def _reflect(self) -> Dict[str, Dict[str, Any]]:
+        """Reflect every table with SQLAlchemy's multi-table inspector methods."""
+        if not hasattr(self.inspector, "get_multi_columns"):
+            return {
+                table_name: self.get_table_schema(table_name)
+                for table_name in self.inspector.get_table_names(schema=self.schema)
+            }
+        
+        # One set-based catalog query per kind of object instead of one per table
+        columns = self.inspector.get_multi_columns(schema=self.schema)
+        pks = self.inspector.get_multi_pk_constraint(schema=self.schema)
+        fks = self.inspector.get_multi_foreign_keys(schema=self.schema)
+        schemas = {}
+        # Keys are (schema, table_name) tuples
+        for key in sorted(columns, key=lambda key: key[1]):
+            schemas[key[1]] = self._build_schema(key[1], columns[key], pks.get(key), fks.get(key, []))
+        return schemas
+    
+    def reflect_all(self, refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Return schema dicts for all tables, keyed by table name.
+        
+        Reflection results are cached in memory and, when the catalog can be
+        fingerprinted, in a snapshot file that is reused until the DDL changes.
+        
+        Args:
+            refresh: Ignore cached results and reflect again
+        """
+        if self._schemas is not None and not refresh:
+            return self._schemas
+        
+        fingerprint = self.catalog_fingerprint() if self.snapshot_dir else None
+        snapshot_path = self._snapshot_path() if fingerprint else None
+        if snapshot_path and not refresh and os.path.exists(snapshot_path):
+            with open(snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            if snapshot.get("fingerprint") == fingerprint:
+                self._fk_graph = None
+                self._schemas = snapshot["schemas"]
+                return self._schemas
+        
+        if refresh:
+            # Inspectors cache reflected objects, so start from a fresh one
+            self.inspector = inspect(self.engine)
+        self._fk_graph = None
+        self._schemas = self._reflect()
+        if snapshot_path:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            tmp_path = f"{snapshot_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"fingerprint": fingerprint, "schemas": self._schemas}, f)
+            os.replace(tmp_path, snapshot_path)
+        return self._schemas
+    
+    def fk_graph(self) -> ForeignKeyGraph:
+        """Return the foreign-key graph of all tables, built once per reflection."""
+        if self._fk_graph is None:
+            self._fk_graph = ForeignKeyGraph(self.reflect_all())
+        return self._fk_graph
+    
+    def get_table_schema(self, table_name: str) -> Dict[str, Any]:
+        """Get schema information for a specific table."""
+        if self._schemas is not None and table_name in self._schemas:
+            return self._schemas[table_name]
+        
+        columns = self.inspector.get_columns(table_name, schema=self.schema)
+        pk = self.inspector.get_pk_constraint(table_name, schema=self.schema)
+        fks = self.inspector.get_foreign_keys(table_name, schema=self.schema)
+        return self._build_schema(table_name, columns, pk, fks)
+    
+    def create_schema_document(self, table_name: str, schema: Dict[str, Any] = None) -> Dict[str, Any]:
         """Create a document from table schema for vector storage."""
-        schema = self.get_table_schema(table_name)
+        if schema is None:
+            schema = self.get_table_schema(table_name)
         
         # Create a natural language description of the table
         description = f"Table '{table_name}' with columns: "
@@ -62,14 +200,97 @@ class SQLSchemaLoader:
                 description += f"\n- References {fk['referred_table']} through columns {fk['constrained_columns']}"
         
         return {
+            "key": f"table:{table_name}",
             "text": description,
             "metadata": {
+                "source": SCHEMA_SOURCE,
+                "doc_type": "table",
                 "table_name": table_name,
                 "schema": schema
             }
         }
     
-    def load_all_schemas(self) -> List[Dict[str, Any]]:
-        """Load schemas for all tables in the database."""
-        table_names = self.inspector.get_table_names()
-        return [self.create_schema_document(table_name) for table_name in table_names]
\ No newline at end of file
+    def create_column_documents(self, table_name: str, schema: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Create one document per column for fine-grained (column-level) retrieval."""
+        if schema is None:
+            schema = self.get_table_schema(table_name)
+        
+        references = {}
+        for fk in schema["foreign_keys"]:
+            for column, referred_column in zip(fk["constrained_columns"], fk["referred_columns"]):
+                references[column] = f"{fk['referred_table']}.{referred_column}"
+        
+        documents = []
+        for col in schema["columns"]:
+            description = f"Column '{col['name']}' ({col['type']}) of table '{table_name}'"
+            if col['primary_key']:
+                description += " (Primary Key)"
+            if not col['nullable']:
+                description += " (Required)"
+            if col['name'] in references:
+                description += f" (References {references[col['name']]})"
+            
+            documents.append({
+                "key": f"column:{table_name}.{col['name']}",
+                "text": description,
+                "metadata": {
+                    "source": SCHEMA_SOURCE,
+                    "doc_type": "column",
+                    "table_name": table_name,
+                    "column_name": col['name']
+                }
+            })
+        return documents
+    
+    def load_all_schemas(self, include_columns: bool = False) -> List[Dict[str, Any]]:
+        """
+        Load schemas for all tables in the database.
+        
+        Args:
+            include_columns: Also return one document per column (doc_type "column")
+                next to the table documents (doc_type "table")
+        """
+        documents = []
+        for table_name, schema in self.reflect_all().items():
+            documents.append(self.create_schema_document(table_name, schema))
+            if include_columns:
+                documents.extend(self.create_column_documents(table_name, schema))
+        return documents
+    
+    def install_change_trigger(self) -> None:
+        """
+        Install a PostgreSQL event trigger that NOTIFYs on every DDL command.
+        
+        Event triggers require superuser rights; init-scripts installs the same
+        trigger when the database is created.
+        """
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(POSTGRES_CHANGE_TRIGGER_SQL)
+    
+    def wait_for_change(self, timeout: float) -> bool:
+        """
+        Block until a DDL notification arrives or ``timeout`` seconds pass.
+        
+        Uses LISTEN on PostgreSQL with psycopg2 and plain sleeping otherwise.
+        
+        Returns:
+            True if a notification was received
+        """
+        if self.engine.dialect.name != "postgresql" or self.engine.dialect.driver != "psycopg2":
+            time.sleep(timeout)
+            return False
+        
+        if self._listen_connection is None:
+            self._listen_connection = self.engine.raw_connection()
+            dbapi_connection = self._listen_connection.driver_connection
+            dbapi_connection.autocommit = True
+            dbapi_connection.cursor().execute(f"LISTEN {SCHEMA_CHANGE_CHANNEL}")
+        
+        dbapi_connection = self._listen_connection.driver_connection
+        readable, _, _ = select.select([dbapi_connection], [], [], timeout)
+        if not readable:
+            return False
+        dbapi_connection.poll()
+        received = bool(dbapi_connection.notifies)
+        dbapi_connection.notifies.clear()
+        return received
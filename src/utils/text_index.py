@@ -0,0 +1,184 @@
+import bisect
+import heapq
+import math
+import os
+import pickle
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase ``text`` and split it into alphanumeric tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class BM25Index:
+    """
+    In-memory inverted index with BM25 ranking.
+
+    Queries are whitespace-separated terms. A term ending in ``*`` matches
+    every indexed term with that prefix. Double-quoted phrases must appear
+    verbatim (after tokenization) in a matching document. Phrases are checked
+    against the original text, so ``search`` needs a ``get_text`` callback for
+    them; the index itself stores only term frequencies and document lengths.
+
+    Documents can be added and removed one at a time, and the index can be
+    pickled to disk with ``save``/``load``.
+    """
+
+    VERSION = 1
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> {doc key: term frequency}
+        self.postings: Dict[str, Dict[Hashable, int]] = {}
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self.doc_terms: Dict[Hashable, List[str]] = {}
+        self.total_length = 0
+        self._sorted_terms: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, key: Hashable, text: str) -> None:
+        """Index ``text`` under ``key``, replacing any previous text for that key."""
+        if key in self.doc_lengths:
+            self.remove(key)
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        for term, tf in counts.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._sorted_terms = None
+            postings[key] = tf
+        self.doc_lengths[key] = len(tokens)
+        self.doc_terms[key] = list(counts)
+        self.total_length += len(tokens)
+
+    def add_many(self, items: Iterable[Tuple[Hashable, str]]) -> None:
+        """Index several (key, text) pairs."""
+        for key, text in items:
+            self.add(key, text)
+
+    def remove(self, key: Hashable) -> None:
+        """Remove the document stored under ``key`` (no-op if absent)."""
+        if key not in self.doc_lengths:
+            return
+        for term in self.doc_terms.pop(key):
+            postings = self.postings[term]
+            del postings[key]
+            if not postings:
+                del self.postings[term]
+                self._sorted_terms = None
+        self.total_length -= self.doc_lengths.pop(key)
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """Return all indexed terms starting with ``prefix``."""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        end = bisect.bisect_left(self._sorted_terms, prefix + "\uffff")
+        return self._sorted_terms[start:end]
+
+    def _parse(self, query: str) -> Tuple[List[str], List[List[str]]]:
+        """Split a query into scoring terms (prefixes expanded) and phrases."""
+        terms, phrases = [], []
+        for phrase, word in QUERY_PATTERN.findall(query):
+            if phrase:
+                phrase_terms = tokenize(phrase)
+                if phrase_terms:
+                    phrases.append(phrase_terms)
+                    terms.extend(phrase_terms)
+            elif word.endswith("*") and tokenize(word):
+                terms.extend(self._expand_prefix(tokenize(word)[-1]))
+            else:
+                terms.extend(tokenize(word))
+        return terms, phrases
+
+    @staticmethod
+    def _contains_phrase(tokens: List[str], phrase: List[str]) -> bool:
+        size = len(phrase)
+        return any(tokens[i:i + size] == phrase for i in range(len(tokens) - size + 1))
+
+    def search(self, query: str, limit: int = 10, candidates: Set[Hashable] = None,
+               get_text: Callable[[Hashable], str] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Rank documents for ``query`` with BM25.
+
+        Args:
+            query: Terms, ``prefix*`` terms and "quoted phrases"
+            limit: Maximum number of results
+            candidates: Restrict results to these keys
+            get_text: Returns a document's text; required for phrase queries
+
+        Returns:
+            (key, score) pairs, best first
+        """
+        terms, phrases = self._parse(query)
+        if not terms or not self.doc_lengths:
+            return []
+
+        n_docs = len(self.doc_lengths)
+        avg_length = self.total_length / n_docs
+        scores: Dict[Hashable, float] = {}
+        for term, query_tf in Counter(terms).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, tf in postings.items():
+                if candidates is not None and key not in candidates:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[key] / avg_length)
+                scores[key] = scores.get(key, 0.0) + query_tf * idf * tf * (self.k1 + 1) / norm
+
+        if phrases:
+            if get_text is None:
+                raise ValueError("Phrase queries need a get_text callback")
+            # Documents must contain every term of every phrase before the text is checked
+            for phrase in phrases:
+                for term in set(phrase):
+                    postings = self.postings.get(term, {})
+                    scores = {key: score for key, score in scores.items() if key in postings}
+            ranked = (item for item in sorted(scores.items(), key=lambda item: -item[1])
+                      if all(self._contains_phrase(tokenize(get_text(item[0])), phrase) for phrase in phrases))
+            return [item for _, item in zip(range(limit), ranked)]
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str, fingerprint: Any = None) -> None:
+        """Pickle the index to ``path``, tagged with a caller-defined fingerprint."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({
+                "version": self.VERSION,
+                "fingerprint": fingerprint,
+                "k1": self.k1,
+                "b": self.b,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+                "doc_terms": self.doc_terms,
+                "total_length": self.total_length
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, fingerprint: Any = None) -> Optional["BM25Index"]:
+        """Load an index saved with ``save``, or None if missing or the fingerprint differs."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != cls.VERSION or state.get("fingerprint") != fingerprint:
+            return None
+        index = cls(k1=state["k1"], b=state["b"])
+        index.postings = state["postings"]
+        index.doc_lengths = state["doc_lengths"]
+        index.doc_terms = state["doc_terms"]
+        index.total_length = state["total_length"]
+        return index
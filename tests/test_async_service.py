@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import numpy as np
+import pytest
+from databases.numpy_db import NumpyAdapter
+from retrievers.async_service import AsyncRetrievalService
+from retrievers.retriever import RAGRetriever
+
+DIMENSION = 8
+
+class HashEmbeddingModel:
+    """Deterministic stand-in for EmbeddingModel: each text maps to a fixed unit vector."""
+
+    dimension = DIMENSION
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, batch_size=32):
+        texts = [texts] if isinstance(texts, str) else texts
+        self.encoded += len(texts)
+        rows = [np.random.RandomState(int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)).randn(DIMENSION)
+                for text in texts]
+        embeddings = np.asarray(rows, dtype=np.float32).reshape(len(texts), DIMENSION)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+class CountingNumpyAdapter(NumpyAdapter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.searches = 0
+
+    def search_batch(self, query_embeddings, top_k=5, filters=None):
+        self.searches += 1
+        return super().search_batch(query_embeddings, top_k=top_k, filters=filters)
+
+DOCUMENTS = [
+    ("Dataset squad: question answering over Wikipedia", {"dataset": "squad", "tags": ["qa", "en"]}),
+    ("Dataset imdb: movie review sentiment classification", {"dataset": "imdb", "tags": ["sentiment", "en"]}),
+    ("Dataset librispeech: English speech recognition corpus", {"dataset": "librispeech", "tags": ["audio", "en"]}),
+    ("Dataset wmt16: German English translation pairs", {"dataset": "wmt16", "tags": ["translation", "de"]}),
+    ("Dataset coco: image captioning with object annotations", {"dataset": "coco", "tags": ["vision"]}),
+    ("Dataset xnli: cross-lingual natural language inference", {"dataset": "xnli", "tags": ["nli", "de"]}),
+]
+
+QUERIES = ["question answering", "wmt16", "speech", "sentiment of movie reviews", "translation"]
+
+def build_retriever(hybrid):
+    vector_db = CountingNumpyAdapter("test", DIMENSION)
+    vector_db.connect()
+    retriever = RAGRetriever(vector_db, HashEmbeddingModel(), result_cache_size=64, hybrid=hybrid,
+                             hybrid_candidates=4)
+    retriever.add_documents([text for text, _ in DOCUMENTS], [metadata for _, metadata in DOCUMENTS])
+    return retriever
+
+def retrieve_async(retriever, queries, **kwargs):
+    async def run():
+        async with AsyncRetrievalService(retriever, max_batch_size=16, max_wait_ms=20) as service:
+            return await asyncio.gather(*(service.retrieve(query, **kwargs) for query in queries))
+    return asyncio.run(run())
+
+def hit_ids(results):
+    return [[hit["id"] for hit in hits] for hits in results]
+
+@pytest.mark.parametrize("hybrid", [False, True])
+def test_batches_match_retrieve(hybrid):
+    expected = hit_ids([build_retriever(hybrid).retrieve(query, top_k=3) for query in QUERIES])
+    assert hit_ids(retrieve_async(build_retriever(hybrid), QUERIES, top_k=3)) == expected
+
+def test_hybrid_finds_exact_tokens():
+    results = retrieve_async(build_retriever(True), ["wmt16"], top_k=1)
+    assert results[0][0]["metadata"]["dataset"] == "wmt16"
+
+def test_filters_apply():
+    results = retrieve_async(build_retriever(True), QUERIES, top_k=3, filters={"tags": "de"})
+    for hits in results:
+        assert hits
+        assert all("de" in hit["metadata"]["tags"] for hit in hits)
+
+def test_result_cache_is_shared():
+    retriever = build_retriever(False)
+    first = retrieve_async(retriever, QUERIES, top_k=2)
+    searches = retriever.vector_db.searches
+    second = retrieve_async(retriever, QUERIES, top_k=2)
+
+    assert hit_ids(second) == hit_ids(first)
+    assert retriever.vector_db.searches == searches
+    assert hit_ids(retriever.retrieve_many(QUERIES, top_k=2)) == hit_ids(first)
+    assert retriever.vector_db.searches == searches
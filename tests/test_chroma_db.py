@@ -0,0 +1,62 @@
+import random
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+
+from databases.base import matches_filters, parse_filters
+from databases.chroma_db import ChromaDBAdapter
+
+FILTERS = [
+    {"doc_type": "table"},
+    {"tags": "nlp"},
+    {"tags": ["audio", "vision"]},
+    {"tags": "1"},
+    {"sizes": 1},
+    {"sizes": [2, 10]},
+    {"sizes": {"gt": 3}},
+    {"tags": []},
+    {"downloads": {"gte": 100, "lt": 1000}},
+    {"doc_type": ["table", "column"], "tags": "nlp", "downloads": {"lt": 500}},
+    {"schema": "books"},
+]
+
+@pytest.fixture
+def collection():
+    rng = random.Random(0)
+    metadata = []
+    for i in range(200):
+        metadata.append({
+            "doc_type": rng.choice(["table", "column", "dataset"]),
+            "downloads": rng.randint(0, 2000),
+            "tags": rng.sample(["nlp", "audio", "vision", "1"], rng.randint(0, 3)) if i % 7 else "nlp",
+            "sizes": rng.sample([1, 2, 5, 10], 2),
+            "schema": {"table_name": "books", "columns": [{"name": "title"}]},
+        })
+    ids = [f"doc{i}" for i in range(len(metadata))]
+    vector_db = ChromaDBAdapter(f"test_{random.getrandbits(32)}")
+    vector_db.connect()
+    embeddings = np.random.RandomState(0).randn(len(ids), 8).astype(np.float32)
+    vector_db.insert([f"text {i}" for i in range(len(ids))], embeddings, metadata, ids)
+    yield vector_db, dict(zip(ids, metadata))
+    vector_db.client.delete_collection(vector_db.collection_name)
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_filters_match_reference_semantics(collection, filters):
+    vector_db, metadata = collection
+    conditions = parse_filters(filters)
+    expected = {doc_id for doc_id, meta in metadata.items() if matches_filters(meta, conditions)}
+    assert set(vector_db.list_ids(filters)) == expected
+
+def test_list_and_dict_metadata_round_trip(collection):
+    vector_db, metadata = collection
+    hits = vector_db.search(np.ones(8, dtype=np.float32), top_k=5, filters={"tags": "vision"})
+    assert hits
+    for hit in hits:
+        assert hit["metadata"] == metadata[hit["id"]]
+
+@pytest.mark.parametrize("filters", [{"downloads": {"gt": "100"}}, {"schema": {"eq": {"table_name": "books"}}}])
+def test_unsupported_filters_raise(collection, filters):
+    vector_db, _ = collection
+    with pytest.raises(ValueError):
+        vector_db.list_ids(filters)
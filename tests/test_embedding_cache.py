@@ -0,0 +1,109 @@
+import multiprocessing
+import numpy as np
+import pytest
+from embeddings.embedding_cache import EmbeddingCache
+
+def vectors(*values):
+    return np.array([[value, value] for value in values], dtype=np.float32)
+
+def open_cache(path, **kwargs):
+    return EmbeddingCache(str(path), "model", dim=2, **kwargs)
+
+def test_round_trip_after_close(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put_many(["a", "b"], vectors(1, 2))
+    cache.close()
+
+    reopened = open_cache(tmp_path)
+    assert [vector.tolist() for vector in reopened.get_many(["a", "b"])] == [[1, 1], [2, 2]]
+    assert reopened.get_many(["c"]) == [None]
+
+def test_journal_is_replayed_without_close(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put_many(["a"], vectors(1))
+    cache.save()
+
+    assert open_cache(tmp_path).get_many(["a"])[0].tolist() == [1, 1]
+
+def test_two_instances_do_not_share_rows(tmp_path):
+    first = open_cache(tmp_path)
+    second = open_cache(tmp_path)
+
+    first.put_many(["table books"], vectors(7))
+    second.put_many(["table authors"], vectors(1))
+
+    assert first.get_many(["table books"])[0].tolist() == [7, 7]
+    assert first.get_many(["table authors"])[0].tolist() == [1, 1]
+    assert second.get_many(["table books"])[0].tolist() == [7, 7]
+
+def test_eviction_by_another_instance(tmp_path):
+    first = open_cache(tmp_path, max_entries=2)
+    second = open_cache(tmp_path, max_entries=2)
+    first.put_many(["a", "b"], vectors(1, 2))
+
+    # Evicts "a", the least recently used entry
+    second.put_many(["c"], vectors(3))
+
+    assert first.get_many(["a"]) == [None]
+    assert [vector.tolist() for vector in first.get_many(["b", "c"])] == [[2, 2], [3, 3]]
+
+def test_compaction_by_another_instance(tmp_path):
+    first = open_cache(tmp_path, journal_max_entries=4)
+    second = open_cache(tmp_path, journal_max_entries=4)
+    first.put_many(["a", "b", "c"], vectors(1, 2, 3))
+    second.put_many(["d", "e"], vectors(4, 5))
+    second.save()
+
+    first.put_many(["f"], vectors(6))
+    values = [vector[0] for vector in second.get_many(["a", "b", "c", "d", "e", "f"])]
+    assert values == [1, 2, 3, 4, 5, 6]
+
+def test_more_texts_than_rows(tmp_path):
+    cache = open_cache(tmp_path, max_entries=2)
+    cache.put_many(["a", "b", "c"], vectors(1, 2, 3))
+
+    assert cache.get_many(["a"]) == [None]
+    assert [vector.tolist() for vector in cache.get_many(["b", "c"])] == [[2, 2], [3, 3]]
+
+def test_crash_while_overwriting_an_evicted_row(tmp_path, monkeypatch):
+    cache = open_cache(tmp_path, max_entries=1)
+    cache.put_many(["a"], vectors(1))
+    cache.close()
+
+    crashing = open_cache(tmp_path, max_entries=1)
+    append_journal = crashing._append_journal
+
+    def append_release_only(entries):
+        if any(row is not None for _, row in entries):
+            raise KeyboardInterrupt("crash before the row is claimed")
+        append_journal(entries)
+
+    monkeypatch.setattr(crashing, "_append_journal", append_release_only)
+    with pytest.raises(KeyboardInterrupt):
+        crashing.put_many(["b"], vectors(2))
+
+    # "a" must not be served with "b"'s vector
+    assert open_cache(tmp_path, max_entries=1).get_many(["a", "b"]) == [None, None]
+
+def put_range(path, worker, count):
+    cache = open_cache(path, max_entries=1000, journal_max_entries=64)
+    for i in range(count):
+        value = worker * 1000 + i
+        cache.put_many([f"text {value}"], vectors(value))
+        cache.save()
+        assert cache.get_many([f"text {value}"])[0][0] == value
+    cache.close()
+
+def test_processes_sharing_a_directory(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=put_range, args=(str(tmp_path), worker, 100)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    cache = open_cache(tmp_path, max_entries=1000)
+    texts = [f"text {worker * 1000 + i}" for worker in range(4) for i in range(100)]
+    values = [worker * 1000 + i for worker in range(4) for i in range(100)]
+    assert [vector[0] for vector in cache.get_many(texts)] == values
@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from llm.ollama_client import OllamaClient
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """Minimal ``/api/generate``: the prompt selects the behaviour."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests.append(body)
+            attempt = sum(1 for request in server.requests if request["prompt"] == body["prompt"])
+
+        prompt = body["prompt"]
+        if prompt == "unavailable once" and attempt == 1:
+            self._send(503, b"busy")
+            return
+        if prompt == "hang":
+            time.sleep(1.5)
+        if prompt == "broken":
+            self._send(400, b"bad prompt")
+            return
+
+        tokens = ["SELECT ", "1", ";"]
+        if body["stream"]:
+            lines = [json.dumps({"response": token, "done": False}) for token in tokens]
+            if prompt != "truncated":
+                lines.append(json.dumps({"response": "", "done": True}))
+            self._send(200, ("\n".join(lines) + "\n").encode("utf-8"), "application/x-ndjson")
+        else:
+            self._send(200, json.dumps({"response": "".join(tokens), "done": True}).encode("utf-8"))
+
+    def _send(self, status, payload, content_type="application/json"):
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubOllamaHandler)
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def make_client(server, **kwargs):
+    host, port = server.server_address
+    return OllamaClient(f"http://{host}:{port}", backoff_factor=0, **kwargs)
+
+def test_generate_and_cache(server):
+    with make_client(server) as client:
+        assert client.generate("m", "query") == "SELECT 1;"
+        assert client.generate("m", "query") == "SELECT 1;"
+        assert len(server.requests) == 1
+        # Other options are another completion
+        client.generate("m", "query", {"temperature": 0.1})
+        assert len(server.requests) == 2
+        assert client.stats()["hits"] == 1
+
+def test_disk_cache(server, tmp_path):
+    with make_client(server, cache_dir=str(tmp_path)) as client:
+        client.generate("m", "query")
+    with make_client(server, cache_dir=str(tmp_path)) as client:
+        assert client.generate("m", "query") == "SELECT 1;"
+    assert len(server.requests) == 1
+
+def test_stream(server):
+    with make_client(server) as client:
+        assert list(client.stream("m", "query")) == ["SELECT ", "1", ";"]
+        assert server.requests[0]["stream"] is True
+        # A completed stream is cached and replayed as one chunk
+        assert list(client.stream("m", "query")) == ["SELECT 1;"]
+        assert client.generate("m", "query") == "SELECT 1;"
+        assert len(server.requests) == 1
+
+def test_abandoned_stream_is_not_cached(server):
+    with make_client(server) as client:
+        tokens = client.stream("m", "query")
+        next(tokens)
+        tokens.close()
+        assert list(client.stream("m", "query")) == ["SELECT ", "1", ";"]
+        assert len(server.requests) == 2
+
+def test_stream_without_done_is_not_cached(server):
+    with make_client(server) as client:
+        assert list(client.stream("m", "truncated")) == ["SELECT ", "1", ";"]
+        assert list(client.stream("m", "truncated")) == ["SELECT ", "1", ";"]
+    assert len(server.requests) == 2
+
+def test_disk_cache_is_bounded(server, tmp_path):
+    with make_client(server, cache_dir=str(tmp_path), cache_disk_entries=2) as client:
+        for prompt in ["first", "second", "third"]:
+            client.generate("m", prompt)
+    assert len(list(tmp_path.iterdir())) == 2
+    with make_client(server, cache_dir=str(tmp_path)) as client:
+        client.generate("m", "first")
+        client.generate("m", "third")
+    # Only "first", the least recently used, was removed
+    assert [request["prompt"] for request in server.requests] == ["first", "second", "third", "first"]
+
+def test_retries_unavailable_server(server):
+    with make_client(server) as client:
+        assert client.generate("m", "unavailable once") == "SELECT 1;"
+    assert len(server.requests) == 2
+
+def test_error_status_raises(server):
+    with make_client(server) as client:
+        with pytest.raises(Exception, match="bad prompt"):
+            client.generate("m", "broken")
+    assert len(server.requests) == 1
+
+def test_read_timeout_is_not_retried(server):
+    with make_client(server, timeout=0.3, max_retries=3) as client:
+        start = time.perf_counter()
+        with pytest.raises(requests.RequestException):
+            client.generate("m", "hang")
+        assert time.perf_counter() - start < 1.0
+    assert len(server.requests) == 1
@@ -0,0 +1,135 @@
+import json
+import os
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+tokenizers = pytest.importorskip("tokenizers")
+
+from onnx import TensorProto, helper, numpy_helper
+from embeddings.onnx_backend import ONNX_FILE, OnnxEncoder
+
+VOCAB = ["[UNK]", "books", "table", "title", "author", "price", "column", "of", "the"]
+DIMENSION = 4
+
+def build_model_dir(path, pooling="mean", normalize=True, max_seq_length=16, seed=0):
+    """
+    Write a SentenceTransformer-style directory around a hand-built graph.
+
+    The "transformer" looks each token up in a random embedding table and
+    zeroes padded positions, so the expected sentence embeddings can be
+    computed directly from the table.
+    """
+    table = np.random.RandomState(seed).randn(len(VOCAB), DIMENSION).astype(np.float32)
+    nodes = [
+        helper.make_node("Gather", ["table", "input_ids"], ["gathered"]),
+        helper.make_node("Cast", ["attention_mask"], ["mask"], to=TensorProto.FLOAT),
+        helper.make_node("Unsqueeze", ["mask", "axes"], ["mask_3d"]),
+        helper.make_node("Mul", ["gathered", "mask_3d"], ["last_hidden_state"]),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "lookup",
+        [
+            helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "sequence"]),
+            helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "sequence"]),
+        ],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["batch", "sequence", DIMENSION])],
+        initializer=[numpy_helper.from_array(table, "table"),
+                     numpy_helper.from_array(np.array([-1], dtype=np.int64), "axes")]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.save(model, os.path.join(path, ONNX_FILE))
+
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel(
+        {token: i for i, token in enumerate(VOCAB)}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tokenizer.save(os.path.join(path, "tokenizer.json"))
+
+    os.makedirs(os.path.join(path, "1_Pooling"))
+    with open(os.path.join(path, "1_Pooling", "config.json"), "w") as f:
+        json.dump({"word_embedding_dimension": DIMENSION,
+                   "pooling_mode_cls_token": pooling == "cls",
+                   "pooling_mode_mean_tokens": pooling == "mean"}, f)
+    modules = [{"idx": 0, "name": "0", "path": "", "type": "sentence_transformers.models.Transformer"},
+               {"idx": 1, "name": "1", "path": "1_Pooling", "type": "sentence_transformers.models.Pooling"}]
+    if normalize:
+        modules.append({"idx": 2, "name": "2", "path": "2_Normalize",
+                        "type": "sentence_transformers.models.Normalize"})
+    with open(os.path.join(path, "modules.json"), "w") as f:
+        json.dump(modules, f)
+    with open(os.path.join(path, "sentence_bert_config.json"), "w") as f:
+        json.dump({"max_seq_length": max_seq_length}, f)
+    return table
+
+def token_ids(text):
+    return [VOCAB.index(word) if word in VOCAB else 0 for word in text.split()]
+
+def expected_embedding(table, text, pooling, normalize, max_seq_length=16):
+    rows = table[token_ids(text)[:max_seq_length]]
+    embedding = rows[0] if pooling == "cls" else rows.mean(axis=0)
+    if normalize:
+        embedding = embedding / np.linalg.norm(embedding)
+    return embedding
+
+TEXTS = [
+    "title of the books table",
+    "price",
+    "author column",
+    "the unknown words map to unk",
+    "books",
+]
+
+@pytest.mark.parametrize("pooling,normalize", [("mean", True), ("mean", False), ("cls", True)])
+def test_pooling_and_normalization(tmp_path, pooling, normalize):
+    table = build_model_dir(str(tmp_path), pooling=pooling, normalize=normalize)
+    encoder = OnnxEncoder(str(tmp_path))
+
+    embeddings = encoder.encode(TEXTS, batch_size=2)
+
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape == (len(TEXTS), DIMENSION)
+    assert encoder.get_sentence_embedding_dimension() == DIMENSION
+    # Rows come back in input order even though batches are length-sorted and padded
+    for text, embedding in zip(TEXTS, embeddings):
+        np.testing.assert_allclose(embedding, expected_embedding(table, text, pooling, normalize), rtol=1e-5, atol=1e-6)
+
+def test_padding_does_not_change_embeddings(tmp_path):
+    build_model_dir(str(tmp_path))
+    encoder = OnnxEncoder(str(tmp_path))
+
+    alone = encoder.encode(["price"])
+    padded = encoder.encode(["price", "title of the books table"], batch_size=2)[:1]
+
+    np.testing.assert_allclose(alone, padded, rtol=1e-5, atol=1e-6)
+
+def test_max_seq_length_truncates(tmp_path):
+    table = build_model_dir(str(tmp_path), max_seq_length=2)
+    encoder = OnnxEncoder(str(tmp_path))
+    assert encoder.max_seq_length == 2
+
+    embedding = encoder.encode(["title of the books table"])[0]
+    np.testing.assert_allclose(embedding, expected_embedding(table, "title of", "mean", True), rtol=1e-5, atol=1e-6)
+
+    encoder.max_seq_length = 16
+    embedding = encoder.encode(["title of the books table"])[0]
+    np.testing.assert_allclose(embedding, expected_embedding(table, "title of the books table", "mean", True),
+                               rtol=1e-5, atol=1e-6)
+
+def test_empty_input(tmp_path):
+    build_model_dir(str(tmp_path))
+    assert OnnxEncoder(str(tmp_path)).encode([]).shape == (0, DIMENSION)
+
+def test_missing_graph_raises(tmp_path):
+    build_model_dir(str(tmp_path))
+    with pytest.raises(FileNotFoundError, match="export"):
+        OnnxEncoder(str(tmp_path), quantized=True)
+
+def test_count_tokens_ignores_truncation(tmp_path):
+    build_model_dir(str(tmp_path), max_seq_length=2)
+    encoder = OnnxEncoder(str(tmp_path))
+
+    assert encoder.count_tokens("title of the books table") == 5
+    assert encoder.num_special_tokens == 0
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from qdrant_client import QdrantClient
+from databases import qdrant_db
+from databases.qdrant_db import QdrantAdapter
+from retrievers.retriever import RAGRetriever
+
+DIMENSION = 4
+
+class ConstantEmbeddingModel:
+    dimension = DIMENSION
+
+    def encode(self, texts, batch_size=32):
+        texts = [texts] if isinstance(texts, str) else texts
+        return np.ones((len(texts), DIMENSION), dtype=np.float32)
+
+@pytest.fixture
+def vector_db(monkeypatch):
+    monkeypatch.setattr(qdrant_db, "QdrantClient", lambda host, port: QdrantClient(":memory:"))
+    adapter = QdrantAdapter("test", vector_size=DIMENSION)
+    adapter.connect()
+    return adapter
+
+def test_insert_leaves_metadata_untouched(vector_db):
+    metadata = [{"doc_type": "table", "tags": ["books"]}, {"doc_type": "column"}]
+
+    vector_db.insert(["table books", "column title"], np.ones((2, DIMENSION), dtype=np.float32), metadata, ids=[1, 2])
+
+    assert metadata == [{"doc_type": "table", "tags": ["books"]}, {"doc_type": "column"}]
+    hits = vector_db.search(np.ones(DIMENSION, dtype=np.float32), top_k=2, filters={"tags": "books"})
+    assert [(hit["text"], hit["metadata"]) for hit in hits] == [("table books", metadata[0])]
+
+def test_lexical_index_stores_metadata_without_text(vector_db):
+    retriever = RAGRetriever(vector_db, ConstantEmbeddingModel(), hybrid=True)
+    documents = [
+        {"text": "table books", "metadata": {"doc_type": "table"}},
+        {"text": "table authors", "metadata": {"doc_type": "table"}},
+    ]
+
+    retriever.add_documents([doc["text"] for doc in documents], [doc["metadata"] for doc in documents])
+    retriever.add_documents_stream(iter([{"text": "column title", "metadata": {"doc_type": "column"}}]))
+
+    stored = [meta for _, meta in retriever.lexical_index.documents.values()]
+    assert len(stored) == 3
+    assert all("text" not in meta for meta in stored)
+    assert all("text" not in doc["metadata"] for doc in documents)
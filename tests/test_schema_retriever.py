@@ -0,0 +1,49 @@
+import sqlalchemy as sa
+import pytest
+from retrievers.schema_retriever import SchemaRetriever
+from utils.sql_schema_loader import SQLSchemaLoader
+
+class StubRetriever:
+    """Returns fixed column hits per field, best first."""
+
+    def __init__(self, hits):
+        self.hits = hits
+
+    def retrieve_many(self, queries, top_k=5, filters=None):
+        return [
+            [{"metadata": {"table_name": table, "column_name": column}} for table, column in self.hits[query]][:top_k]
+            for query in queries
+        ]
+
+@pytest.fixture
+def loader(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path}/bookstore.db")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE authors (author_id INTEGER PRIMARY KEY, first_name TEXT)")
+        connection.exec_driver_sql("CREATE TABLE books (book_id INTEGER PRIMARY KEY, title TEXT)")
+        connection.exec_driver_sql(
+            "CREATE TABLE book_authors (book_id INTEGER REFERENCES books(book_id), "
+            "author_id INTEGER REFERENCES authors(author_id), PRIMARY KEY (book_id, author_id))"
+        )
+    return SQLSchemaLoader(f"sqlite:///{tmp_path}/bookstore.db", snapshot_dir=None)
+
+HITS = {
+    "book.title: str": [("books", "title"), ("authors", "first_name"), ("book_authors", "book_id")],
+    "book.author.first_name: str": [("authors", "first_name"), ("books", "title")],
+}
+
+def test_junction_table_outside_top_k_is_joined(loader):
+    # book_authors scores (as a third-ranked hit) but falls outside top_k
+    retriever = SchemaRetriever(StubRetriever(HITS), loader)
+
+    tables = retriever.retrieve_tables(list(HITS), top_k=2)
+
+    assert [table["table_name"] for table in tables] == ["books", "authors", "book_authors"]
+    assert tables[2]["join_table"] and tables[2]["score"] == 0.0
+
+def test_join_expansion_can_be_disabled(loader):
+    retriever = SchemaRetriever(StubRetriever(HITS), loader)
+
+    tables = retriever.retrieve_tables(list(HITS), top_k=2, expand_joins=False)
+
+    assert [table["table_name"] for table in tables] == ["books", "authors"]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import sqlalchemy as sa
+
+pytest.importorskip("qdrant_client")
+
+from qdrant_client import QdrantClient
+from databases import qdrant_db
+from databases.qdrant_db import QdrantAdapter
+from retrievers.retriever import RAGRetriever
+from retrievers.schema_sync import SchemaIndexSync
+from utils.document_ids import document_id
+from utils.sql_schema_loader import SQLSchemaLoader
+
+DIMENSION = 4
+
+class ConstantEmbeddingModel:
+    dimension = DIMENSION
+
+    def encode(self, texts, batch_size=32):
+        texts = [texts] if isinstance(texts, str) else texts
+        return np.ones((len(texts), DIMENSION), dtype=np.float32)
+
+@pytest.fixture
+def retriever(monkeypatch):
+    monkeypatch.setattr(qdrant_db, "QdrantClient", lambda host, port: QdrantClient(":memory:"))
+    adapter = QdrantAdapter("test", vector_size=DIMENSION)
+    adapter.connect()
+    return RAGRetriever(adapter, ConstantEmbeddingModel())
+
+def create_bookstore(engine, referred_column):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE IF EXISTS reviews")
+        connection.exec_driver_sql("DROP TABLE IF EXISTS books")
+        connection.exec_driver_sql("CREATE TABLE books (book_id INTEGER PRIMARY KEY, isbn INTEGER UNIQUE)")
+        connection.exec_driver_sql(
+            f"CREATE TABLE reviews (review_id INTEGER PRIMARY KEY, book INTEGER REFERENCES books({referred_column}))"
+        )
+
+def test_document_id_covers_metadata():
+    assert document_id("text", "key", {"a": 1, "b": 2}) == document_id("text", "key", {"b": 2, "a": 1})
+    assert document_id("text", "key", {"a": 1}) != document_id("text", "key", {"a": 2})
+
+def test_metadata_only_schema_change_is_synced(tmp_path, retriever):
+    engine = sa.create_engine(f"sqlite:///{tmp_path}/bookstore.db")
+    create_bookstore(engine, "book_id")
+    loader = SQLSchemaLoader(f"sqlite:///{tmp_path}/bookstore.db", snapshot_dir=None)
+    sync = SchemaIndexSync(loader, retriever, include_columns=False)
+    sync.sync()
+
+    # Same table text ("References books through columns ['book']"), different referred column
+    create_bookstore(engine, "isbn")
+    stats = sync.sync(refresh=True)
+
+    assert (stats["documents"], stats["skipped"], stats["deleted"]) == (1, 1, 1)
+    hits = retriever.vector_db.search(np.ones(DIMENSION, dtype=np.float32), top_k=5,
+                                      filters={"table_name": "reviews"})
+    assert [hit["metadata"]["schema"]["foreign_keys"][0]["referred_columns"] for hit in hits] == [["isbn"]]